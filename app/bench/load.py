@@ -0,0 +1,261 @@
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+import requests
+from app.core.settings import RATE_LIMIT_PER_MINUTE
+
+# Cada cenário sorteia uma requisição: (método, caminho, argumentos do requests).
+Request = Tuple[str, str, dict]
+Credentials = List[Tuple[str, str]]
+
+YEARS = range(2010, 2024)
+PROCESSAMENTO = ["Viníferas", "Americanas e híbridas", "Uvas de mesa", "Sem classificação"]
+IMPORTACAO = ["Vinhos de mesa", "Espumantes", "Uvas frescas", "Uvas passas", "Suco de uva"]
+EXPORTACAO = ["Vinhos de mesa", "Espumantes", "Uvas frescas", "Suco de uva"]
+COUNTRIES = ["paraguai", "estados unidos", "china", "argentina", "chile", "uruguai"]
+DATASETS = ["producao", "processamento", "comercializacao", "importacao", "exportacao"]
+
+SCENARIOS: Dict[str, Callable[[random.Random, Credentials], Request]] = {
+    "login": lambda rng, credentials: (
+        "POST", "/login", {"data": dict(zip(("username", "password"), rng.choice(credentials)))}
+    ),
+    "producao": lambda rng, credentials: ("GET", "/producao", {"params": {"year": rng.choice(YEARS)}}),
+    "processamento": lambda rng, credentials: (
+        "GET", "/processamento", {"params": {"year": rng.choice(YEARS), "product": rng.choice(PROCESSAMENTO)}}
+    ),
+    "comercializacao": lambda rng, credentials: ("GET", "/comercializacao", {"params": {"year": rng.choice(YEARS)}}),
+    "importacao": lambda rng, credentials: (
+        "GET", "/importacao", {"params": {"year": rng.choice(YEARS), "product": rng.choice(IMPORTACAO)}}
+    ),
+    "exportacao": lambda rng, credentials: (
+        "GET", "/exportacao", {"params": {"year": rng.choice(YEARS), "product": rng.choice(EXPORTACAO),
+                                          "country": rng.choice(COUNTRIES)}}
+    ),
+    "options": lambda rng, credentials: ("GET", f"/{rng.choice(DATASETS)}/options", {}),
+    "trade": lambda rng, credentials: ("GET", "/trade", {"params": {"year": rng.choice(YEARS), "order_by": "Balance_USD"}}),
+    "batch": lambda rng, credentials: ("POST", "/batch", {"json": {"queries": [
+        {"dataset": "producao", "year": rng.choice(YEARS)},
+        {"dataset": "exportacao", "year": rng.choice(YEARS), "product": rng.choice(EXPORTACAO)},
+        {"dataset": "importacao", "year": rng.choice(YEARS), "product": rng.choice(IMPORTACAO)},
+    ]}}),
+}
+
+DEFAULT_MIX = "producao=3,exportacao=2,importacao=2,processamento=1,comercializacao=1,options=2,trade=1,batch=0.5,login=0.2"
+
+# Fração do limite por usuário (VITIBRASIL_RATE_LIMIT_PER_MINUTE) ocupada por cada usuário de teste.
+RATE_LIMIT_HEADROOM = 0.8
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """
+    Converte "producao=3,exportacao=2" em pesos por cenário.
+    """
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"Cenário desconhecido: {name}. Opções: {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def users_for(rps: float, per_minute: float = RATE_LIMIT_PER_MINUTE) -> int:
+    """
+    Usuários de teste necessários para que nenhum passe do limite de requisições por usuário
+    da API no ritmo `rps`. Sem limite (`per_minute` 0), basta um.
+    """
+    if per_minute <= 0:
+        return 1
+    return max(1, math.ceil(rps * 60 / (per_minute * RATE_LIMIT_HEADROOM)))
+
+
+def get_token(url: str, username: str, password: str, signup: bool = True) -> str:
+    """
+    Obtém um token em /login, criando o usuário em /signup se ele ainda não existir.
+    """
+    response = requests.post(f"{url}/login", data={"username": username, "password": password}, timeout=30)
+    if response.status_code == 401 and signup:
+        requests.post(f"{url}/signup", json={"username": username, "password": password}, timeout=30)
+        return get_token(url, username, password, signup=False)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def percentiles(latencies: List[float]) -> dict:
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None, "mean_ms": None}
+    values = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "max_ms": round(float(values.max()), 2),
+        "mean_ms": round(float(values.mean()), 2),
+    }
+
+
+def summarize(samples: List[dict], duration: float) -> dict:
+    """
+    Resume um conjunto de amostras: volume, erros, vazão e percentis de latência.
+    Erros são respostas 5xx e falhas de conexão; respostas 429 (limite por usuário) são
+    contadas à parte, em `throttled`.
+    """
+    statuses: Dict[str, int] = {}
+    for sample in samples:
+        statuses[str(sample["status"])] = statuses.get(str(sample["status"]), 0) + 1
+    errors = sum(1 for sample in samples if sample["error"])
+    throttled = statuses.get("429", 0)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "throttled": throttled,
+        "throttled_rate": round(throttled / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(samples) / duration, 2) if duration else 0.0,
+        "statuses": statuses,
+        **percentiles([sample["latency"] for sample in samples]),
+    }
+
+
+def run(url: str, rps: float, duration: float, mix: Dict[str, float], tokens: List[str],
+        credentials: Credentials, workers: int = 64, interval: float = 5.0,
+        timeout: float = 30.0, seed: Optional[int] = None) -> dict:
+    """
+    Dispara requisições em ritmo constante (`rps` por segundo, em malha aberta) durante
+    `duration` segundos e mede cada uma.
+
+    Como o ritmo não depende das respostas, uma instância saturada aparece como latência e
+    erros crescentes, não como queda silenciosa da carga. Se os `workers` não derem conta do
+    ritmo, o atraso de envio é reportado em `schedule_lag_ms`.
+
+    Parâmetros:
+        url (str): Endereço da instância.
+        rps (float): Requisições por segundo.
+        duration (float): Duração da rodada, em segundos.
+        mix (Dict[str, float]): Peso de cada cenário.
+        tokens (List[str]): Tokens usados nas rotas autenticadas, em rodízio.
+        credentials (List[Tuple[str, str]]): Usuário e senha do cenário de login.
+        workers (int): Threads que enviam as requisições.
+        interval (float): Largura das janelas da linha do tempo, em segundos.
+        timeout (float): Tempo limite de cada requisição, em segundos.
+        seed (int): Semente do sorteio dos cenários.
+
+    Retorna:
+        dict: Resumo geral, por cenário e por janela de tempo.
+    """
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    samples: List[dict] = []
+    lags: List[float] = []
+    lock = threading.Lock()
+    local = threading.local()
+
+    def send(name: str, request: Request, token: str, scheduled: float, start: float) -> None:
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        method, path, kwargs = request
+        headers = {"Authorization": f"Bearer {token}"} if name != "login" else {}
+        sent = time.perf_counter()
+        try:
+            response = session.request(method, f"{url}{path}", headers=headers, timeout=timeout, **kwargs)
+            status = response.status_code
+            error = status >= 500
+        except requests.RequestException as e:
+            status, error = type(e).__name__, True
+        latency = time.perf_counter() - sent
+        with lock:
+            samples.append({"scenario": name, "status": status, "error": error, "latency": latency,
+                            "offset": sent - start})
+            lags.append(sent - scheduled)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for i in range(int(rps * duration)):
+            scheduled = start + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            name = rng.choices(names, weights)[0]
+            executor.submit(send, name, SCENARIOS[name](rng, credentials), tokens[i % len(tokens)], scheduled, start)
+    elapsed = time.perf_counter() - start
+
+    timeline = []
+    for window in range(int(np.ceil(elapsed / interval))):
+        chunk = [sample for sample in samples if window * interval <= sample["offset"] < (window + 1) * interval]
+        timeline.append({"start_s": window * interval, **summarize(chunk, interval)})
+    return {
+        "config": {"url": url, "rps": rps, "duration_s": duration, "mix": mix, "workers": workers,
+                   "users": len(tokens), "interval_s": interval},
+        "elapsed_s": round(elapsed, 2),
+        "schedule_lag_ms": percentiles(lags),
+        "overall": summarize(samples, elapsed),
+        "scenarios": {name: summarize([s for s in samples if s["scenario"] == name], elapsed) for name in mix},
+        "timeline": timeline,
+    }
+
+
+def _print_report(result: dict) -> None:
+    overall = result["overall"]
+    print(f"{overall['requests']} requisições em {result['elapsed_s']}s: {overall['throughput_rps']} req/s, "
+          f"{overall['error_rate']:.2%} de erros, {overall['throttled_rate']:.2%} limitadas (429)")
+    print(f"{'cenário':<16}{'req':>7}{'erros':>7}{'429':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in [("total", overall)] + list(result["scenarios"].items()):
+        p50, p95, p99 = (stats[key] if stats[key] is not None else float("nan") for key in ("p50_ms", "p95_ms", "p99_ms"))
+        print(f"{name:<16}{stats['requests']:>7}{stats['errors']:>7}{stats['throttled']:>7}"
+              f"{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}")
+
+
+def main(argv: Optional[List[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.bench.load",
+        description="Teste de carga da API: reproduz uma mistura das rotas num ritmo fixo e mede latência e erros.",
+    )
+    parser.add_argument("--url", default="http://localhost:8000", help="endereço da instância")
+    parser.add_argument("--rps", type=float, default=10, help="requisições por segundo")
+    parser.add_argument("--duration", type=float, default=60, help="duração em segundos")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"pesos por cenário (padrão: {DEFAULT_MIX})")
+    parser.add_argument("--users", type=int, default=None,
+                        help="quantidade de usuários de teste, em rodízio (padrão: o suficiente para que "
+                             "nenhum passe de VITIBRASIL_RATE_LIMIT_PER_MINUTE no ritmo pedido)")
+    parser.add_argument("--username", default="bench", help="prefixo dos usuários de teste")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--workers", type=int, default=64, help="threads que enviam as requisições")
+    parser.add_argument("--interval", type=float, default=5, help="janela da linha do tempo, em segundos")
+    parser.add_argument("--timeout", type=float, default=30, help="tempo limite por requisição, em segundos")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default="bench-results.json", help="arquivo JSON com os resultados")
+    args = parser.parse_args(argv)
+
+    url = args.url.rstrip("/")
+    needed = users_for(args.rps)
+    if args.users is None:
+        args.users = needed
+    elif args.users < needed:
+        print(f"Aviso: a {args.rps} req/s, {args.users} usuários passam do limite de {RATE_LIMIT_PER_MINUTE:g} "
+              f"requisições por minuto de cada um; a partir de {needed} usuários as respostas 429 somem.")
+    credentials = [(f"{args.username}{i}" if args.users > 1 else args.username, args.password) for i in range(args.users)]
+    tokens = [get_token(url, username, password) for username, password in credentials]
+    print(f"{len(tokens)} tokens obtidos, iniciando {args.duration}s a {args.rps} req/s.")
+    result = run(url, args.rps, args.duration, parse_mix(args.mix), tokens, credentials,
+                 workers=args.workers, interval=args.interval, timeout=args.timeout, seed=args.seed)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    _print_report(result)
+    print(f"Resultados gravados em {args.output}")
+    return result
+
+
+if __name__ == "__main__":
+    """
+        Com a API no ar, execute no terminal:
+        python -m app.bench.load --url http://localhost:10000 --rps 20 --duration 120
+    """
+    main()
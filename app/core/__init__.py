@@ -1,3 +1,4 @@
 from app.core.database_config import init_db
+from app.core.database import run_db
 from app.core.logging_config import logging_config
 import logging
\ No newline at end of file
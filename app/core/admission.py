@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Tuple
+from cachetools import TTLCache
+from fastapi import Depends, HTTPException
+from app.core.settings import (
+    ADMISSION_MAX_CONCURRENCY,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_PER_MINUTE,
+)
+from app.util.auth import verifica_token
+
+
+class Gate:
+    """
+    Limite de requisições simultâneas de um worker, com fila de espera limitada.
+
+    Até `limit` requisições executam ao mesmo tempo e até `max_queue` aguardam uma vaga
+    por no máximo `timeout` segundos. Acima disso a requisição é recusada na hora com 503,
+    em vez de ficar presa atrás de coletas lentas até o timeout do gunicorn.
+    """
+
+    def __init__(self, limit: int, max_queue: int, timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        # Média móvel do tempo de atendimento, usada para sugerir o Retry-After.
+        self.service_time = 1.0
+        self._slots = asyncio.Semaphore(limit)
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.service_time * (self.waiting + 1) / self.limit))
+
+    def _reject(self, reason: str) -> HTTPException:
+        self.rejected += 1
+        logging.info(f"Requisição recusada pelo controle de admissão: {reason}", extra={"sample_key": "admission"})
+        return HTTPException(
+            status_code=503,
+            detail="Serviço sobrecarregado, tente novamente.",
+            headers={"Retry-After": str(self.retry_after())},
+        )
+
+    @asynccontextmanager
+    async def admit(self):
+        if not self._slots.locked():
+            # Vaga livre: o acquire retorna sem suspender, então nenhuma outra requisição passa na frente.
+            await self._slots.acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                raise self._reject("fila cheia")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                raise self._reject("tempo de espera esgotado")
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._slots.release()
+            self.service_time = 0.9 * self.service_time + 0.1 * (time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "service_time_s": round(self.service_time, 3),
+        }
+
+
+class RateLimiter:
+    """
+    Token bucket por usuário: `per_minute` requisições por minuto, com rajadas de até `burst`.
+    Usuários sem requisições recentes saem da memória pelo TTL do cache.
+    """
+
+    def __init__(self, per_minute: float, burst: int):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self._buckets: TTLCache = TTLCache(maxsize=10000, ttl=3600)
+        self._lock = threading.Lock()
+
+    def take(self, user: str) -> Tuple[bool, float]:
+        """
+        Consome uma ficha do usuário.
+
+        Retorna:
+            Tuple[bool, float]: Se a requisição foi aceita e, se não, em quantos segundos haverá ficha.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(user, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                self._buckets[user] = (tokens - 1, now)
+                return True, 0.0
+            self._buckets[user] = (tokens, now)
+            return False, (1 - tokens) / self.rate
+
+
+_gate = None
+_limiter = RateLimiter(RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST) if RATE_LIMIT_PER_MINUTE > 0 else None
+
+
+def get_gate() -> Gate:
+    # Criado sob demanda para que o semáforo pertença ao event loop do worker.
+    global _gate
+    if _gate is None:
+        _gate = Gate(ADMISSION_MAX_CONCURRENCY, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT_SECONDS)
+    return _gate
+
+
+async def admit(token_user: str = Depends(verifica_token)):
+    """
+    Dependência das rotas que consultam o site do Vitibrasil: aplica o limite por usuário
+    (429) e o limite de requisições simultâneas do worker (503), ambos com Retry-After.
+
+    Retorna:
+        str: Usuário do token, como `verifica_token`.
+    """
+    if _limiter is not None:
+        allowed, wait = _limiter.take(token_user)
+        if not allowed:
+            logging.info(f"Limite de requisições excedido: {token_user}", extra={"sample_key": "rate_limit"})
+            raise HTTPException(
+                status_code=429,
+                detail="Limite de requisições excedido, tente novamente.",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+    async with get_gate().admit():
+        yield token_user
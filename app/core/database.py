@@ -0,0 +1,54 @@
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+from fastapi import HTTPException
+from app.core.profiling import run_profiled
+from app.core.settings import DB_MAX_QUEUE, DB_MAX_WORKERS, DB_TIMEOUT_SECONDS
+from app.core.timing import span
+
+T = TypeVar("T")
+
+_executor = ThreadPoolExecutor(max_workers=DB_MAX_WORKERS, thread_name_prefix="sqlite")
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+def _release(_) -> None:
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+async def run_db(fn: Callable[..., T], *args, timeout: float = DB_TIMEOUT_SECONDS) -> T:
+    """
+    Executa uma função que acessa o SQLite num pool de threads limitado, sem bloquear o event loop.
+
+    No máximo `DB_MAX_WORKERS` consultas rodam ao mesmo tempo e `DB_MAX_QUEUE` aguardam na fila.
+    Uma consulta que estoura o tempo limite continua ocupando sua vaga até terminar,
+    para que consultas lentas não façam a fila crescer sem limite.
+
+    Parâmetros:
+        fn (Callable): Função executada na thread. Deve abrir e fechar sua própria conexão.
+        *args: Argumentos de `fn`.
+        timeout (float): Tempo máximo de espera, em segundos.
+
+    Retorna:
+        O retorno de `fn`. Lança HTTPException 503 se a fila estiver cheia e 504 no tempo limite.
+    """
+    global _pending
+    with _pending_lock:
+        if _pending >= DB_MAX_WORKERS + DB_MAX_QUEUE:
+            logging.warning("Fila de consultas ao banco cheia.")
+            raise HTTPException(status_code=503, detail="Banco de dados ocupado, tente novamente.", headers={"Retry-After": "1"})
+        _pending += 1
+    future = _executor.submit(contextvars.copy_context().run, run_profiled, fn, *args)
+    future.add_done_callback(_release)
+    try:
+        with span("db"):
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except asyncio.TimeoutError:
+        logging.error(f"Consulta ao banco excedeu {timeout}s: {getattr(fn, '__name__', fn)}")
+        raise HTTPException(status_code=504, detail="Tempo limite da consulta ao banco excedido.")
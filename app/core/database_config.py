@@ -3,15 +3,8 @@ import os
 import logging
 import pandas as pd
 
-logging.basicConfig(
-    level=logging.INFO, 
-    format="%(asctime)s - %(levelname)s - %(message).200s",
-    datefmt='%m/%d/%Y %I:%M:%S %p',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler(".logs")
-    ]
-)
+DB_PATH = "vitibrasil.db"
+SNAPSHOT_DIR = "snapshots"
 
 async def init_db():
     if not os.path.exists("vitibrasil.db"):
@@ -1,15 +1,186 @@
+import atexit
+import copy
+import json
 import logging
+import queue
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from app.core import timing
+from app.core.settings import (
+    LOG_FILE,
+    LOG_LEVEL,
+    LOG_QUEUE_SIZE,
+    LOG_SAMPLE_BURST,
+    LOG_SAMPLE_EVERY,
+    LOG_SAMPLE_WINDOW,
+)
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Campos passados em `extra=` que entram no JSON.
+EXTRA_FIELDS = ("method", "path", "status", "duration_ms", "timings", "suppressed")
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Uma linha JSON por registro, com o ID da requisição e os campos extras.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()[:200],
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for field in EXTRA_FIELDS:
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Copia o ID da requisição atual para o registro, na thread que gerou o log.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Limita logs repetitivos de sucesso.
+
+    Registros INFO ou abaixo com a mesma mensagem (ou o mesmo `sample_key`) passam
+    livremente até `burst` vezes por janela de `window` segundos; depois disso, só um a
+    cada `every` é mantido, com o número de registros descartados em "suppressed".
+    Avisos e erros nunca são descartados.
+    """
+
+    def __init__(self, window: float = LOG_SAMPLE_WINDOW, burst: int = LOG_SAMPLE_BURST,
+                 every: int = LOG_SAMPLE_EVERY):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self.every = every
+        self._counts = {}
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or self.every <= 1:
+            return True
+        key = (record.name, getattr(record, "sample_key", record.msg))
+        with self._lock:
+            now = time.monotonic()
+            if now - self._started >= self.window:
+                self._counts.clear()
+                self._started = now
+            seen, suppressed = self._counts.get(key, (0, 0))
+            seen += 1
+            keep = seen <= self.burst or (seen - self.burst) % self.every == 0
+            self._counts[key] = (seen, 0 if keep else suppressed + 1)
+        if keep and suppressed:
+            record.suppressed = suppressed
+        return keep
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler que descarta registros quando a fila está cheia, em vez de bloquear a requisição.
+    """
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
 
 def logging_config():
     """
-    Padroniza o formato do logging.
-    """
-    logging.basicConfig(
-        level=logging.INFO, 
-        format="%(asctime)s - %(levelname)s - %(message).200s",
-        datefmt='%m/%d/%Y %I:%M:%S %p',
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler(".logs")
-        ]
-    )
\ No newline at end of file
+    Padroniza o logging da aplicação.
+
+    Os registros entram numa fila em memória e são escritos no console e em `LOG_FILE`
+    por uma thread separada (QueueListener), em JSON. Chamadas repetidas não duplicam handlers.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    formatter = JsonFormatter()
+    stream = logging.StreamHandler()
+    stream.setFormatter(formatter)
+    file = logging.FileHandler(LOG_FILE)
+    file.setFormatter(formatter)
+
+    handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    handler.addFilter(RequestIdFilter())
+    handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+
+    _listener = QueueListener(handler.queue, stream, file, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+async def log_requests(request, call_next):
+    """
+    Middleware HTTP: atribui um ID a cada requisição (ou reaproveita o cabeçalho X-Request-ID)
+    e registra método, caminho, status, duração e o tempo de cada etapa ao final.
+    As etapas também vão para o cabeçalho Server-Timing.
+    """
+    token = request_id.set(request.headers.get("X-Request-ID", "")[:64] or uuid.uuid4().hex[:16])
+    timings = timing.Timings()
+    timing_token = timing.current.set(timings)
+    try:
+        response = await call_next(request)
+    except Exception:
+        logging.exception("Erro não tratado na requisição", extra={"method": request.method, "path": request.url.path})
+        raise
+    else:
+        spans = timings.as_dict()
+        level = logging.INFO if response.status_code < 500 else logging.ERROR
+        logging.log(level, "%s %s %s", request.method, request.url.path, response.status_code, extra={
+            "method": request.method,
+            "path": request.url.path,
+            "status": response.status_code,
+            "duration_ms": spans["total"],
+            "timings": spans,
+            "sample_key": (request.url.path, response.status_code),
+        })
+        response.headers["X-Request-ID"] = request_id.get()
+        response.headers["Server-Timing"] = timing.server_timing(spans)
+        return response
+    finally:
+        timing.current.reset(timing_token)
+        request_id.reset(token)
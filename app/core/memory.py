@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Union
+from app.core.settings import MEMORY_RSS_HISTORY, MEMORY_RSS_INTERVAL_SECONDS, MEMORY_TRACE_FRAMES
+
+
+class MemoryStats:
+    """
+    Pico de memória alocada (tracemalloc) por chamada de uma rota ou scraper, em KB.
+
+    O pico do tracemalloc é global ao processo: ele só é zerado quando nenhuma outra requisição
+    está sendo medida, então o valor de uma chamada sobreposta a outras é um limite superior
+    (inclui as alocações das demais). `overlapped` conta essas chamadas. Medições aninhadas
+    (o scraper dentro da rota) não contam como sobreposição.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.overlapped = 0
+        self.max_peak_kb = 0.0
+        self.total_peak_kb = 0.0
+        self.last_peak_kb = 0.0
+        self.retained_kb = 0.0
+
+    def add(self, peak_kb: float, retained_kb: float, overlapped: bool) -> None:
+        self.calls += 1
+        self.overlapped += overlapped
+        self.max_peak_kb = max(self.max_peak_kb, peak_kb)
+        self.total_peak_kb += peak_kb
+        self.last_peak_kb = peak_kb
+        self.retained_kb += retained_kb
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "overlapped": self.overlapped,
+            "max_peak_kb": round(self.max_peak_kb, 1),
+            "avg_peak_kb": round(self.total_peak_kb / self.calls, 1) if self.calls else 0.0,
+            "last_peak_kb": round(self.last_peak_kb, 1),
+            "retained_kb": round(self.retained_kb, 1),
+        }
+
+
+_stats: Dict[str, MemoryStats] = {}
+_active = 0
+_overlap_seq = 0
+_carried_peak = 0
+_measuring: ContextVar[bool] = ContextVar("measuring_memory", default=False)
+_lock = threading.Lock()
+_rss_history: deque = deque(maxlen=MEMORY_RSS_HISTORY)
+
+
+def start_tracing(frames: int = MEMORY_TRACE_FRAMES) -> None:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+        logging.info(f"tracemalloc ativado com {frames} frames.")
+
+
+def stop_tracing() -> None:
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+        with _lock:
+            _stats.clear()
+        logging.info("tracemalloc desativado.")
+
+
+@contextmanager
+def measure(key: Union[str, Callable[[], str]]):
+    """
+    Registra o pico de memória alocada durante o bloco em `key` (ex.: "GET /producao",
+    "scraper:producao"). `key` pode ser uma função, chamada ao final do bloco.
+    Sem tracemalloc ativo, apenas executa o bloco.
+    """
+    global _active, _overlap_seq, _carried_peak
+    if not tracemalloc.is_tracing():
+        yield
+        return
+    nested = _measuring.get()
+    owners = 1 if nested else 0
+    with _lock:
+        alone = _active == owners
+        if alone:
+            # Guarda o pico anterior para que a medição externa não o perca com o reset.
+            _carried_peak = max(_carried_peak, tracemalloc.get_traced_memory()[1]) if nested else 0
+            tracemalloc.reset_peak()
+        if not nested:
+            _active += 1
+            _overlap_seq += 1
+        seq = _overlap_seq
+        start, _ = tracemalloc.get_traced_memory()
+    token = _measuring.set(True)
+    try:
+        yield
+    finally:
+        _measuring.reset(token)
+        with _lock:
+            current, peak = tracemalloc.get_traced_memory()
+            if not nested:
+                _active -= 1
+                peak = max(peak, _carried_peak)
+            overlapped = not alone or _overlap_seq != seq or _active > owners
+            _stats.setdefault(key() if callable(key) else key, MemoryStats()).add(
+                max(peak - start, 0) / 1024, (current - start) / 1024, overlapped
+            )
+
+
+def memory_stats() -> Dict[str, dict]:
+    with _lock:
+        return {key: stats.to_dict() for key, stats in sorted(_stats.items())}
+
+
+def top_allocations(limit: int = 20, group_by: str = "lineno") -> List[dict]:
+    """
+    Maiores locais de alocação ainda vivos, segundo um snapshot do tracemalloc.
+
+    Parâmetros:
+        limit (int): Quantidade de locais retornados.
+        group_by (str): "lineno", "filename" ou "traceback".
+
+    Retorna:
+        List[dict]: Local, tamanho em KB e número de blocos. Vazia sem tracemalloc ativo.
+    """
+    if not tracemalloc.is_tracing():
+        return []
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    return [
+        {
+            "site": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+            "size_kb": round(stat.size / 1024, 1),
+            "count": stat.count,
+        }
+        for stat in snapshot.statistics(group_by)[:limit]
+    ]
+
+
+def rss_kb() -> Optional[int]:
+    """
+    Memória residente atual do processo, em KB. Fora do Linux, usa o pico informado por getrusage.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def sample_rss() -> dict:
+    sample = {"time": round(time.time()), "rss_kb": rss_kb()}
+    if tracemalloc.is_tracing():
+        sample["traced_kb"] = round(tracemalloc.get_traced_memory()[0] / 1024, 1)
+    _rss_history.append(sample)
+    return sample
+
+
+def rss_history() -> List[dict]:
+    return list(_rss_history)
+
+
+async def run_rss_monitor(interval: int = MEMORY_RSS_INTERVAL_SECONDS) -> None:
+    """
+    Guarda uma amostra da RSS do worker a cada `interval` segundos (últimas `MEMORY_RSS_HISTORY`).
+    """
+    while True:
+        sample_rss()
+        await asyncio.sleep(interval)
+
+
+def _route_key(request) -> str:
+    # Agrupa pelo caminho declarado da rota ("/jobs/{id}"), não pela URL.
+    route = request.scope.get("route")
+    return f"{request.method} {getattr(route, 'path', request.url.path)}"
+
+
+async def trace_memory(request, call_next):
+    """
+    Middleware HTTP: mede o pico de memória de cada requisição, agrupado pela rota.
+    """
+    if not tracemalloc.is_tracing():
+        return await call_next(request)
+    with measure(lambda: _route_key(request)):
+        return await call_next(request)
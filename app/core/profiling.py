@@ -0,0 +1,144 @@
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import threading
+from contextvars import ContextVar
+from typing import Callable, List, Optional, TypeVar
+from fastapi import HTTPException
+from fastapi.responses import PlainTextResponse
+from app.core.logging_config import request_id
+from app.core.settings import ADMIN_USERS, PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILE_TOP
+from app.util.auth import verifica_token
+
+T = TypeVar("T")
+
+# Modos aceitos no cabeçalho X-Profile ou no parâmetro ?profile=.
+MODES = ("file", "text")
+
+
+class ProfileSession:
+    """
+    Perfis coletados durante uma requisição: o da thread do event loop e os das
+    threads que executaram trabalho da requisição (scraping e banco).
+    """
+
+    def __init__(self):
+        self.profilers: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def add(self, profiler: cProfile.Profile) -> None:
+        with self._lock:
+            self.profilers.append(profiler)
+
+    def stats(self) -> pstats.Stats:
+        with self._lock:
+            profilers = list(self.profilers)
+        stats = pstats.Stats(profilers[0], stream=io.StringIO())
+        for profiler in profilers[1:]:
+            stats.add(profiler)
+        return stats
+
+
+current: ContextVar[Optional[ProfileSession]] = ContextVar("profile_session", default=None)
+
+# O cProfile da thread do event loop vê todas as corrotinas; um perfil por vez evita misturar requisições.
+_loop_lock = threading.Lock()
+
+
+def run_profiled(fn: Callable[..., T], *args) -> T:
+    """
+    Executa `fn` numa thread de trabalho, com cProfile se a requisição que a originou estiver sendo perfilada.
+    """
+    session = current.get()
+    if session is None:
+        return fn(*args)
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Outro profiler já ativo no interpretador (Python 3.12+ usa um único monitor global).
+        return fn(*args)
+    try:
+        return fn(*args)
+    finally:
+        profiler.disable()
+        session.add(profiler)
+
+
+def _requested_mode(request) -> Optional[str]:
+    mode = request.headers.get("X-Profile") or request.query_params.get("profile")
+    if not mode:
+        return None
+    mode = "file" if mode in ("1", "true") else mode
+    if mode not in MODES:
+        return None
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        user = verifica_token(token)
+    except HTTPException:
+        return None
+    if user not in ADMIN_USERS:
+        logging.warning(f"Profiling solicitado por usuário sem permissão: {user}")
+        return None
+    return mode
+
+
+def _write(stats: pstats.Stats, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    stats.dump_stats(path)
+
+
+def _report(stats: pstats.Stats) -> str:
+    stats.stream = io.StringIO()
+    stats.strip_dirs().sort_stats("cumulative").print_stats(PROFILE_TOP)
+    return stats.stream.getvalue()
+
+
+async def profile_requests(request, call_next):
+    """
+    Middleware HTTP de profiling sob demanda.
+
+    Um usuário de `ADMIN_USERS` ativa o cProfile com o cabeçalho `X-Profile` ou o parâmetro
+    `?profile=`: "file" (ou "1") grava o perfil em `PROFILE_DIR/<request_id>.prof`, informado no
+    cabeçalho X-Profile-File; "text" substitui a resposta pelo relatório do pstats. Além disso,
+    `PROFILE_SAMPLE_RATE` do tráfego é perfilado e gravado em arquivo.
+
+    As funções executadas em threads por `run_profiled` (scraping e banco) entram no mesmo perfil.
+    """
+    mode = _requested_mode(request)
+    if mode is None and PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        mode = "file"
+    if mode is None or not _loop_lock.acquire(blocking=False):
+        return await call_next(request)
+
+    session = ProfileSession()
+    token = current.set(session)
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            response = await call_next(request)
+            if mode == "text":
+                async for _ in response.body_iterator:
+                    pass
+        finally:
+            profiler.disable()
+    finally:
+        current.reset(token)
+        _loop_lock.release()
+
+    session.add(profiler)
+    stats = session.stats()
+    if mode == "text":
+        return PlainTextResponse(await asyncio.to_thread(_report, stats), status_code=response.status_code)
+    path = os.path.join(PROFILE_DIR, f"{request_id.get() or id(session)}.prof")
+    await asyncio.to_thread(_write, stats, path)
+    logging.info(f"Perfil da requisição gravado em {path}")
+    response.headers["X-Profile-File"] = path
+    return response
@@ -0,0 +1,90 @@
+import os
+
+# Atualização automática dos anos recentes (app/services/scheduler.py)
+REFRESH_ENABLED = os.getenv("VITIBRASIL_REFRESH_ENABLED", "1") == "1"
+REFRESH_INTERVAL_SECONDS = int(os.getenv("VITIBRASIL_REFRESH_INTERVAL", "21600"))
+REFRESH_JITTER_SECONDS = int(os.getenv("VITIBRASIL_REFRESH_JITTER", "900"))
+REFRESH_RECENT_YEARS = int(os.getenv("VITIBRASIL_REFRESH_RECENT_YEARS", "2"))
+REFRESH_MAX_KEYS = int(os.getenv("VITIBRASIL_REFRESH_MAX_KEYS", "30"))
+REFRESH_STATS_PATH = os.getenv("VITIBRASIL_REFRESH_STATS_PATH", "refresh_stats.db")
+
+# Publicação das cargas (app/services/publish.py)
+PUBLISH_MAX_SHRINK = float(os.getenv("VITIBRASIL_PUBLISH_MAX_SHRINK", "0.1"))
+
+# Gravação em lote das cargas (app/services/writer.py): linhas por transação
+BULK_BATCH_ROWS = int(os.getenv("VITIBRASIL_BULK_BATCH_ROWS", "5000"))
+
+# Carga completa pelos arquivos CSV do site (app/services/csv_ingest.py): URL base ou diretório local
+CSV_SOURCE = os.getenv("VITIBRASIL_CSV_SOURCE", "http://vitibrasil.cnpuv.embrapa.br/download")
+
+# Cache das páginas coletadas do site (app/services/queries.py)
+SCRAPE_CACHE_TTL = int(os.getenv("VITIBRASIL_SCRAPE_CACHE_TTL", "3600"))
+SCRAPE_CACHE_SIZE = int(os.getenv("VITIBRASIL_SCRAPE_CACHE_SIZE", "512"))
+
+# Origem dos dados nas rotas (app/services/queries.py): no modo "auto", só anos dentro do horizonte
+# (ano atual menos LIVE_HORIZON_YEARS em diante) são consultados no site; os anteriores não mudam mais
+LIVE_HORIZON_YEARS = int(os.getenv("VITIBRASIL_LIVE_HORIZON_YEARS", "2"))
+
+# Motor em memória (app/services/engine.py): intervalo entre as verificações de banco ou snapshot novos
+ENGINE_POLL_SECONDS = float(os.getenv("VITIBRASIL_ENGINE_POLL_INTERVAL", "5"))
+
+# Respostas pré-geradas dos anos fechados, servidas direto do disco (app/services/prebuilt.py)
+PREBUILT_ENABLED = os.getenv("VITIBRASIL_PREBUILT_ENABLED", "1") == "1"
+PREBUILT_DIR = os.getenv("VITIBRASIL_PREBUILT_DIR", "prebuilt")
+
+# Exportações assíncronas (app/services/export_jobs.py): fila num arquivo próprio, compartilhado pelos workers
+EXPORT_WORKER_ENABLED = os.getenv("VITIBRASIL_EXPORT_WORKER_ENABLED", "1") == "1"
+EXPORT_JOBS_PATH = os.getenv("VITIBRASIL_EXPORT_JOBS_PATH", "export_jobs.db")
+EXPORT_DIR = os.getenv("VITIBRASIL_EXPORT_DIR", "exports")
+EXPORT_CHUNK_ROWS = int(os.getenv("VITIBRASIL_EXPORT_CHUNK_ROWS", "5000"))
+EXPORT_POLL_SECONDS = float(os.getenv("VITIBRASIL_EXPORT_POLL_INTERVAL", "2"))
+EXPORT_LEASE_SECONDS = int(os.getenv("VITIBRASIL_EXPORT_LEASE", "60"))
+EXPORT_TTL_SECONDS = int(os.getenv("VITIBRASIL_EXPORT_TTL", "86400"))
+EXPORT_MAX_ACTIVE_PER_USER = int(os.getenv("VITIBRASIL_EXPORT_MAX_ACTIVE_PER_USER", "3"))
+
+# Séries históricas e previsões (app/services/timeseries.py e forecast.py): cálculos e modelos ajustados
+# mantidos em cache por versão dos dados
+TIMESERIES_CACHE_SIZE = int(os.getenv("VITIBRASIL_TIMESERIES_CACHE_SIZE", "128"))
+
+# Histograma de acessos e aquecimento do cache na subida do worker (app/services/warmup.py)
+WARMUP_KEYS = int(os.getenv("VITIBRASIL_WARMUP_KEYS", "20"))
+WARMUP_TIMEOUT_SECONDS = float(os.getenv("VITIBRASIL_WARMUP_TIMEOUT", "30"))
+WARMUP_CONCURRENCY = int(os.getenv("VITIBRASIL_WARMUP_CONCURRENCY", "4"))
+ACCESS_FLUSH_INTERVAL_SECONDS = int(os.getenv("VITIBRASIL_ACCESS_FLUSH_INTERVAL", "300"))
+ACCESS_HISTOGRAM_SIZE = int(os.getenv("VITIBRASIL_ACCESS_HISTOGRAM_SIZE", "200"))
+ACCESS_DECAY = float(os.getenv("VITIBRASIL_ACCESS_DECAY", "0.9"))
+ACCESS_STATS_PATH = os.getenv("VITIBRASIL_ACCESS_STATS_PATH", "access_stats.db")
+
+# Controle de admissão das rotas que consultam o site (app/core/admission.py)
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("VITIBRASIL_ADMISSION_MAX_CONCURRENCY", "16"))
+ADMISSION_MAX_QUEUE = int(os.getenv("VITIBRASIL_ADMISSION_MAX_QUEUE", "32"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("VITIBRASIL_ADMISSION_QUEUE_TIMEOUT", "10"))
+RATE_LIMIT_PER_MINUTE = float(os.getenv("VITIBRASIL_RATE_LIMIT_PER_MINUTE", "120"))
+RATE_LIMIT_BURST = int(os.getenv("VITIBRASIL_RATE_LIMIT_BURST", "30"))
+
+# Acesso ao SQLite fora do event loop (app/core/database.py)
+DB_MAX_WORKERS = int(os.getenv("VITIBRASIL_DB_MAX_WORKERS", "4"))
+DB_MAX_QUEUE = int(os.getenv("VITIBRASIL_DB_MAX_QUEUE", "32"))
+DB_TIMEOUT_SECONDS = float(os.getenv("VITIBRASIL_DB_TIMEOUT", "5"))
+
+# Logs estruturados (app/core/logging_config.py)
+LOG_FILE = os.getenv("VITIBRASIL_LOG_FILE", ".logs")
+LOG_LEVEL = os.getenv("VITIBRASIL_LOG_LEVEL", "INFO")
+LOG_QUEUE_SIZE = int(os.getenv("VITIBRASIL_LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_WINDOW = float(os.getenv("VITIBRASIL_LOG_SAMPLE_WINDOW", "60"))
+LOG_SAMPLE_BURST = int(os.getenv("VITIBRASIL_LOG_SAMPLE_BURST", "20"))
+LOG_SAMPLE_EVERY = int(os.getenv("VITIBRASIL_LOG_SAMPLE_EVERY", "100"))
+
+# Usuários com acesso às ferramentas de diagnóstico, separados por vírgula
+ADMIN_USERS = {user.strip() for user in os.getenv("VITIBRASIL_ADMIN_USERS", "").split(",") if user.strip()}
+
+# Profiling de requisições (app/core/profiling.py)
+PROFILE_SAMPLE_RATE = float(os.getenv("VITIBRASIL_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("VITIBRASIL_PROFILE_DIR", "profiles")
+PROFILE_TOP = int(os.getenv("VITIBRASIL_PROFILE_TOP", "40"))
+
+# Memória por rota e por scraper (app/core/memory.py)
+MEMORY_TRACE = os.getenv("VITIBRASIL_MEMORY_TRACE", "0") == "1"
+MEMORY_TRACE_FRAMES = int(os.getenv("VITIBRASIL_MEMORY_TRACE_FRAMES", "5"))
+MEMORY_RSS_INTERVAL_SECONDS = int(os.getenv("VITIBRASIL_MEMORY_RSS_INTERVAL", "60"))
+MEMORY_RSS_HISTORY = int(os.getenv("VITIBRASIL_MEMORY_RSS_HISTORY", "1440"))
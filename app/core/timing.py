@@ -0,0 +1,70 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+from fastapi import responses
+
+
+class Timings:
+    """
+    Tempo acumulado por etapa de uma requisição, em milissegundos.
+
+    O mesmo objeto é compartilhado com as threads que herdam o contexto da requisição
+    (asyncio.to_thread e run_db), por isso as somas são protegidas por um lock.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, duration_ms: float) -> None:
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + duration_ms
+
+    def total(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            spans = {name: round(duration, 2) for name, duration in self.spans.items()}
+        spans["total"] = round(self.total(), 2)
+        return spans
+
+
+def server_timing(spans: Dict[str, float]) -> str:
+    """
+    Valor do cabeçalho Server-Timing, por exemplo "fetch;dur=812.4, parse;dur=95.1, total;dur=930.2".
+    """
+    return ", ".join(f"{name};dur={duration}" for name, duration in spans.items())
+
+
+current: ContextVar[Optional[Timings]] = ContextVar("timings", default=None)
+
+
+@contextmanager
+def span(name: str):
+    """
+    Mede o bloco e soma a duração na etapa `name` da requisição atual.
+    Fora de uma requisição, não faz nada além de executar o bloco.
+    """
+    timings = current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, (time.perf_counter() - started) * 1000)
+
+
+class JSONResponse(responses.JSONResponse):
+    """
+    JSONResponse que registra o tempo de serialização na etapa "serialize".
+    """
+
+    def render(self, content) -> bytes:
+        with span("serialize"):
+            return super().render(content)
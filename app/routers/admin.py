@@ -0,0 +1,95 @@
+import asyncio
+import tracemalloc
+from typing import Literal
+from fastapi import APIRouter, Depends, Query
+from app.core.admission import get_gate
+from app.core.memory import (
+    memory_stats,
+    rss_history,
+    sample_rss,
+    start_tracing,
+    stop_tracing,
+    top_allocations,
+)
+from app.core.timing import JSONResponse
+from app.util.auth import verifica_admin
+
+router = APIRouter(prefix="/admin", tags=["Administração"])
+
+
+@router.get("/memory")
+async def memory(
+    top: int = Query(20, ge=1, le=200),
+    group_by: Literal["lineno", "filename", "traceback"] = Query("lineno"),
+    admin_user: str = Depends(verifica_admin)
+) -> dict:
+    """
+        ### Descrição:
+            Uso de memória do worker que atendeu a requisição.
+       ### Parâmetros:
+            - headers:
+                - Authorization: Bearer {token} (usuário listado em VITIBRASIL_ADMIN_USERS)
+            - method: GET
+            - parameters:
+                - top: int (opcional, quantidade de locais de alocação, padrão 20)
+                - group_by: str (opcional, "lineno", "filename" ou "traceback")
+        ### Retorno:
+            RSS atual e histórico, pico de memória por rota e por scraper e os maiores locais
+            de alocação. Os dados do tracemalloc só aparecem com VITIBRASIL_MEMORY_TRACE=1
+            ou após ativar o rastreamento em POST /admin/memory/tracing.
+    """
+    stats = memory_stats()
+    content = {
+        "success": True,
+        "tracing": tracemalloc.is_tracing(),
+        "current": sample_rss(),
+        "routes": {key: value for key, value in stats.items() if not key.startswith("scraper:")},
+        "scrapers": {key.split(":", 1)[1]: value for key, value in stats.items() if key.startswith("scraper:")},
+        "top": await asyncio.to_thread(top_allocations, top, group_by),
+        "rss_history": rss_history(),
+    }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        content["traced_kb"] = round(current / 1024, 1)
+        content["traced_peak_kb"] = round(peak / 1024, 1)
+    return JSONResponse(status_code=200, content=content)
+
+
+@router.post("/memory/tracing")
+async def memory_tracing(
+    enabled: bool = Query(...),
+    admin_user: str = Depends(verifica_admin)
+) -> dict:
+    """
+        ### Descrição:
+            Liga ou desliga o tracemalloc no worker que atendeu a requisição.
+       ### Parâmetros:
+            - headers:
+                - Authorization: Bearer {token} (usuário listado em VITIBRASIL_ADMIN_USERS)
+            - method: POST
+            - parameters:
+                - enabled: bool (obrigatório)
+        ### Retorno:
+            Estado atual do rastreamento. Desligar descarta as estatísticas coletadas.
+    """
+    if enabled:
+        start_tracing()
+    else:
+        stop_tracing()
+    return JSONResponse(status_code=200, content={"success": True, "tracing": tracemalloc.is_tracing()})
+
+
+@router.get("/admission")
+async def admission(admin_user: str = Depends(verifica_admin)) -> dict:
+    """
+        ### Descrição:
+            Estado do controle de admissão do worker que atendeu a requisição.
+       ### Parâmetros:
+            - headers:
+                - Authorization: Bearer {token} (usuário listado em VITIBRASIL_ADMIN_USERS)
+            - method: GET
+        ### Retorno:
+            Limite de requisições simultâneas e da fila, requisições em execução e aguardando,
+            total recusado com 503 e o tempo médio de atendimento usado no Retry-After.
+    """
+    return JSONResponse(status_code=200, content={"success": True, **get_gate().stats()})
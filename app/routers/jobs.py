@@ -0,0 +1,186 @@
+import os
+from typing import Literal, Optional
+from fastapi import APIRouter, Body, Depends
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field
+from app.core.database import run_db
+from app.core.timing import JSONResponse
+from app.services.export_jobs import (
+    MEDIA_TYPES,
+    create_job,
+    export_path,
+    get_job,
+    job_status,
+    validate_spec,
+)
+from app.util.auth import verifica_token
+
+router = APIRouter(prefix="/jobs", tags=["Exportação"])
+
+
+class ExportFilters(BaseModel):
+    category: Optional[str] = None
+    group: Optional[str] = None
+    cultive: Optional[str] = None
+    product: Optional[str] = None
+    country: Optional[str] = None
+
+
+class ExportRequest(BaseModel):
+    dataset: Literal["producao", "processamento", "comercializacao", "importacao", "exportacao"]
+    year_from: Optional[int] = Field(None, ge=1970, le=2024)
+    year_to: Optional[int] = Field(None, ge=1970, le=2024)
+    filters: ExportFilters = ExportFilters()
+    exact: bool = False
+    format: Literal["csv", "jsonl"] = "csv"
+
+
+@router.post(
+    "/export",
+    status_code=202,
+    responses={
+        202: {
+            "description": "Exportação enfileirada.",
+            "content": {
+                "application/json": {
+                    "example": {"success": True, "id": "3f2b9c0e8d1a4f6b9e7c5a2d1f0b8e6c", "status": "pending",
+                                "status_url": "/jobs/3f2b9c0e8d1a4f6b9e7c5a2d1f0b8e6c"}
+                }
+            }
+        },
+        400: {
+            "description": "Filtro inexistente na tabela ou intervalo de anos inválido.",
+            "content": {
+                "application/json": {
+                    "example": {"success": False, "error": "Filtros inválidos para exportacao: cultive. Opções: product, country"}
+                }
+            }
+        },
+        429: {
+            "description": "O usuário já tem o máximo de exportações na fila.",
+            "content": {
+                "application/json": {
+                    "example": {"success": False, "error": "Limite de exportações em andamento atingido, aguarde a conclusão das anteriores."}
+                }
+            }
+        }
+    }
+)
+async def export(
+    request: ExportRequest = Body(
+        ...,
+        example={"dataset": "exportacao", "year_from": 1990, "year_to": 2020,
+                 "filters": {"country": "paraguai"}, "format": "csv"}
+    ),
+    token_user: str = Depends(verifica_token)) -> dict:
+    """
+        ### Descrição:
+            Enfileira uma exportação de uma tabela inteira ou filtrada, gerada em segundo plano.
+            Use para extrações grandes, que não cabem no tempo das rotas síncronas.
+       ### Parâmetros:
+            - headers:
+                - Authorization: Bearer {token}
+                - content-type: application/json
+            - method: POST
+            - Body JSON:
+                {
+                    "dataset": "exportacao",
+                    "year_from": 1990,
+                    "year_to": 2020,
+                    "filters": {"country": "paraguai", "product": "vinhos de mesa"},
+                    "exact": false,
+                    "format": "csv"
+                }
+                Os filtros aceitos dependem da tabela (category, group, cultive, product, country) e,
+                como nas rotas, não diferenciam maiúsculas nem acentos. O formato pode ser "csv" ou "jsonl".
+        ### Retorno:
+            Retorna o id do job. O andamento é consultado em GET /jobs/{id}.
+    """
+    spec = request.model_dump()
+    spec["filters"] = {name: term for name, term in spec["filters"].items() if term}
+    error = validate_spec(spec)
+    if error:
+        return JSONResponse(status_code=400, content={"success": False, "error": error})
+    job_id = await run_db(create_job, token_user, spec)
+    if job_id is None:
+        return JSONResponse(status_code=429, content={
+            "success": False, "error": "Limite de exportações em andamento atingido, aguarde a conclusão das anteriores."
+        })
+    return JSONResponse(status_code=202, content={"success": True, "id": job_id, "status": "pending",
+                                                  "status_url": f"/jobs/{job_id}"})
+
+
+@router.get(
+    "/{job_id}",
+    responses={
+        200: {
+            "description": "Estado da exportação.",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "success": True,
+                        "id": "3f2b9c0e8d1a4f6b9e7c5a2d1f0b8e6c",
+                        "status": "done",
+                        "spec": {"dataset": "exportacao", "year_from": 1990, "year_to": 2020,
+                                 "filters": {"country": "paraguai"}, "exact": False, "format": "csv"},
+                        "data_version": 12,
+                        "total": 124,
+                        "done": 124,
+                        "progress": 1.0,
+                        "created_at": 1718000000.0,
+                        "finished_at": 1718000001.2,
+                        "download": "/jobs/3f2b9c0e8d1a4f6b9e7c5a2d1f0b8e6c/download"
+                    }
+                }
+            }
+        },
+        404: {
+            "description": "Job não encontrado.",
+            "content": {"application/json": {"example": {"success": False, "error": "Job não encontrado."}}}
+        }
+    }
+)
+async def job(job_id: str, token_user: str = Depends(verifica_token)) -> dict:
+    """
+        ### Descrição:
+            Andamento de uma exportação do usuário.
+       ### Parâmetros:
+            - headers:
+                - Authorization: Bearer {token}
+            - method: GET
+            - path:
+                - job_id: str (id retornado por POST /jobs/export)
+        ### Retorno:
+            Retorna o status ("pending", "running", "done" ou "failed"), as linhas gravadas e o total,
+            e, quando concluída, o link de download.
+    """
+    found = await run_db(get_job, job_id, token_user)
+    if found is None:
+        return JSONResponse(status_code=404, content={"success": False, "error": "Job não encontrado."})
+    return JSONResponse(status_code=200, content=job_status(found))
+
+
+@router.get("/{job_id}/download")
+async def download(job_id: str, token_user: str = Depends(verifica_token)):
+    """
+        ### Descrição:
+            Download do arquivo de uma exportação concluída.
+       ### Parâmetros:
+            - headers:
+                - Authorization: Bearer {token}
+            - method: GET
+            - path:
+                - job_id: str (id retornado por POST /jobs/export)
+        ### Retorno:
+            Retorna o arquivo CSV ou JSON Lines. Os arquivos ficam disponíveis por VITIBRASIL_EXPORT_TTL segundos.
+    """
+    found = await run_db(get_job, job_id, token_user)
+    if found is None:
+        return JSONResponse(status_code=404, content={"success": False, "error": "Job não encontrado."})
+    format = found["spec"]["format"]
+    path = export_path(job_id, format)
+    if found["status"] != "done" or not os.path.exists(path):
+        return JSONResponse(status_code=409, content={"success": False, "status": found["status"],
+                                                      "error": "Exportação ainda não concluída."})
+    return FileResponse(path, media_type=MEDIA_TYPES[format],
+                        filename=f"{found['spec']['dataset']}-{job_id}.{format}")
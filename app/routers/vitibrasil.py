@@ -1,17 +1,30 @@
-from fastapi import APIRouter, Query, Depends, HTTPException, Form, Body
-from typing import Optional
+import asyncio
+from fastapi import APIRouter, Query, Depends, HTTPException, Form, Body, Request
+from typing import List, Literal, Optional
 import sqlite3
 from app.util.auth import verifica_token, cria_token, hash_pass, verifica_pass, oauth2
-from app.core.database_config import init_db
+from app.core.admission import admit
+from app.core.database import run_db
 from app.core.logging_config import logging_config
+from app.core.timing import JSONResponse, span
 import logging
-from pydantic import BaseModel
-from app.services.scraper_producao import get_producao
-from app.services.scraper_processamento import get_processamento
-from app.services.scraper_comercializacao import get_comercializacao
-from app.services.scraper_importacao import get_importacao
-from app.services.scraper_exportacao import get_exportacao
-from fastapi.responses import JSONResponse, RedirectResponse
+from pydantic import BaseModel, Field
+from app.services.engine import get_engine
+from app.services.formatting import shape_response
+from app.services.prebuilt import prebuilt_response
+from app.services.queries import (
+    query_producao,
+    query_processamento,
+    query_comercializacao,
+    query_importacao,
+    query_exportacao,
+    query_trade,
+    query_changes,
+    query_timeseries,
+    query_forecast,
+    run_batch,
+)
+from fastapi.responses import RedirectResponse
 
 
 router = APIRouter()
@@ -20,6 +33,36 @@ class UserRequest(BaseModel):
     username: str
     password: str
 
+class BatchQuery(BaseModel):
+    dataset: Literal["producao", "processamento", "comercializacao", "importacao", "exportacao"]
+    year: Optional[int] = Field(None, ge=1970, le=2024)
+    product: Optional[str] = None
+    category: Optional[str] = None
+    group: Optional[str] = None
+    cultive: Optional[str] = None
+    country: Optional[str] = None
+    source: Literal["live", "db", "auto"] = "auto"
+    fields: Optional[str] = None
+    format: Literal["rows", "columnar"] = "rows"
+
+class BatchRequest(BaseModel):
+    queries: List[BatchQuery] = Field(..., min_length=1, max_length=20)
+
+def insert_user(username: str, hashed_pw: str) -> None:
+    conn = sqlite3.connect("users.db")
+    try:
+        conn.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, hashed_pw))
+        conn.commit()
+    finally:
+        conn.close()
+
+def find_password(username: str) -> Optional[tuple]:
+    conn = sqlite3.connect("users.db")
+    try:
+        return conn.execute("SELECT password FROM users WHERE username = ?", (username,)).fetchone()
+    finally:
+        conn.close()
+
 @router.get("/", include_in_schema=False)
 async def root():
     return RedirectResponse(url="/docs")
@@ -77,25 +120,17 @@ async def sign_up(user: UserRequest = Body(
         ### Retorno:
             Retorna uma mensagem de confirmação de que o usuário foi cadastrado com sucesso.
     """
-    await init_db()
     logging.info('Iniciando sign-up')
-    conn = sqlite3.connect("users.db")
-    cursor = conn.cursor()
 
-    hashed_pw = hash_pass(user.password)
+    hashed_pw = await asyncio.to_thread(hash_pass, user.password)
 
     try:
-        cursor.execute('''
-            INSERT INTO users (username, password) VALUES (?, ?)
-        ''', (user.username, hashed_pw))
-        conn.commit()
+        await run_db(insert_user, user.username, hashed_pw)
         logging.info(f"Usuário {user.username} cadastrado com sucesso.")
         return JSONResponse(status_code=200,content={"message": "Usuário cadastrado com sucesso!"})
     except sqlite3.IntegrityError:
         logging.error(f"Usuário {user.username} já existe.")
         raise HTTPException(status_code=202, detail="Usuário já existe.")
-    finally:
-        conn.close()
 
 @router.post(
     "/login", tags=["Usuários"],
@@ -148,14 +183,9 @@ async def login_user (
             Retorna o token de acesso se as credenciais forem válidas.
     """
 
-    conn = sqlite3.connect("users.db")
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT password FROM users WHERE username = ?", (username,))
-    result = cursor.fetchone()
-    conn.close()
+    result = await run_db(find_password, username)
 
-    if not result or not verifica_pass(password, result[0]):
+    if not result or not await asyncio.to_thread(verifica_pass, password, result[0]):
         raise HTTPException(status_code=401, detail="As credenciais são inválidas")
 
     access_token = cria_token(data={"sub": username})
@@ -205,14 +235,12 @@ async def producao_opcoes() -> dict:
             Retorna uma lista de categorias e produtos disponíveis.
     """
     try:
-        conn = sqlite3.connect("vitibrasil.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT Category FROM producao")
-        categories = [row[0] for row in cursor.fetchall()]
-        cursor.execute("SELECT DISTINCT Product FROM producao")
-        products = [row[0] for row in cursor.fetchall()]
-        conn.close()
+        table = get_engine()["producao"]
+        categories = table.distinct("Category")
+        products = table.distinct("Product")
         return JSONResponse(status_code=200, content={"success": True, "categories": categories, "products": products})
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Erro ao acessar o banco de dados: {e}")
         return JSONResponse(status_code=500, content={"success": False, "error": str(e)}) 
@@ -226,6 +254,8 @@ async def producao_opcoes() -> dict:
                 "application/json": {
                     "example": {
                         "success": True,
+                        "source": "db",
+                        "age_seconds": 3600.0,
                         "total": 1,
                         "data": [
                             {
@@ -258,10 +288,14 @@ async def producao_opcoes() -> dict:
     }
 )
 async def producao (
+    request: Request,
     year: int = Query(None, ge=1970, le=2023),
     category: Optional[str] = Query(None),
     product: Optional[str] = Query(None),
-    token_user: str = Depends(verifica_token)
+    fields: Optional[str] = Query(None),
+    format: Literal["rows", "columnar"] = Query("rows"),
+    source: Literal["live", "db", "auto"] = Query("auto"),
+    token_user: str = Depends(admit)
 ) -> dict:
     """
         ### Descrição:
@@ -274,8 +308,12 @@ async def producao (
                 - year: int (obrigatório, ano de 1970 a 2023)
                 - category: str (opcional, categoria do produto)
                 - product: str (opcional, nome do produto)
+                - fields: str (opcional, colunas retornadas separadas por vírgula, ex.: Product,Quantity_L)
+                - format: str (opcional, "rows" ou "columnar"; no formato columnar as colunas com valor constante vão para "constants")
+                - source: str (opcional, "live" consulta o site, "db" o banco e "auto", o padrão, usa o banco para anos fechados e o site para os recentes)
         ### Retorno:
             Retorna dados de produção filtrados por ano, produto e categoria.
+            Anos fechados consultados sem filtros, `fields` ou formato columnar são enviados de respostas pré-geradas ("source": "prebuilt"), comprimidas se o cliente aceitar gzip.
         ### Exemplo de uso:
             curl -X 'GET' 
                 '/producao?year=2001&product=Tinto&category=Vinho%20de%20mesa' 
@@ -283,44 +321,14 @@ async def producao (
                 -H 'Authorization: Bearer TOKEN_EXAMPLE'
             Retorna dados de produção de Tinto para o ano de 2001 na categoria Vinho de mesa.
     """
-    try:
-        df = get_producao(year)
-        data = df.to_dict(orient="records")
-        logging.info("Dados do site coletados com sucesso")
-        filtered_data = data
-        
-        if product:
-            filtered_data = [row for row in filtered_data if row.get("Product") and product.lower() in row["Product"].lower()]
-        if category:
-            filtered_data = [row for row in filtered_data if row.get("Category") and category.lower() in row["Category"].lower()]
-        return JSONResponse(status_code=200, content={"success": True, "total": len(filtered_data), "data": filtered_data})
-    except Exception as e:
-        logging.error(f"Erro ao capturar dados do banco: {e}")
-        return JSONResponse(status_code=500, content={"Success": False, "error": str(e)})
-    except:
-        logging.info("Erro ao capturar dados do site, tentando coletar do banco")
-        conn = sqlite3.connect("vitibrasil.db") 
-        cursor = conn.cursor()
-
-        if year and product:
-            logging.info(f"Capturando dados do banco para o ano {year} e produto {product}")
-            query = "SELECT Year, Product, Quantity_L FROM producao WHERE Year = ? AND Product LIKE ?"
-            cursor.execute(query, (year, product))
-
-        else:
-            query = "SELECT Year, Product, Quantity_L FROM producao WHERE Year = ?"
-            cursor.execute(query,(year,))
-
-        rows = cursor.fetchall()
-
-        if not rows:
-            logging.warning("Consulta ao banco realizada, mas nenhum dado encontrado.")
-            conn.close()
-            return JSONResponse(status_code=200, content={"success": True, "total": 0, "data": [], "message": "Nenhum dado encontrado no banco para os filtros informados."})
-
-        data = [{"Year": row[0], "Product": row[1], "Quantity_L": row[2]} for row in rows]
-        conn.close()
-        return JSONResponse(status_code=200, content={"success": True, "total": len(data), "data": data})
+    static = prebuilt_response(request, get_engine(), "producao", year, source=source,
+                               filtered=any((category, product, fields)) or format != "rows")
+    if static is not None:
+        return static
+    status, content = await query_producao(year, category, product, source=source)
+    with span("shape"):
+        status, content = shape_response(status, content, fields, format)
+    return JSONResponse(status_code=status, content=content)
 
 @router.get(
     "/processamento/options", tags=["Vitivinicultura"],
@@ -367,16 +375,13 @@ async def processamento_opcoes() -> dict:
             Retorna uma lista de grupos, produtos e cultivos disponíveis.
     """
     try:
-        conn = sqlite3.connect("vitibrasil.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT GroupName FROM processamento")
-        group_name = [row[0] for row in cursor.fetchall()]
-        cursor.execute("SELECT DISTINCT Product FROM processamento")
-        products = [row[0] for row in cursor.fetchall()]
-        cursor.execute("SELECT DISTINCT Cultive FROM processamento")
-        cultives = [row[0] for row in cursor.fetchall()]
-        conn.close()
+        table = get_engine()["processamento"]
+        group_name = table.distinct("GroupName")
+        products = table.distinct("Product")
+        cultives = table.distinct("Cultive")
         return JSONResponse(status_code=200, content={"success": True, "Grupo": group_name, "Produtos": products, "Cultivos": cultives})
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Erro ao acessar o banco de dados: {e}")
         return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
@@ -420,11 +425,15 @@ async def processamento_opcoes() -> dict:
         }
     })
 async def processamento (
+    request: Request,
     product: str = Query(None),
     year: int = Query(None, ge=1970, le=2023),
     group:  Optional[str] = Query(None),
     cultive:  Optional[str] = Query(None),
-    token_user: str = Depends(verifica_token))  -> dict:
+    fields: Optional[str] = Query(None),
+    format: Literal["rows", "columnar"] = Query("rows"),
+    source: Literal["live", "db", "auto"] = Query("auto"),
+    token_user: str = Depends(admit))  -> dict:
     """
         ### Descrição:
             Rota de Processamento.
@@ -436,8 +445,12 @@ async def processamento (
                 - year: int (obrigatório, ano de 1970 a 2023)
                 - product: str (obrigatório, nome do produto)
                 - cultive: str (opcional, cultivo do produto)
+                - fields: str (opcional, colunas retornadas separadas por vírgula, ex.: Cultive,Quantity_Kg)
+                - format: str (opcional, "rows" ou "columnar"; no formato columnar as colunas com valor constante vão para "constants")
+                - source: str (opcional, "live" consulta o site, "db" o banco e "auto", o padrão, usa o banco para anos fechados e o site para os recentes)
         ### Retorno:
             Retorna dados de processamento filtrados por ano, produto e cultivo.
+            Anos fechados consultados sem filtros, `fields` ou formato columnar são enviados de respostas pré-geradas ("source": "prebuilt"), comprimidas se o cliente aceitar gzip.
         ### Exemplo de uso:
             curl -X 'GET' 
                 '/processamento?product=vin%C3%ADferas&year=2003&group=tintas&cultive=alfrocheiro' 
@@ -445,74 +458,15 @@ async def processamento (
                 -H 'Authorization: Bearer TOKEN_EXAMPLE'
             Retorna dados de processamento de Viníferas do grupo Tintas e cultivo Alfrocheiro, para o ano de 2003.
     """
-    if product is None:
-        return JSONResponse(status_code=400, content={"success": False, "error": "Necessário informar o produto: Viníferas, Uvas de mesa, Americanas e Híbridas ou Sem Classificação"})
-    
-    if product.lower() == 'viníferas' or product.lower() == 'viniferas':
-        option = 1
-    elif product.lower() == 'americanas e híbridas' or product.lower() == 'americanas e hibridas':
-        option = 2
-    elif product.lower() == 'uvas de mesa':
-        option = 3
-    elif product.lower() == 'sem classificação' or product.lower() == 'sem classificacao':
-        option = 4
-    else:
-        return JSONResponse(status_code=400, content={"success": False, "error": "Produto inválido. Opções válidas: Viníferas, Uvas de mesa, Americanas e Híbridas ou Sem Classificação."})
-    
-    try:
-        df = get_processamento(year, option)
-   
-        if group:
-            df = df[df["GroupName"].str.contains(group, case=False, na=False)]
-        if cultive:
-            df = df[df["Cultive"].str.contains(cultive, case=False, na=False)]
-        if product:
-            df = df[df["Product"].str.contains(product, case=False, na=False)]
-        data = df.to_dict(orient="records")
-        logging.info("Dados do site coletados com sucesso")
-        return JSONResponse(status_code=200, content={"success": True, "total": len(data), "data": data})
-    except Exception as e:
-        logging.error(f"Erro ao capturar dados do banco: {e}")
-        return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
-    except:
-        logging.error("Erro ao capturar dados do site, tentando coletar do banco")
-
-        conn = sqlite3.connect("vitibrasil.db")
-        cursor = conn.cursor()
-
-        query = "SELECT Year, GroupName, Cultive, Quantity_Kg, Product FROM processamento WHERE 1=1" 
-        params = [] 
-
-        if year is not None:
-            query += " AND Year = ?"
-            params.append(year) 
+    static = prebuilt_response(request, get_engine(), "processamento", year, product, source,
+                               filtered=any((group, cultive, fields)) or format != "rows")
+    if static is not None:
+        return static
+    status, content = await query_processamento(year, product, group, cultive, source=source)
+    with span("shape"):
+        status, content = shape_response(status, content, fields, format)
+    return JSONResponse(status_code=status, content=content)
 
-        if group:
-            query += " AND GroupName LIKE ?"
-            params.append(f"%{group}%")
-
-        if cultive:
-            query += " AND Cultive LIKE ?"
-            params.append(f"%{cultive}%")
-            
-        if product:
-            query += " AND Product LIKE ?"
-            params.append(f"%{product}%")
-
-        if year is not None:
-            query += " AND Year = ?"
-            params.append(year) 
-        
-        logging.info("QUERY:", query)
-        logging.info("PARAMS:", params)
-        cursor.execute(query, params) 
-        rows = cursor.fetchall() 
-
-        data = [{"Year": row[0], "GroupName": row[1], "Cultive": row[2], "Quantity_Kg": row[3]} for row in rows]
-        conn.close() 
-        
-        return JSONResponse(status_code=200, content={"success": True, "total": len(data), "data": data})
-    
 @router.get(
     "/comercializacao/options", tags=["Vitivinicultura"],
     responses={
@@ -556,14 +510,12 @@ async def comercializacao_opcoes() -> dict:
             Retorna uma lista de grupos e produtos disponíveis.
     """
     try:
-        conn = sqlite3.connect("vitibrasil.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT GroupName FROM comercializacao")
-        group_name = [row[0] for row in cursor.fetchall()]
-        cursor.execute("SELECT DISTINCT Product FROM comercializacao")
-        products = [row[0] for row in cursor.fetchall()]
-        conn.close()
+        table = get_engine()["comercializacao"]
+        group_name = table.distinct("GroupName")
+        products = table.distinct("Product")
         return JSONResponse(status_code=200, content={"success": True, "Grupos": group_name, "Produtos": products})
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Erro ao acessar o banco de dados: {e}")
         return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
@@ -606,10 +558,14 @@ async def comercializacao_opcoes() -> dict:
         }
     })
 async def comercializacao (
+    request: Request,
     year: int = Query(None, ge=1970, le=2023),
     group: Optional[str] = Query(None),
     product: Optional[str] = Query(None),
-    token_user: str = Depends(verifica_token))  -> dict:
+    fields: Optional[str] = Query(None),
+    format: Literal["rows", "columnar"] = Query("rows"),
+    source: Literal["live", "db", "auto"] = Query("auto"),
+    token_user: str = Depends(admit))  -> dict:
     """
         ### Descrição:
             Rota de Comercialização.
@@ -621,8 +577,12 @@ async def comercializacao (
                 - year: int (obrigatório, ano de 1970 a 2023)
                 - group: str (opcional, nome do grupo)
                 - cultive: str (opcional, cultivo do produto)
+                - fields: str (opcional, colunas retornadas separadas por vírgula, ex.: Product,Quantity)
+                - format: str (opcional, "rows" ou "columnar"; no formato columnar as colunas com valor constante vão para "constants")
+                - source: str (opcional, aceito como nas demais rotas; a comercialização é sempre lida do banco)
         ### Retorno:
             Retorna dados de produção em JSON filtrados por ano, grupo e cultivo. 
+            Anos fechados consultados sem filtros, `fields` ou formato columnar são enviados de respostas pré-geradas ("source": "prebuilt"), comprimidas se o cliente aceitar gzip.
         ### Exemplo de uso:
             curl -X 'GET' 
                 'comercializacao/?year=2002&group=VINHO%20FINO%20DE%20MESA&cultive=Tinto' 
@@ -630,35 +590,14 @@ async def comercializacao (
                 -H 'Authorization: Bearer TOKEN_EXAMPLE'
             Retorna dados de comercialização de VINHO FINO DE MESA para o ano de 2002 e cultivo Tinto.
     """
-    try:
-        conn = sqlite3.connect("vitibrasil.db")
-        cursor = conn.cursor()
-
-        query = "SELECT Year, GroupName, Product, Quantity_L FROM comercializacao WHERE 1=1" 
-        params = []
-
-        if year is not None:
-            query += " AND Year = ?"
-            params.append(year)
-        
-        if group:
-            query += " AND GroupName LIKE ?"
-            params.append(group)
-
-        if product:
-            query += " AND Product LIKE ?"
-            params.append(product)
-
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-
-        data = [{"Year": row[0], "GroupName": row[1], "Product": row[2], "Quantity": row[3]} for row in rows]
-        conn.close()
-
-        return JSONResponse(content={"success": True, "total": len(data), "data": data})
-    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail={"success": False, "error": str(e)})
+    static = prebuilt_response(request, get_engine(), "comercializacao", year, source=source,
+                               filtered=any((group, product, fields)) or format != "rows")
+    if static is not None:
+        return static
+    status, content = await query_comercializacao(year, group, product, source=source)
+    with span("shape"):
+        status, content = shape_response(status, content, fields, format)
+    return JSONResponse(status_code=status, content=content)
 
 @router.get(
     "/importacao/options", tags=["Vitivinicultura"],
@@ -703,12 +642,10 @@ async def importacao_opcoes() -> dict:
             Retorna uma lista de países disponíveis.
     """
     try:
-        conn = sqlite3.connect("vitibrasil.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT Country FROM importacao")
-        country = [row[0] for row in cursor.fetchall()]
-        conn.close()
+        country = get_engine()["importacao"].distinct("Country")
         return JSONResponse(status_code=200, content={"success": True, "Países": country})
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Erro ao acessar o banco de dados: {e}")
         return JSONResponse(status_code=500, content={"success": False, "error": str(e)}) 
@@ -752,10 +689,14 @@ async def importacao_opcoes() -> dict:
         }
     })
 async def importacao (
+    request: Request,
     year: int = Query(None, ge= 1970, le= 2024),
     country: Optional[str] = Query(None),
     product: str = Query(None),
-    token_user: str = Depends(verifica_token))  -> dict:
+    fields: Optional[str] = Query(None),
+    format: Literal["rows", "columnar"] = Query("rows"),
+    source: Literal["live", "db", "auto"] = Query("auto"),
+    token_user: str = Depends(admit))  -> dict:
     """
         ### Descrição:
             Rota de Importação.
@@ -767,8 +708,12 @@ async def importacao (
                 - year: int (obrigatório, ano de 1970 a 2023)
                 - country: str (opcional, nome do país importador)
                 - product: str (obrigatório, nome do produto)
+                - fields: str (opcional, colunas retornadas separadas por vírgula, ex.: Country,Value_USD)
+                - format: str (opcional, "rows" ou "columnar"; no formato columnar as colunas com valor constante vão para "constants")
+                - source: str (opcional, "live" consulta o site, "db" o banco e "auto", o padrão, usa o banco para anos fechados e o site para os recentes)
         ### Retorno:
             Retorna dados de importação filtrados por ano, país e produto.
+            Anos fechados consultados sem filtros, `fields` ou formato columnar são enviados de respostas pré-geradas ("source": "prebuilt"), comprimidas se o cliente aceitar gzip.
         ### Exemplo de uso:
             curl -X 'GET' 
                 '/importacao?year=2002&country=argentina&product=Vinhos%20de%20mesa' 
@@ -776,64 +721,14 @@ async def importacao (
                 -H 'Authorization: Bearer TOKEN_EXAMPLE'
             Retorna dados de importação de Vinhos de mesa para o ano de 2002 da Argentina.
     """
-    if product is None:
-        return {"Necessário informar o produto": "Vinhos de mesa, Espumantes, Uvas frescas, Uvas passas ou Suco de uva"}
-
-    if product == 'Vinhos de mesa' or product == 'vinhos de mesa':
-        option = 1
-    elif product == 'Espumantes' or product == 'espumantes':
-        option = 2
-    elif product == 'Uvas frescas' or product == 'uvas frescas':
-        option = 3
-    elif product == 'Uvas passas' or product == 'uvas passas':
-        option = 4
-    elif product == 'Suco de uva' or product == 'suco de uva':
-        option = 5
-    else:
-        return JSONResponse(status_code=400, content={"success": False, "error": "Produto inválido. Opções válidas: Vinhos de mesa, Espumantes, Uvas frescas, Uvas passas ou Suco de uva."})
-
-    try:
-        df = get_importacao(year, option)
-        data = df.to_dict(orient="records")
-        logging.info("Dados do site coletados com sucesso")
-        filtered_data = data
-        if product:
-            filtered_data = [row for row in filtered_data if row.get("Product") and product.lower() in row["Product"].lower()]
-        if country:
-            filtered_data = [row for row in filtered_data if row.get("Country") and country.lower() in row["Country"].lower()]
-        return JSONResponse(status_code=200, content={"success": True, "total": len(filtered_data), "data": filtered_data})
-    except Exception as e:
-        logging.error(f"Erro ao capturar dados do banco: {e}")
-        return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
-    except:
-        logging.error("Erro ao capturar dados do site, tentando coletar do banco")
-    
-        conn = sqlite3.connect("vitibrasil.db")
-        cursor = conn.cursor()
-
-        query = "SELECT Year, Country, Quantity_Kg, Value_USD, Product FROM importacao WHERE 1=1"
-        params = []
-
-        if year is not None:
-            query += " AND Year = ?"
-            params.append(year)
-        
-        if country:
-            query += " AND Country LIKE ?"
-            params.append(country)
-            
-        if product:
-            query += " AND Product LIKE ?"
-            params.append(product)
-        
-
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-
-        data = [{"Year": row[0], "Country": row[1], "Quantity_Kg": row[2], "Value_USD": row[3], "Product": row[4]} for row in rows]
-        conn.close()
-
-        return JSONResponse(status_code=200, content={"success": True, "total": len(data), "data": data})
+    static = prebuilt_response(request, get_engine(), "importacao", year, product, source,
+                               filtered=any((country, fields)) or format != "rows")
+    if static is not None:
+        return static
+    status, content = await query_importacao(year, country, product, source=source)
+    with span("shape"):
+        status, content = shape_response(status, content, fields, format)
+    return JSONResponse(status_code=status, content=content)
 
 @router.get(
     "/exportacao/options", tags=["Vitivinicultura"],
@@ -878,14 +773,12 @@ async def exportacao_opcoes() -> dict:
             Retorna uma lista de países disponíveis.
     """
     try:
-        conn = sqlite3.connect("vitibrasil.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT Country FROM exportacao")
-        country = [row[0] for row in cursor.fetchall()]
-        cursor.execute("SELECT DISTINCT Product FROM exportacao")
-        products = [row[0] for row in cursor.fetchall()]
-        conn.close()
+        table = get_engine()["exportacao"]
+        country = table.distinct("Country")
+        products = table.distinct("Product")
         return JSONResponse(status_code=200, content={"success": True, "Países": country, "Produtos": products})
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Erro ao acessar o banco de dados: {e}")
         return JSONResponse(status_code=500, content={"success": False, "error": str(e)}) 
@@ -929,10 +822,14 @@ async def exportacao_opcoes() -> dict:
         }
     })
 async def exportacao (
+    request: Request,
     year: int = Query(None, ge= 1970, le= 2024),
     product: str = Query(None),
     country: Optional[str] = Query(None),
-    token_user: str = Depends(verifica_token))  -> dict:
+    fields: Optional[str] = Query(None),
+    format: Literal["rows", "columnar"] = Query("rows"),
+    source: Literal["live", "db", "auto"] = Query("auto"),
+    token_user: str = Depends(admit))  -> dict:
     """
         ### Descrição:
             Rota de Exportação.
@@ -944,8 +841,12 @@ async def exportacao (
                 - year: int (obrigatório, ano de 1970 a 2023)
                 - country: str (opcional, nome do país exportador)
                 - product: str (obrigatório, nome do produto)
+                - fields: str (opcional, colunas retornadas separadas por vírgula, ex.: Country,Value_USD)
+                - format: str (opcional, "rows" ou "columnar"; no formato columnar as colunas com valor constante vão para "constants")
+                - source: str (opcional, "live" consulta o site, "db" o banco e "auto", o padrão, usa o banco para anos fechados e o site para os recentes)
         ### Retorno:
             Retorna dados de exportação filtrados por ano, país e produto.
+            Anos fechados consultados sem filtros, `fields` ou formato columnar são enviados de respostas pré-geradas ("source": "prebuilt"), comprimidas se o cliente aceitar gzip.
         ### Exemplo de uso:
             curl -X 'GET' 
             '/exportacao?year=2010&product=Vinhos%20de%20mesa&country=Alemanha' 
@@ -953,54 +854,418 @@ async def exportacao (
             -H 'Authorization: Bearer TOKEN_EXAMPLE'
             Retorna dados de exportação de Vinhos de mesa para o ano de 2010 da Alemanha.
     """
-    if product is None:
-        return {"Necessário informar o produto": "Vinhos de mesa, Espumantes, Uvas frescas ou Suco de uva"}
-
-    if product == 'Vinhos de mesa' or product == 'vinhos de mesa':
-        option = 1
-    elif product == 'Espumantes' or product == 'espumantes':
-        option = 2
-    elif product == 'Uvas frescas' or product == 'uvas frescas':
-        option = 3
-    elif product == 'Suco de uva' or product == 'suco de uva':
-        option = 4
-    else:
-        return JSONResponse(status_code=400, content={"success": False, "error": "Produto inválido. Opções válidas: Vinhos de mesa, Espumantes, Uvas frescas, Uvas passas ou Suco de uva."})
-
-    try:
-        df = get_exportacao(year, option)
-        if country:
-            df = df[df["Country"].str.contains(country, case=False, na=False)]
-        if product:
-            df = df[df["Product"].str.contains(product, case=False, na=False)]
-        data = df.to_dict(orient="records")
-        logging.info("Dados do site coletados com sucesso")
-        return JSONResponse(status_code=200, content={"success": True, "total": len(data), "data": data})
-    except Exception as e:
-        logging.error(f"Erro ao capturar dados do banco: {e}")
-        return JSONResponse(status_code=500, content={"success": False, "error": str(e)})
-    except:
-        logging.error("Erro ao capturar dados do site, tentando coletar do banco")
+    static = prebuilt_response(request, get_engine(), "exportacao", year, product, source,
+                               filtered=any((country, fields)) or format != "rows")
+    if static is not None:
+        return static
+    status, content = await query_exportacao(year, country, product, source=source)
+    with span("shape"):
+        status, content = shape_response(status, content, fields, format)
+    return JSONResponse(status_code=status, content=content)
 
-        conn = sqlite3.connect("vitibrasil.db")
-        cursor = conn.cursor()
-
-        query = "SELECT Year, Country, Quantity_Kg, Value_USD FROM exportacoes WHERE 1=1" 
-        params = [] 
-
-        if year is not None:
-            query += " AND Year = ?"
-            params.append(year)
-        
-        if country:
-            query += " AND Country LIKE ?"
-            params.append(country)
+@router.get("/trade", tags=["Vitivinicultura"], responses={
+        200: {
+            "description": "Métricas de comércio exterior retornadas com sucesso.",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "success": True,
+                        "total": 1,
+                        "data": [
+                            {
+                                "Year": 2020,
+                                "Country": "paraguai",
+                                "Product": "vinhos de mesa",
+                                "Import_Kg": 0,
+                                "Import_USD": 0,
+                                "Export_Kg": 3299013,
+                                "Export_USD": 3869243,
+                                "Balance_USD": 3869243,
+                                "Import_USD_per_Kg": None,
+                                "Export_USD_per_Kg": 1.1728,
+                                "Import_Share": 0.0,
+                                "Export_Share": 0.318284
+                            }
+                        ]
+                    }
+                }
+            }
+        },
+        503: {
+            "description": "Métricas ainda não calculadas.",
+            "content": {
+                "application/json": {
+                    "example": {"success": False, "error": "Métricas de comércio ainda não calculadas."}
+                }
+            }
+        }
+    })
+async def trade (
+    year: Optional[int] = Query(None, ge=1970, le=2024),
+    country: Optional[str] = Query(None),
+    product: Optional[str] = Query(None),
+    order_by: Literal["Country", "Product", "Year", "Balance_USD", "Import_USD", "Export_USD", "Import_Share", "Export_Share"] = Query("Country"),
+    fields: Optional[str] = Query(None),
+    format: Literal["rows", "columnar"] = Query("rows"),
+    token_user: str = Depends(verifica_token))  -> dict:
+    """
+        ### Descrição:
+            Rota de métricas de comércio exterior, que junta importação e exportação
+            por ano, país e produto.
+       ### Parâmetros:
+            - headers:
+                - Authorization: Bearer {token}
+            - method: GET
+            - parameters:
+                - year: int (opcional, ano de 1970 a 2024)
+                - country: str (opcional, nome do país)
+                - product: str (opcional, nome do produto)
+                - order_by: str (opcional, coluna de ordenação; valores, saldos e participações em ordem decrescente)
+                - fields: str (opcional, colunas retornadas separadas por vírgula, ex.: Country,Balance_USD)
+                - format: str (opcional, "rows" ou "columnar"; no formato columnar as colunas com valor constante vão para "constants")
+        ### Retorno:
+            Para cada país e produto: volumes e valores importados e exportados, saldo em US$
+            (exportado menos importado), preço médio em US$/kg e participação do país no valor
+            total do ano e produto. As métricas são calculadas a cada publicação de dados.
+        ### Exemplo de uso:
+            curl -X 'GET' 
+            '/trade?year=2020&product=Vinhos%20de%20mesa&order_by=Export_Share' 
+            -H 'accept: application/json' 
+            -H 'Authorization: Bearer TOKEN_EXAMPLE'
+            Retorna os principais destinos das exportações de Vinhos de mesa em 2020.
+    """
+    status, content = await query_trade(year, country, product, order_by)
+    with span("shape"):
+        status, content = shape_response(status, content, fields, format)
+    return JSONResponse(status_code=status, content=content)
 
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
+@router.get("/timeseries/{dataset}", tags=["Vitivinicultura"], responses={
+        200: {
+            "description": "Séries históricas retornadas com sucesso.",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "success": True,
+                        "dataset": "exportacao",
+                        "value": "Value_USD",
+                        "by": "Country",
+                        "window": 3,
+                        "data_version": 12,
+                        "years": [2018, 2019, 2020],
+                        "total": 1,
+                        "data": [
+                            {
+                                "key": "paraguai",
+                                "values": [3123541, 2996437, 3869243],
+                                "yoy": [0.1021, -0.0407, 0.2913],
+                                "rolling_mean": [2862170.67, 3028340.33, 3329740.33],
+                                "cagr": 0.113,
+                                "cagr_from": 2018,
+                                "cagr_to": 2020
+                            }
+                        ]
+                    }
+                }
+            }
+        },
+        400: {
+            "description": "Coluna, agrupamento ou filtro inexistente na tabela.",
+            "content": {
+                "application/json": {
+                    "example": {"success": False, "error": "Agrupamento inválido para producao. Opções: Category, Product"}
+                }
+            }
+        }
+    })
+async def timeseries (
+    dataset: Literal["producao", "processamento", "comercializacao", "importacao", "exportacao"],
+    value: Optional[str] = Query(None),
+    by: Optional[str] = Query(None),
+    window: int = Query(3, ge=2, le=20),
+    year_from: Optional[int] = Query(None, ge=1970, le=2024),
+    year_to: Optional[int] = Query(None, ge=1970, le=2024),
+    limit: Optional[int] = Query(None, ge=1),
+    category: Optional[str] = Query(None),
+    group: Optional[str] = Query(None),
+    cultive: Optional[str] = Query(None),
+    product: Optional[str] = Query(None),
+    country: Optional[str] = Query(None),
+    exact: bool = Query(False),
+    fields: Optional[str] = Query(None),
+    format: Literal["rows", "columnar"] = Query("rows"),
+    token_user: str = Depends(verifica_token))  -> dict:
+    """
+        ### Descrição:
+            Séries anuais de uma tabela, uma por produto, país ou outra coluna, com variação
+            sobre o ano anterior, média móvel e CAGR calculados no servidor sobre todo o histórico.
+       ### Parâmetros:
+            - headers:
+                - Authorization: Bearer {token}
+            - method: GET
+            - path:
+                - dataset: str (producao, processamento, comercializacao, importacao ou exportacao)
+            - parameters:
+                - value: str (opcional, coluna numérica somada; padrão, a primeira da tabela, ex.: Quantity_L, Value_USD)
+                - by: str (opcional, coluna que separa as séries; padrão Country no comércio exterior e Product nas demais)
+                - window: int (opcional, anos da média móvel, padrão 3)
+                - year_from / year_to: int (opcional, intervalo de anos retornado; o CAGR considera só o intervalo)
+                - limit: int (opcional, quantidade máxima de séries, das maiores para as menores)
+                - category, group, cultive, product, country: str (opcional, filtros como nas rotas da tabela)
+                - exact: bool (opcional, compara o nome inteiro nos filtros em vez de buscar substring)
+                - fields: str (opcional, campos de cada série separados por vírgula, ex.: key,cagr)
+                - format: str (opcional, "rows" ou "columnar")
+        ### Retorno:
+            Retorna os anos e, para cada série, os valores, a variação anual ("yoy"), a média móvel
+            ("rolling_mean") e o CAGR entre o primeiro e o último ano com valor positivo. Anos sem
+            valor numérico vêm como null. As séries são calculadas a partir do banco e ficam em
+            cache até a próxima publicação de dados.
+        ### Exemplo de uso:
+            curl -X 'GET' 
+            '/timeseries/exportacao?product=Vinhos%20de%20mesa&value=Value_USD&year_from=2000&limit=5' 
+            -H 'accept: application/json' 
+            -H 'Authorization: Bearer TOKEN_EXAMPLE'
+            Retorna as séries dos cinco principais destinos das exportações de Vinhos de mesa desde 2000.
+    """
+    status, content = await query_timeseries(dataset, value, by, window, year_from, year_to, limit, exact,
+                                             category=category, group=group, cultive=cultive,
+                                             product=product, country=country)
+    with span("shape"):
+        status, content = shape_response(status, content, fields, format)
+    return JSONResponse(status_code=status, content=content)
 
-        data = [{"Year": row[0], "Country": row[1], "Quantity_Kg": row[2], "Value_USD": row[3]} for row in rows]
-        conn.close()
+@router.get("/forecast/{dataset}", tags=["Vitivinicultura"], responses={
+        200: {
+            "description": "Previsões retornadas com sucesso.",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "success": True,
+                        "dataset": "exportacao",
+                        "value": "Value_USD",
+                        "by": "Country",
+                        "model": "holt",
+                        "history": 20,
+                        "horizon": 2,
+                        "data_version": 12,
+                        "years": [2025, 2026],
+                        "total": 1,
+                        "data": [
+                            {
+                                "key": "paraguai",
+                                "observations": 20,
+                                "last_year": 2024,
+                                "last_value": 5121857,
+                                "forecast": [5093420.51, 5067827.4],
+                                "lower": [2950811.35, 2037718.11],
+                                "upper": [7236029.67, 8097936.69]
+                            }
+                        ]
+                    }
+                }
+            }
+        },
+        400: {
+            "description": "Coluna, agrupamento ou filtro inexistente na tabela.",
+            "content": {
+                "application/json": {
+                    "example": {"success": False, "error": "Coluna numérica inválida para producao. Opções: Quantity_L"}
+                }
+            }
+        }
+    })
+async def forecast (
+    dataset: Literal["producao", "processamento", "comercializacao", "importacao", "exportacao"],
+    value: Optional[str] = Query(None),
+    by: Optional[str] = Query(None),
+    model: Literal["holt", "linear"] = Query("holt"),
+    horizon: int = Query(5, ge=1, le=10),
+    history: Optional[int] = Query(20, ge=5, le=60),
+    limit: Optional[int] = Query(None, ge=1),
+    category: Optional[str] = Query(None),
+    group: Optional[str] = Query(None),
+    cultive: Optional[str] = Query(None),
+    product: Optional[str] = Query(None),
+    country: Optional[str] = Query(None),
+    exact: bool = Query(False),
+    fields: Optional[str] = Query(None),
+    format: Literal["rows", "columnar"] = Query("rows"),
+    token_user: str = Depends(verifica_token))  -> dict:
+    """
+        ### Descrição:
+            Previsão dos próximos anos das séries de uma tabela (as mesmas de /timeseries/{dataset}),
+            com modelos leves ajustados sobre o histórico do banco.
+       ### Parâmetros:
+            - headers:
+                - Authorization: Bearer {token}
+            - method: GET
+            - path:
+                - dataset: str (producao, processamento, comercializacao, importacao ou exportacao)
+            - parameters:
+                - value: str (opcional, coluna numérica prevista; padrão, a primeira da tabela)
+                - by: str (opcional, coluna que separa as séries; padrão Country no comércio exterior e Product nas demais)
+                - model: str (opcional, "holt", o padrão, suavização exponencial com tendência amortecida, ou "linear", tendência por mínimos quadrados)
+                - horizon: int (opcional, anos previstos, de 1 a 10, padrão 5)
+                - history: int (opcional, últimos anos usados no ajuste, padrão 20)
+                - limit: int (opcional, quantidade máxima de séries, das maiores para as menores)
+                - category, group, cultive, product, country: str (opcional, filtros como nas rotas da tabela)
+                - exact: bool (opcional, compara o nome inteiro nos filtros em vez de buscar substring)
+                - fields: str (opcional, campos de cada série separados por vírgula, ex.: key,forecast)
+                - format: str (opcional, "rows" ou "columnar")
+        ### Retorno:
+            Retorna os anos previstos e, para cada série, a previsão e uma faixa de cerca de 95%
+            ("lower" e "upper"). Séries com menos de 3 anos com valor vêm com previsão null.
+            Os modelos de todas as séries são ajustados de uma vez e ficam em cache até a
+            próxima publicação de dados.
+        ### Exemplo de uso:
+            curl -X 'GET' 
+            '/forecast/producao?category=vinho%20de%20mesa&product=tinto&exact=true&horizon=3' 
+            -H 'accept: application/json' 
+            -H 'Authorization: Bearer TOKEN_EXAMPLE'
+            Retorna a previsão da produção de vinho de mesa tinto para os próximos 3 anos.
+    """
+    status, content = await query_forecast(dataset, value, by, model, horizon, history, limit, exact,
+                                           category=category, group=group, cultive=cultive,
+                                           product=product, country=country)
+    with span("shape"):
+        status, content = shape_response(status, content, fields, format)
+    return JSONResponse(status_code=status, content=content)
 
-        return JSONResponse(status_code=200, content={"success": True, "total": len(data), "data": data})
+@router.get("/changes", tags=["Vitivinicultura"], responses={
+        200: {
+            "description": "Mudanças publicadas retornadas com sucesso.",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "success": True,
+                        "version": 8,
+                        "total": 1,
+                        "data": [
+                            {
+                                "version": 8,
+                                "dataset": "exportacao",
+                                "Year": 2023,
+                                "Product": "vinhos de mesa",
+                                "key": {"Year": 2023, "Country": "paraguai", "Product": "vinhos de mesa"},
+                                "change": "update",
+                                "old": {"Quantity_Kg": "3.299.013", "Value_USD": "3.869.243"},
+                                "new": {"Quantity_Kg": "3.301.540", "Value_USD": "3.872.010"}
+                            }
+                        ]
+                    }
+                }
+            }
+        }
+    })
+async def changes (
+    since: int = Query(0, ge=0),
+    dataset: Optional[Literal["producao", "processamento", "comercializacao", "importacao", "exportacao"]] = Query(None),
+    limit: int = Query(1000, ge=1, le=10000),
+    token_user: str = Depends(verifica_token))  -> dict:
+    """
+        ### Descrição:
+            Rota do registro de mudanças dos dados (changelog), linha a linha, por versão publicada.
+       ### Parâmetros:
+            - headers:
+                - Authorization: Bearer {token}
+            - method: GET
+            - parameters:
+                - since: int (opcional, última versão já conhecida; padrão 0)
+                - dataset: str (opcional, tabela)
+                - limit: int (opcional, máximo de mudanças, padrão 1000)
+        ### Retorno:
+            Versão atual dos dados e as linhas inseridas ("insert"), alteradas ("update") ou
+            removidas ("delete") depois de `since`, com a chave natural e os valores antigos e novos.
+            "reload" indica que a tabela foi recarregada por inteiro.
+        ### Exemplo de uso:
+            curl -X 'GET' 
+            '/changes?since=7&dataset=exportacao' 
+            -H 'accept: application/json' 
+            -H 'Authorization: Bearer TOKEN_EXAMPLE'
+            Retorna o que mudou na exportação desde a versão 7.
+    """
+    status, content = await query_changes(since, dataset, limit)
+    return JSONResponse(status_code=status, content=content)
 
+@router.post(
+    "/batch", tags=["Vitivinicultura"],
+    responses={
+        200: {
+            "description": "Resultados das consultas retornados com sucesso.",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "success": True,
+                        "total": 2,
+                        "results": [
+                            {
+                                "dataset": "producao",
+                                "status": 200,
+                                "success": True,
+                                "total": 1,
+                                "data": [{"Year": 2020, "Category": "vinho de mesa", "Product": "tinto", "Quantity_L": "175.267.437"}]
+                            },
+                            {
+                                "dataset": "exportacao",
+                                "status": 200,
+                                "success": True,
+                                "total": 1,
+                                "data": [{"Year": 2020, "Country": "paraguai", "Quantity_Kg": "123.456", "Value_USD": "1.000.000", "Product": "vinhos de mesa"}]
+                            }
+                        ]
+                    }
+                }
+            }
+        },
+        422: {
+            "description": "Erro de validação dos dados.",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": [
+                            {
+                                "loc": ["body", "queries", 0, "dataset"],
+                                "msg": "Input should be 'producao', 'processamento', 'comercializacao', 'importacao' or 'exportacao'",
+                                "type": "literal_error"
+                            }
+                        ]
+                    }
+                }
+            }
+        }
+    }
+)
+async def batch(
+    request: BatchRequest = Body(
+        ...,
+        example={
+            "queries": [
+                {"dataset": "producao", "year": 2020, "product": "tinto"},
+                {"dataset": "comercializacao", "year": 2020},
+                {"dataset": "importacao", "year": 2020, "product": "vinhos de mesa"},
+                {"dataset": "exportacao", "year": 2020, "product": "vinhos de mesa", "country": "paraguai"}
+            ]
+        }
+    ),
+    token_user: str = Depends(admit)) -> dict:
+    """
+        ### Descrição:
+            Executa várias consultas em uma única requisição.
+            As consultas rodam em paralelo e compartilham o cache de páginas coletadas do site.
+       ### Parâmetros:
+            - headers:
+                - Authorization: Bearer {token}
+                - content-type: application/json
+            - method: POST
+            - Body JSON:
+                {
+                    "queries": [
+                        {"dataset": "producao", "year": 2020, "product": "tinto"},
+                        {"dataset": "exportacao", "year": 2020, "product": "vinhos de mesa", "country": "paraguai"}
+                    ]
+                }
+                Cada consulta aceita os mesmos parâmetros da rota do dataset (máximo de 20 consultas).
+        ### Retorno:
+            Retorna uma lista com o resultado de cada consulta, na ordem enviada, com o status HTTP de cada uma.
+    """
+    results = await run_batch([query.model_dump() for query in request.queries])
+    return JSONResponse(status_code=200, content={"success": True, "total": len(results), "results": results})
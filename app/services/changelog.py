@@ -0,0 +1,216 @@
+import json
+import sqlite3
+from typing import Iterable, List, Optional, Set, Tuple
+from app.services.datasets import DATASETS, Dataset
+from app.services.dimensions import DIMENSIONS, fact_columns, natural_key, unique_rows
+
+def create_changelog(conn: sqlite3.Connection) -> None:
+    """
+    Cria a tabela `changelog`. Além de "insert", "update" e "delete" por linha, `change` pode ser
+    "reload" (tabela recarregada por inteiro, sem diff) ou "publish" (marca de cada versão publicada).
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS changelog (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            version INTEGER,
+            dataset TEXT,
+            Year INTEGER,
+            product_id INTEGER,
+            row_key TEXT,
+            change TEXT,
+            old TEXT,
+            new TEXT
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_changelog_version ON changelog (version, dataset)")
+
+
+def apply_rows(conn: sqlite3.Connection, dataset: Dataset, fresh: List[tuple], version: int,
+               where: str = "1 = 1", params: Iterable = (), scope: Tuple[str, ...] = ()) -> int:
+    """
+    Compara as linhas novas com as guardadas pela chave natural e grava apenas as diferenças,
+    registrando cada uma no `changelog` com a versão informada.
+
+    Parâmetros:
+        conn (sqlite3.Connection): Conexão com a cópia de staging do banco.
+        dataset (Dataset): Tabela alterada.
+        fresh (List[tuple]): Linhas novas, já codificadas na ordem de `fact_columns(dataset)`.
+        version (int): Versão que será publicada com as mudanças.
+        where (str): Filtro SQL do trecho da tabela que `fresh` substitui (ex.: "Year = ?").
+        params (Iterable): Parâmetros do filtro.
+        scope (Tuple[str, ...]): Colunas que identificam a página do site de cada linha
+            (ex.: ("Year", "product_id")). Linhas guardadas de páginas sem nenhuma linha em
+            `fresh`, como as que o site não devolveu, são mantidas em vez de removidas.
+
+    Retorna:
+        int: Quantidade de linhas inseridas, alteradas ou removidas.
+    """
+    fact = fact_columns(dataset)
+    keys = natural_key(dataset)
+    value_index = [fact.index(column) for column in dataset.quantities]
+    stored = unique_rows(
+        dataset,
+        (row[1:] + (row[0],) for row in conn.execute(f"SELECT id, {', '.join(fact)} FROM {dataset.name} WHERE {where} ORDER BY id", list(params))),
+    )
+    incoming = unique_rows(dataset, fresh)
+    if scope:
+        scope_index = [fact.index(column) for column in scope]
+        pages = {tuple(row[i] for i in scope_index) for row in incoming.values()}
+        stored = {key: row for key, row in stored.items() if tuple(row[i] for i in scope_index) in pages}
+
+    def values(row: tuple) -> str:
+        return json.dumps({column: row[i] for column, i in zip(dataset.quantities, value_index)}, ensure_ascii=False)
+
+    def entry(key: tuple, change: str, old: Optional[tuple], new: Optional[tuple]) -> tuple:
+        row = new or old
+        return (
+            version, dataset.name, row[fact.index("Year")],
+            row[fact.index("product_id")] if "product_id" in fact else None,
+            json.dumps(dict(zip(keys, key)), ensure_ascii=False), change,
+            values(old) if old else None, values(new) if new else None,
+        )
+
+    inserts = [(key, row) for key, row in incoming.items() if key not in stored]
+    deletes = [(key, row) for key, row in stored.items() if key not in incoming]
+    updates = [(key, stored[key], row) for key, row in incoming.items() if key in stored and values(stored[key]) != values(row)]
+    if not (inserts or deletes or updates):
+        return 0
+
+    create_changelog(conn)
+    with conn:
+        conn.executemany(f"DELETE FROM {dataset.name} WHERE id = ?", [(row[-1],) for _, row in deletes])
+        assignments = ", ".join(f"{column} = ?" for column in dataset.quantities)
+        conn.executemany(
+            f"UPDATE {dataset.name} SET {assignments} WHERE id = ?",
+            [tuple(new[i] for i in value_index) + (old[-1],) for _, old, new in updates],
+        )
+        conn.executemany(
+            f"INSERT INTO {dataset.name} ({', '.join(fact)}) VALUES ({', '.join('?' for _ in fact)})",
+            [row for _, row in inserts],
+        )
+        log = (
+            [entry(key, "insert", None, row) for key, row in inserts]
+            + [entry(key, "update", old, new) for key, old, new in updates]
+            + [entry(key, "delete", row, None) for key, row in deletes]
+        )
+        conn.executemany(
+            "INSERT INTO changelog (version, dataset, Year, product_id, row_key, change, old, new) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            log,
+        )
+    return len(log)
+
+
+def record_reload(conn: sqlite3.Connection, version: int, name: str) -> None:
+    """
+    Registra que a tabela foi recarregada por inteiro, sem diff linha a linha.
+    """
+    create_changelog(conn)
+    conn.execute("INSERT INTO changelog (version, dataset, change) VALUES (?, ?, 'reload')", (version, name))
+
+
+def record_publish(conn: sqlite3.Connection, version: int) -> None:
+    """
+    Marca a versão como coberta pelo changelog. Chamada pela publicação (app/services/publish.py).
+    """
+    create_changelog(conn)
+    conn.execute("INSERT INTO changelog (version, change) VALUES (?, 'publish')", (version,))
+
+
+def affected_years(conn: sqlite3.Connection, version: int, names: Iterable[str]) -> Optional[Set[int]]:
+    """
+    Anos alterados nas tabelas informadas pela carga da versão `version`, ainda não publicada.
+
+    Retorna:
+        Optional[Set[int]]: Anos com alguma mudança, ou None se alguma das tabelas foi recarregada por inteiro.
+    """
+    names = list(names)
+    placeholders = ", ".join("?" for _ in names)
+    try:
+        rows = conn.execute(
+            f"SELECT DISTINCT change, Year FROM changelog WHERE version = ? AND dataset IN ({placeholders})",
+            [version] + names,
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return set()
+    if any(change == "reload" for change, _ in rows):
+        return None
+    return {year for _, year in rows}
+
+
+def changed_datasets(conn: sqlite3.Connection, since: int) -> Optional[Set[str]]:
+    """
+    Tabelas alteradas nas versões publicadas depois de `since`.
+
+    Parâmetros:
+        conn (sqlite3.Connection): Conexão com o banco publicado.
+        since (int): Última versão já conhecida por quem pergunta (ex.: o motor em memória).
+
+    Retorna:
+        Optional[Set[str]]: Nomes das tabelas, ou None se alguma dessas versões foi publicada
+        antes do changelog existir e não dá para saber o que mudou.
+    """
+    try:
+        current = conn.execute("SELECT COALESCE(MAX(version), 0) FROM dataset_versions").fetchone()[0]
+        rows = conn.execute("SELECT version, dataset, change FROM changelog WHERE version > ?", (since,)).fetchall()
+    except sqlite3.OperationalError:
+        return None
+    published = {version for version, _, change in rows if change == "publish"}
+    if current < since or published != set(range(since + 1, current + 1)):
+        return None
+    return {dataset for _, dataset, change in rows if dataset in DATASETS}
+
+
+def changes_since(db_path: str, since: int, name: Optional[str] = None, limit: int = 1000) -> Tuple[int, List[dict]]:
+    """
+    Mudanças linha a linha publicadas depois da versão `since`, da mais antiga para a mais nova.
+
+    Parâmetros:
+        db_path (str): Caminho do banco publicado.
+        since (int): Última versão já conhecida por quem pergunta.
+        name (str): Restringe a uma tabela.
+        limit (int): Máximo de mudanças devolvidas.
+
+    Retorna:
+        Tuple[int, List[dict]]: Versão atual dos dados e as mudanças. Recargas completas aparecem
+        com `change` "reload" e sem chave: quem guarda cache da tabela deve descartá-lo por inteiro.
+    """
+    query = '''
+        SELECT c.version, c.dataset, c.Year, products.name, c.row_key, c.change, c.old, c.new
+        FROM changelog c LEFT JOIN products ON products.id = c.product_id
+        WHERE c.version > ? AND c.change != 'publish'
+    '''
+    params: list = [since]
+    if name is not None:
+        query += " AND c.dataset = ?"
+        params.append(name)
+    query += " ORDER BY c.seq LIMIT ?"
+    params.append(limit)
+    conn = sqlite3.connect(db_path)
+    try:
+        current = conn.execute("SELECT COALESCE(MAX(version), 0) FROM dataset_versions").fetchone()[0]
+        rows = conn.execute(query, params).fetchall()
+        names = {
+            id_column: dict(conn.execute(f"SELECT id, name FROM {table}"))
+            for table, id_column in DIMENSIONS.values()
+        }
+    finally:
+        conn.close()
+
+    def decode(key: Optional[str]) -> Optional[dict]:
+        # Troca as chaves de país e produto pelos nomes de exibição.
+        if not key:
+            return None
+        labels = {id_column: column for column, (_, id_column) in DIMENSIONS.items()}
+        return {
+            labels.get(name, name): names[name].get(value) if name in names else value
+            for name, value in json.loads(key).items()
+        }
+
+    return current, [
+        {
+            "version": version, "dataset": dataset, "Year": year, "Product": product,
+            "key": decode(key), "change": change,
+            "old": json.loads(old) if old else None, "new": json.loads(new) if new else None,
+        }
+        for version, dataset, year, product, key, change, old, new in rows
+    ]
@@ -0,0 +1,252 @@
+import io
+import logging
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+import requests
+from app.core import logging_config
+from app.core.database_config import DB_PATH
+from app.core.settings import CSV_SOURCE
+from app.core.timing import span
+from app.services.changelog import apply_rows, record_reload
+from app.services.datasets import DATASETS, MARKERS
+from app.services.dimensions import create_fact_table, encode_frame, fact_columns
+from app.services.publish import staging
+
+# Arquivos de download de cada tabela, na ordem das opções do site, com o nome do produto
+# gravado pelos scrapers. None indica página sem opções.
+FILES: Dict[str, List[Tuple[str, Optional[str]]]] = {
+    "producao": [("Producao.csv", None)],
+    "processamento": [
+        ("ProcessaViniferas.csv", "viníferas"),
+        ("ProcessaAmericanas.csv", "americanas e híbridas"),
+        ("ProcessaMesa.csv", "uvas de mesa"),
+        ("ProcessaSemclass.csv", "sem classificação"),
+    ],
+    "comercializacao": [("Comercio.csv", None)],
+    "importacao": [
+        ("ImpVinhos.csv", "vinhos de mesa"),
+        ("ImpEspumantes.csv", "espumantes"),
+        ("ImpFrescas.csv", "uvas frescas"),
+        ("ImpPassas.csv", "uvas passas"),
+        ("ImpSuco.csv", "suco de uva"),
+    ],
+    "exportacao": [
+        ("ExpVinho.csv", "vinhos de mesa"),
+        ("ExpEspumantes.csv", "espumantes"),
+        ("ExpUva.csv", "uvas frescas"),
+        ("ExpSuco.csv", "suco de uva"),
+    ],
+}
+
+# Colunas de ano ("1970"). Nos arquivos de comércio cada ano aparece duas vezes, quantidade
+# e valor, e o pandas renomeia a segunda para "1970.1".
+_YEAR = re.compile(r"^\d{4}(\.1)?$")
+
+
+def read_file(source: str, filename: str) -> str:
+    """
+    Lê um arquivo CSV do site, de uma URL base ou de um diretório local.
+
+    Parâmetros:
+        source (str): URL base dos downloads ou diretório com os arquivos.
+        filename (str): Nome do arquivo (ex.: "Producao.csv").
+
+    Retorna:
+        str: Conteúdo do arquivo.
+    """
+    if source.startswith(("http://", "https://")):
+        url = f"{source.rstrip('/')}/{filename}"
+        with span("fetch"):
+            response = requests.get(url, timeout=60)
+        response.raise_for_status()
+        content = response.content
+    else:
+        with open(os.path.join(source, filename), "rb") as f:
+            content = f.read()
+    try:
+        return content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return content.decode("latin-1")
+
+
+def _frame(text: str) -> pd.DataFrame:
+    # Os arquivos de processamento usam tabulação; os demais, ponto e vírgula.
+    header = text.split("\n", 1)[0]
+    sep = "\t" if header.count("\t") > header.count(";") else ";"
+    frame = pd.read_csv(io.StringIO(text), sep=sep, dtype=str, keep_default_na=False)
+    frame.columns = [str(column).strip() for column in frame.columns]
+    return frame
+
+
+def _numbers(column: pd.Series) -> pd.Series:
+    return pd.to_numeric(column.str.strip(), errors="coerce")
+
+
+def _quantities(column: pd.Series, zero: str = "-") -> pd.Series:
+    """
+    Converte os valores do CSV para o texto das páginas do site ("1.234.567", "-", "nd").
+    O site mostra os zeros das linhas como "-" e os dos totais como "0".
+    """
+    text = column.fillna("").astype(str).str.strip()
+    numbers = pd.to_numeric(text, errors="coerce")
+    result = text.where(text.isin(list(MARKERS)), "nd").mask(text == "", "-")
+    valid = numbers.dropna().round().astype("int64")
+    result.loc[valid.index] = valid.map(lambda value: f"{value:,}".replace(",", "."))
+    return result.mask(numbers == 0, zero)
+
+
+def _hierarchy(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Desfaz a tabela larga (um item por linha, um ano por coluna) das páginas com itens e subitens.
+
+    Retorna:
+        pd.DataFrame: Colunas Year, Group, Name, IsGroup e Value, ordenadas por ano e,
+        dentro do ano, na ordem do arquivo.
+    """
+    labels = [column for column in frame.columns if not _YEAR.match(column)]
+    years = [column for column in frame.columns if _YEAR.match(column)]
+    name = frame[labels[-1]].str.strip()
+    control = next((frame[column] for column in labels if column.lower() == "control"), None)
+    # Itens têm o próprio nome no controle; subitens levam um prefixo ("vm_Tinto").
+    is_group = ~control.str.contains("_", regex=False) if control is not None else name.str.isupper()
+    wide = frame[years].assign(Group=name.where(is_group).ffill().str.lower(), Name=name.str.lower(), IsGroup=is_group)
+    long = wide.melt(id_vars=["Group", "Name", "IsGroup"], var_name="Year", value_name="Value")
+    long["Year"] = long["Year"].astype(int)
+    return long
+
+
+def _trade(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Desfaz a tabela larga dos arquivos de importação e exportação (país por linha, quantidade
+    e valor por ano) e acrescenta a linha "total" de cada ano, como no rodapé das páginas.
+    """
+    labels = [column for column in frame.columns if not _YEAR.match(column)]
+    years = [column for column in frame.columns if re.match(r"^\d{4}$", column)]
+    country = frame[labels[-1]].str.strip().str.lower()
+    quantity = frame[years].assign(Country=country).melt(id_vars="Country", var_name="Year", value_name="Quantity_Kg")
+    value = frame[[f"{year}.1" for year in years]].melt(value_name="Value_USD")
+    long = quantity.assign(Value_USD=value["Value_USD"].to_numpy())
+    long["Year"] = long["Year"].astype(int)
+
+    totals = long.assign(
+        Quantity_Kg=_numbers(long["Quantity_Kg"]), Value_USD=_numbers(long["Value_USD"])
+    ).groupby("Year", as_index=False)[["Quantity_Kg", "Value_USD"]].sum().assign(Country="total")
+    for column in ("Quantity_Kg", "Value_USD"):
+        long[column] = _quantities(long[column])
+        totals[column] = _quantities(totals[column].astype("int64").astype(str), zero="0")
+    return pd.concat([long, totals], ignore_index=True).sort_values("Year", kind="stable", ignore_index=True)
+
+
+def parse_producao(frame: pd.DataFrame, product: Optional[str] = None) -> pd.DataFrame:
+    long = _hierarchy(frame)
+    long["Product"] = long["Name"].where(~long["IsGroup"], "todos da categoria")
+    long["Quantity_L"] = _quantities(long["Value"])
+    # A página traz no rodapé o total dos itens, que o scraper grava junto da última categoria.
+    groups = long[long["IsGroup"]]
+    totals = _numbers(groups["Value"]).groupby(groups["Year"]).sum().astype("int64")
+    totals = pd.DataFrame({
+        "Year": totals.index,
+        "Category": long["Group"].iloc[-1],
+        "Product": "total",
+        "Quantity_L": _quantities(totals.astype(str), zero="0").to_numpy(),
+    })
+    long = long.rename(columns={"Group": "Category"})
+    return pd.concat([long, totals], ignore_index=True).sort_values("Year", kind="stable", ignore_index=True)
+
+
+def parse_processamento(frame: pd.DataFrame, product: Optional[str] = None) -> pd.DataFrame:
+    long = _hierarchy(frame)
+    return long.assign(GroupName=long["Group"], Cultive=long["Name"], Quantity_Kg=_quantities(long["Value"]), Product=product)
+
+
+def parse_comercializacao(frame: pd.DataFrame, product: Optional[str] = None) -> pd.DataFrame:
+    long = _hierarchy(frame)
+    return long.assign(GroupName=long["Group"], Product=long["Name"], Quantity_L=_quantities(long["Value"]))
+
+
+def parse_trade(frame: pd.DataFrame, product: Optional[str] = None) -> pd.DataFrame:
+    return _trade(frame).assign(Product=product)
+
+
+PARSERS = {
+    "producao": parse_producao,
+    "processamento": parse_processamento,
+    "comercializacao": parse_comercializacao,
+    "importacao": parse_trade,
+    "exportacao": parse_trade,
+}
+
+
+def load_dataset(name: str, source: str = CSV_SOURCE) -> pd.DataFrame:
+    """
+    Lê e converte todos os arquivos de uma tabela para as colunas gravadas pelos scrapers.
+
+    Parâmetros:
+        name (str): Nome da tabela.
+        source (str): URL base dos downloads ou diretório com os arquivos.
+
+    Retorna:
+        pd.DataFrame: Linhas de todos os anos e opções, na ordem em que os scrapers as gravariam
+        (por ano e, dentro do ano, por opção).
+    """
+    columns = list(DATASETS[name].columns)
+    frames = [PARSERS[name](_frame(read_file(source, filename)), product)[columns] for filename, product in FILES[name]]
+    return pd.concat(frames, ignore_index=True).sort_values("Year", kind="stable", ignore_index=True)
+
+
+def ingest(source: str = CSV_SOURCE, db_path: str = DB_PATH, names: Optional[List[str]] = None) -> Optional[int]:
+    """
+    Recarrega as tabelas a partir dos arquivos CSV do site, numa única publicação.
+
+    Todos os arquivos são lidos e convertidos antes de abrir o staging; se algum falhar,
+    nada é publicado. Tabelas já existentes recebem apenas as linhas que mudaram, registradas
+    no `changelog`, e as tabelas são trocadas juntas, na mesma versão. Páginas (ano e opção)
+    ausentes dos arquivos, como um ano que os scrapers já gravaram e os downloads ainda não
+    trazem, são mantidas.
+
+    Parâmetros:
+        source (str): URL base dos downloads ou diretório com os arquivos.
+        db_path (str): Caminho do banco publicado.
+        names (List[str]): Tabelas a recarregar. Por padrão, todas.
+
+    Retorna:
+        Optional[int]: Versão publicada, ou None se nenhuma linha mudou.
+    """
+    names = names or list(FILES)
+    with ThreadPoolExecutor(max_workers=len(names)) as executor:
+        frames = dict(zip(names, executor.map(lambda name: load_dataset(name, source), names)))
+
+    with staging(db_path, source="csv") as stage:
+        changes = 0
+        for name, frame in frames.items():
+            dataset = DATASETS[name]
+            exists = stage.conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()
+            create_fact_table(stage.conn, dataset)
+            encoded = encode_frame(stage.conn, dataset, frame)
+            if exists:
+                rows = encoded.astype(object).where(encoded.notna(), None).itertuples(index=False, name=None)
+                # Como nos scrapers, anos (e opções) que os arquivos ainda não trazem ficam como estão.
+                scope = ("Year", "product_id") if "product_id" in fact_columns(dataset) else ("Year",)
+                changed = apply_rows(stage.conn, dataset, list(rows), stage.next_version, scope=scope)
+            else:
+                encoded.to_sql(name, stage.conn, if_exists="append", index=False)
+                record_reload(stage.conn, stage.next_version, name)
+                changed = len(encoded)
+            changes += changed
+            logging.info(f"'{name}' lida dos arquivos CSV: {len(frame)} linhas, {changed} alteradas.")
+        if not changes:
+            stage.discard()
+    return stage.version
+
+
+if __name__ == "__main__":
+    """
+        Para carregar todas as tabelas pelos arquivos CSV do site, execute no terminal:
+        python -m app.services.csv_ingest [URL base ou diretório local]
+    """
+    logging_config()
+    ingest(sys.argv[1] if len(sys.argv) > 1 else CSV_SOURCE)
@@ -0,0 +1,103 @@
+from typing import Dict, NamedTuple, Tuple, Type
+from app.services.records import (
+    Row,
+    ProducaoRow,
+    ProcessamentoRow,
+    ComercializacaoRow,
+    TradeRow,
+)
+
+
+class Dataset(NamedTuple):
+    """
+    Descrição de uma das tabelas do Vitibrasil.
+
+    Atributos:
+        name (str): Nome da tabela no banco e da rota na API.
+        row_type (Type[Row]): Registro usado pelo scraper. A ordem de `__slots__` é a ordem das colunas.
+        categorical (Tuple[str, ...]): Colunas de texto com poucos valores distintos.
+        quantities (Tuple[str, ...]): Colunas numéricas armazenadas como texto no site ("1.234.567").
+    """
+    name: str
+    row_type: Type[Row]
+    categorical: Tuple[str, ...]
+    quantities: Tuple[str, ...]
+
+    @property
+    def columns(self) -> Tuple[str, ...]:
+        return self.row_type.__slots__
+
+
+DATASETS: Dict[str, Dataset] = {
+    "producao": Dataset("producao", ProducaoRow, ("Category", "Product"), ("Quantity_L",)),
+    "processamento": Dataset("processamento", ProcessamentoRow, ("GroupName", "Cultive", "Product"), ("Quantity_Kg",)),
+    "comercializacao": Dataset("comercializacao", ComercializacaoRow, ("GroupName", "Product"), ("Quantity_L",)),
+    "importacao": Dataset("importacao", TradeRow, ("Country", "Product"), ("Quantity_Kg", "Value_USD")),
+    "exportacao": Dataset("exportacao", TradeRow, ("Country", "Product"), ("Quantity_Kg", "Value_USD")),
+}
+
+# Filtros das consultas por coluna categórica (exportações e séries) e a coluna de cada um.
+FILTER_COLUMNS: Dict[str, str] = {
+    "category": "Category",
+    "group": "GroupName",
+    "cultive": "Cultive",
+    "product": "Product",
+    "country": "Country",
+}
+
+# Linhas de total que o site intercala com os itens: coluna e valores normalizados que as
+# identificam. Nas tabelas de comércio é o "país" total, que também fica fora das participações
+# calculadas na tabela `trade`.
+TOTAL_ROWS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "producao": ("Product", ("todos da categoria", "total")),
+    "importacao": ("Country", ("total",)),
+    "exportacao": ("Country", ("total",)),
+}
+
+# Coluna do grupo e coluna do item nas tabelas em que a linha do grupo repete o nome dele no
+# item e traz a soma dos itens listados abaixo. Grupos sem itens têm só essa linha, que é o dado.
+GROUP_ROWS: Dict[str, Tuple[str, str]] = {
+    "processamento": ("GroupName", "Cultive"),
+    "comercializacao": ("GroupName", "Product"),
+}
+
+# Marcadores usados pelo site no lugar de números. São guardados como valores negativos
+# nas colunas numéricas para que a resposta da API reproduza o texto original.
+MARKERS: Dict[str, int] = {"-": -1, "*": -2, "nd": -3}
+_MARKER_TEXT = {code: text for text, code in MARKERS.items()}
+
+
+def parse_quantity(text) -> int:
+    """
+    Converte uma quantidade do site ("1.234.567", "-", "nd") em inteiro.
+
+    Parâmetros:
+        text (str): Valor coletado do site.
+
+    Retorna:
+        int: Quantidade, ou o código negativo do marcador.
+    """
+    if text is None:
+        return MARKERS["-"]
+    text = text.strip()
+    if text in MARKERS:
+        return MARKERS[text]
+    try:
+        return int(text.replace(".", ""))
+    except ValueError:
+        return MARKERS["nd"]
+
+
+def format_quantity(value: int) -> str:
+    """
+    Operação inversa de `parse_quantity`.
+
+    Parâmetros:
+        value (int): Quantidade ou código de marcador.
+
+    Retorna:
+        str: Texto no formato do site.
+    """
+    if value < 0:
+        return _MARKER_TEXT.get(value, "-")
+    return f"{value:,}".replace(",", ".")
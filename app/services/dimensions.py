@@ -0,0 +1,368 @@
+import logging
+import sqlite3
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+import pandas as pd
+from app.services.datasets import DATASETS, MARKERS, Dataset
+from app.util.helpers import normalize_text
+
+# Colunas de texto substituídas por chaves inteiras nas tabelas de fatos.
+DIMENSIONS = {
+    "Country": ("countries", "country_id"),
+    "Product": ("products", "product_id"),
+}
+
+# Nome de exibição e código ISO 3166-1 alfa-2 dos países que aparecem no site.
+# Países extintos usam o código da ISO 3166-3; agregados do site ("total", "outros") não têm código.
+COUNTRIES: Tuple[Tuple[str, Optional[str]], ...] = (
+    ("afeganistão", "AF"), ("áfrica do sul", "ZA"), ("alemanha", "DE"),
+    ("alemanha, república democrática", "DD"), ("angola", "AO"), ("anguilla", "AI"),
+    ("antígua e barbuda", "AG"), ("antilhas holandesas", "AN"), ("arábia saudita", "SA"),
+    ("argentina", "AR"), ("argélia", "DZ"), ("armênia", "AM"), ("aruba", "AW"),
+    ("austrália", "AU"), ("áustria", "AT"), ("bahamas", "BS"), ("bahrein", "BH"),
+    ("bangladesh", "BD"), ("barbados", "BB"), ("bélgica", "BE"), ("belize", "BZ"),
+    ("benin", "BJ"), ("bermudas", "BM"), ("birmânia", "MM"), ("bolívia", "BO"),
+    ("bósnia-herzegovina", "BA"), ("brasil", "BR"), ("bulgária", "BG"), ("burquina faso", "BF"),
+    ("cabo verde", "CV"), ("camarões", "CM"), ("canadá", "CA"), ("catar", "QA"),
+    ("cayman, ilhas", "KY"), ("chile", "CL"), ("china", "CN"), ("chipre", "CY"),
+    ("cingapura", "SG"), ("cocos (keeling), ilhas", "CC"), ("colômbia", "CO"), ("comores", "KM"),
+    ("congo", "CG"), ("cook, ilhas", "CK"), ("coreia do norte", "KP"), ("coreia do sul", "KR"),
+    ("costa do marfim", "CI"), ("costa rica", "CR"), ("coveite", "KW"), ("croácia", "HR"),
+    ("cuba", "CU"), ("curaçao", "CW"), ("dinamarca", "DK"), ("djibuti", "DJ"),
+    ("dominica", "DM"), ("egito", "EG"), ("el salvador", "SV"), ("emirados árabes unidos", "AE"),
+    ("equador", "EC"), ("eslováquia", "SK"), ("eslovênia", "SI"), ("espanha", "ES"),
+    ("estados unidos", "US"), ("estônia", "EE"), ("falkland (ilhas malvinas)", "FK"),
+    ("faroé, ilhas", "FO"), ("filipinas", "PH"), ("finlândia", "FI"), ("frança", "FR"),
+    ("gabão", "GA"), ("gana", "GH"), ("geórgia", "GE"),
+    ("geórgia do sul e sandwich do sul, ilhas", "GS"), ("gibraltar", "GI"), ("granada", "GD"),
+    ("grécia", "GR"), ("guadalupe", "GP"), ("guatemala", "GT"), ("guiana", "GY"),
+    ("guiana francesa", "GF"), ("guiné-bissau", "GW"), ("guiné equatorial", "GQ"),
+    ("haiti", "HT"), ("honduras", "HN"), ("hong kong", "HK"), ("hungria", "HU"),
+    ("ilha de man", "IM"), ("ilhas virgens", "VG"), ("índia", "IN"), ("indonésia", "ID"),
+    ("iraque", "IQ"), ("irlanda", "IE"), ("irã", "IR"), ("islândia", "IS"), ("israel", "IL"),
+    ("itália", "IT"), ("iugoslávia", "YU"), ("jamaica", "JM"), ("japão", "JP"),
+    ("jordânia", "JO"), ("jérsei", "JE"), ("letônia", "LV"), ("libéria", "LR"),
+    ("lituânia", "LT"), ("luxemburgo", "LU"), ("líbano", "LB"), ("líbia", "LY"),
+    ("macau", "MO"), ("macedônia", "MK"), ("malavi", "MW"), ("maldivas", "MV"), ("malta", "MT"),
+    ("malásia", "MY"), ("marianas do norte, ilhas", "MP"), ("marrocos", "MA"),
+    ("marshall, ilhas", "MH"), ("martinica", "MQ"), ("maurício", "MU"), ("mauritânia", "MR"),
+    ("méxico", "MX"), ("moldávia", "MD"), ("mongólia", "MN"), ("montenegro", "ME"),
+    ("moçambique", "MZ"), ("mônaco", "MC"), ("namíbia", "NA"), ("nicarágua", "NI"),
+    ("nigéria", "NG"), ("noruega", "NO"), ("nova caledônia", "NC"), ("nova zelândia", "NZ"),
+    ("omã", "OM"), ("palau", "PW"), ("panamá", "PA"), ("paquistão", "PK"), ("paraguai", "PY"),
+    ("países baixos", "NL"), ("peru", "PE"), ("pitcairn", "PN"), ("polônia", "PL"),
+    ("porto rico", "PR"), ("portugal", "PT"), ("quirguistão", "KG"), ("quênia", "KE"),
+    ("reino unido", "GB"), ("república centro africana", "CF"), ("república dominicana", "DO"),
+    ("república tcheca", "CZ"), ("romênia", "RO"), ("rússia", "RU"), ("samoa americana", "AS"),
+    ("san marino", "SM"), ("senegal", "SN"), ("serra leoa", "SL"), ("sri lanka", "LK"),
+    ("suazilândia", "SZ"), ("suriname", "SR"), ("suécia", "SE"), ("suíça", "CH"),
+    ("são cristóvão e névis", "KN"), ("são tomé e príncipe", "ST"),
+    ("são vicente e granadinas", "VC"), ("sérvia", "RS"), ("síria", "SY"), ("tailândia", "TH"),
+    ("taiwan", "TW"), ("tanzânia", "TZ"), ("togo", "TG"), ("toquelau", "TK"),
+    ("trindade e tobago", "TT"), ("tunísia", "TN"), ("turcas e caicos, ilhas", "TC"),
+    ("turquia", "TR"), ("tuvalu", "TV"), ("ucrânia", "UA"), ("uruguai", "UY"),
+    ("uzbequistão", "UZ"), ("vanuatu", "VU"), ("venezuela", "VE"), ("vietnã", "VN"),
+    ("wallis e futuna, ilhas", "WF"),
+    ("total", None), ("outros", None), ("não declarados", None), ("não consta na tabela", None),
+    ("provisão de navios e aeronaves", None),
+)
+
+# Grafias alternativas usadas pelo site em anos diferentes, já normalizadas.
+COUNTRY_ALIASES: Dict[str, str] = {
+    "alemanha, republica democratica da": "alemanha, republica democratica",
+    "barein": "bahrein",
+    "belice": "belize",
+    "bosnia": "bosnia-herzegovina",
+    "camores": "comores",
+    "china continental": "china",
+    "coreia do sul, republica da": "coreia do sul",
+    "coreia do sul, republica": "coreia do sul",
+    "coreia, republica sul": "coreia do sul",
+    "coveite (kuweit)": "coveite",
+    "dominica, ilha de": "dominica",
+    "emirados": "emirados arabes unidos",
+    "eslovaca, republica": "eslovaquia",
+    "falkland (malvinas)": "falkland (ilhas malvinas)",
+    "filanldia": "finlandia",
+    "guiana britanica": "guiana",
+    "guine bissau": "guine-bissau",
+    "outros(1)": "outros",
+    "paises baixos (holanda)": "paises baixos",
+    "republica federativa da russia": "russia",
+    "russia, federacao da": "russia",
+    "singapura": "cingapura",
+    "taiwan (formosa)": "taiwan",
+    "tcheca, republica": "republica tcheca",
+    "trinidade e tobago": "trindade e tobago",
+    "trinidade tobago": "trindade e tobago",
+}
+
+_COUNTRY_INFO = {normalize_text(name): (name, iso2) for name, iso2 in COUNTRIES}
+
+
+# Grafias de cada país pela chave canônica, usadas nos filtros (`search_names`).
+_SPELLINGS: Dict[str, Tuple[str, ...]] = {
+    key: (key,) + tuple(alias for alias, canonical in COUNTRY_ALIASES.items() if canonical == key)
+    for key in set(COUNTRY_ALIASES.values())
+}
+
+
+def country_key(name: str) -> str:
+    key = normalize_text(name)
+    return COUNTRY_ALIASES.get(key, key)
+
+
+@lru_cache(maxsize=None)
+def search_names(column: str, value: str) -> Tuple[str, ...]:
+    """
+    Formas normalizadas pelas quais um valor é encontrado nos filtros: a própria grafia e,
+    para países, a chave canônica e as grafias alternativas de `COUNTRY_ALIASES`. Assim
+    "singapura" encontra "cingapura" tanto no banco quanto nas linhas coletadas do site.
+    """
+    name = normalize_text(value)
+    if column != "Country":
+        return (name,)
+    spellings = _SPELLINGS.get(country_key(value), (country_key(value),))
+    return (name,) + tuple(spelling for spelling in spellings if spelling != name)
+
+
+def _entry(column: str, value: str) -> Tuple[str, str, Optional[str]]:
+    """
+    Chave canônica, nome de exibição e código ISO de um valor coletado do site.
+    Nomes desconhecidos usam a própria grafia como nome de exibição.
+    """
+    if column == "Country":
+        key = country_key(value)
+        name, iso2 = _COUNTRY_INFO.get(key, (value.strip(), None))
+        return key, name, iso2
+    return normalize_text(value), " ".join(value.split()), None
+
+
+def create_dimensions(conn: sqlite3.Connection) -> None:
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS countries (
+            id INTEGER PRIMARY KEY,
+            key TEXT NOT NULL UNIQUE,
+            name TEXT NOT NULL,
+            iso2 TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY,
+            key TEXT NOT NULL UNIQUE,
+            name TEXT NOT NULL
+        )
+    ''')
+
+
+def dimension_ids(conn: sqlite3.Connection, column: str, values: Iterable[Optional[str]]) -> Dict[Optional[str], Optional[int]]:
+    """
+    Chave inteira de cada valor, cadastrando na dimensão os que ainda não existem.
+
+    Parâmetros:
+        conn (sqlite3.Connection): Conexão com o banco de staging.
+        column (str): "Country" ou "Product".
+        values (Iterable[str]): Valores como vieram do site.
+
+    Retorna:
+        Dict[str, int]: Valor original e sua chave. None continua None.
+    """
+    table, _ = DIMENSIONS[column]
+    create_dimensions(conn)
+    entries = {value: _entry(column, value) for value in set(values) if value is not None}
+    if table == "countries":
+        conn.executemany("INSERT OR IGNORE INTO countries (key, name, iso2) VALUES (?, ?, ?)", entries.values())
+    else:
+        conn.executemany("INSERT OR IGNORE INTO products (key, name) VALUES (?, ?)", [entry[:2] for entry in entries.values()])
+    ids = dict(conn.execute(f"SELECT key, id FROM {table}"))
+    mapping = {value: ids[entry[0]] for value, entry in entries.items()}
+    mapping[None] = None
+    return mapping
+
+
+def fact_columns(dataset: Dataset) -> Tuple[str, ...]:
+    """
+    Colunas da tabela de fatos no banco: as do registro, com país e produto trocados pelas chaves.
+    """
+    return tuple(DIMENSIONS[column][1] if column in DIMENSIONS else column for column in dataset.columns)
+
+
+def natural_key(dataset: Dataset) -> Tuple[str, ...]:
+    """
+    Colunas que identificam uma linha da tabela de fatos: todas menos as quantidades
+    (ano, produto e grupo, cultivar ou país).
+    """
+    return tuple(column for column in fact_columns(dataset) if column not in dataset.quantities)
+
+
+def unique_rows(dataset: Dataset, rows: Iterable[tuple]) -> Dict[tuple, tuple]:
+    """
+    Linhas por chave natural. O site às vezes lista o mesmo país com duas grafias na mesma
+    página ("cingapura" e "singapura"), uma delas sem valor: nesse caso prevalece a linha
+    com números; fora isso, vale a última.
+
+    Parâmetros:
+        dataset (Dataset): Tabela de fatos.
+        rows (Iterable[tuple]): Linhas já codificadas, começando pelas colunas de `fact_columns(dataset)`.
+
+    Retorna:
+        Dict[tuple, tuple]: Chave natural e a linha escolhida.
+    """
+    fact = fact_columns(dataset)
+    key_index = [fact.index(column) for column in natural_key(dataset)]
+    value_index = [fact.index(column) for column in dataset.quantities]
+    keyed: Dict[tuple, tuple] = {}
+    for row in rows:
+        key = tuple(row[i] for i in key_index)
+        if key in keyed and _is_empty(row, value_index) and not _is_empty(keyed[key], value_index):
+            continue
+        keyed[key] = row
+    return keyed
+
+
+def _is_empty(row: tuple, value_index: List[int]) -> bool:
+    return all(row[i] in MARKERS or not row[i] for i in value_index)
+
+
+def create_fact_table(conn: sqlite3.Connection, dataset: Dataset) -> None:
+    """
+    Cria a tabela de fatos do dataset, se ainda não existir, com índice sobre (Year, product_id).
+    """
+    definitions = []
+    for column in fact_columns(dataset):
+        if column == "Year":
+            definitions.append("Year INTEGER")
+        elif column.endswith("_id"):
+            table = next(table for table, id_column in DIMENSIONS.values() if id_column == column)
+            definitions.append(f"{column} INTEGER REFERENCES {table}(id)")
+        else:
+            definitions.append(f"{column} TEXT")
+    create_dimensions(conn)
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {dataset.name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            {", ".join(definitions)}
+        )
+    ''')
+    # Usado pelas atualizações por (ano, produto) do scheduler; as leituras da API vêm do motor em memória.
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{dataset.name}_year_product ON {dataset.name} (Year, product_id)")
+
+
+def create_unique_key(conn: sqlite3.Connection, dataset: Dataset) -> Optional[int]:
+    """
+    Cria o índice UNIQUE sobre a chave natural da tabela, usado pelos upserts da carga em lote
+    (app/services/writer.py). Linhas repetidas na chave, deixadas por cargas antigas que só
+    acrescentavam linhas ou por grafias diferentes do mesmo país, são removidas antes, com a
+    mesma regra de `unique_rows`: fica a linha com números e, entre elas, a mais recente.
+
+    Parâmetros:
+        conn (sqlite3.Connection): Conexão com o banco de staging.
+        dataset (Dataset): Tabela de fatos, já existente.
+
+    Retorna:
+        Optional[int]: Linhas removidas, ou None se o índice já existia.
+    """
+    index = f"idx_{dataset.name}_key"
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index,)).fetchone():
+        return None
+    keys = ", ".join(natural_key(dataset))
+    markers = ", ".join(f"'{marker}'" for marker in MARKERS)
+    empty = " AND ".join(f"COALESCE({column}, '') IN ('', {markers})" for column in dataset.quantities)
+    removed = conn.execute(f'''
+        DELETE FROM {dataset.name} WHERE id NOT IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (PARTITION BY {keys} ORDER BY {empty}, id DESC) AS rank
+                FROM {dataset.name}
+            ) WHERE rank = 1
+        )
+    ''').rowcount
+    conn.execute(f"CREATE UNIQUE INDEX {index} ON {dataset.name} ({keys})")
+    if removed:
+        logging.warning(f"Tabela '{dataset.name}': {removed} linhas repetidas removidas.")
+    return removed
+
+
+def compact_tables(conn: sqlite3.Connection) -> Dict[str, int]:
+    """
+    Aplica `create_unique_key` às tabelas de fatos que ainda não têm o índice.
+
+    Retorna:
+        Dict[str, int]: Linhas removidas de cada tabela que recebeu o índice.
+    """
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    compacted = {}
+    for name, dataset in DATASETS.items():
+        if name in tables:
+            removed = create_unique_key(conn, dataset)
+            if removed is not None:
+                compacted[name] = removed
+    return compacted
+
+
+def encode_frame(conn: sqlite3.Connection, dataset: Dataset, frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Troca país e produto pelas chaves inteiras, deixando o DataFrame no formato da tabela de fatos.
+    """
+    frame = frame.copy()
+    for column, (_, id_column) in DIMENSIONS.items():
+        if column in frame:
+            ids = dimension_ids(conn, column, frame[column].unique())
+            frame[id_column] = frame.pop(column).map(ids).astype("Int64")
+    columns = [column for column in fact_columns(dataset) if column in frame]
+    return frame[columns + [column for column in frame if column not in columns]]
+
+
+def encode_rows(conn: sqlite3.Connection, dataset: Dataset, rows: List[tuple]) -> List[tuple]:
+    """
+    Versão de `encode_frame` para tuplas na ordem de `dataset.columns`.
+    """
+    encoded = [list(row) for row in rows]
+    for column in DIMENSIONS:
+        if column in dataset.columns:
+            i = dataset.columns.index(column)
+            ids = dimension_ids(conn, column, (row[i] for row in rows))
+            for row in encoded:
+                row[i] = ids[row[i]]
+    return [tuple(row) for row in encoded]
+
+
+def select_sql(dataset: Dataset) -> str:
+    """
+    SELECT que devolve as colunas de `dataset.columns`, com os nomes de exibição de país e produto.
+    """
+    joins, columns = [], []
+    for column in dataset.columns:
+        if column in DIMENSIONS:
+            table, id_column = DIMENSIONS[column]
+            joins.append(f"LEFT JOIN {table} ON {table}.id = f.{id_column}")
+            columns.append(f"{table}.name")
+        else:
+            columns.append(f"f.{column}")
+    return f"SELECT {', '.join(columns)} FROM {dataset.name} f {' '.join(joins)}"
+
+
+def normalize_tables(conn: sqlite3.Connection) -> bool:
+    """
+    Converte tabelas de fatos no formato antigo (país e produto como texto) para chaves inteiras,
+    preservando os ids das linhas.
+
+    Parâmetros:
+        conn (sqlite3.Connection): Conexão com o banco de staging.
+
+    Retorna:
+        bool: True se alguma tabela foi convertida.
+    """
+    converted = False
+    for name, dataset in DATASETS.items():
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({name})")}
+        if not columns & set(DIMENSIONS):
+            continue
+        frame = pd.read_sql(f"SELECT id, {', '.join(dataset.columns)} FROM {name}", conn)
+        frame = encode_frame(conn, dataset, frame)
+        conn.execute(f"DROP TABLE {name}")
+        create_fact_table(conn, dataset)
+        frame.to_sql(name, conn, if_exists="append", index=False)
+        logging.info(f"Tabela '{name}' convertida para chaves de país e produto ({len(frame)} linhas).")
+        converted = True
+    return converted
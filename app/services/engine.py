@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.core.database_config import DB_PATH
+from app.core.settings import ENGINE_POLL_SECONDS, PREBUILT_ENABLED
+from app.services.changelog import changed_datasets
+from app.services.datasets import DATASETS, Dataset, format_quantity, parse_quantity
+from app.services.dimensions import search_names, select_sql
+from app.services.publish import dataset_version
+from app.services.records import Row
+from app.services.snapshot import current_version, open_snapshot, publish_snapshot, snapshot_lock
+from app.util.helpers import normalize_text
+
+
+class Table:
+    """
+    Uma tabela do Vitibrasil carregada em memória como colunas NumPy.
+
+    O ano é guardado como int16, as quantidades como int64 e as colunas de texto
+    como códigos inteiros que apontam para um dicionário de valores distintos.
+    """
+
+    def __init__(self, dataset: Dataset, year: np.ndarray, codes: Dict[str, np.ndarray],
+                 dictionaries: Dict[str, List[Optional[str]]], quantities: Dict[str, np.ndarray]):
+        self.dataset = dataset
+        self.year = year
+        self.codes = codes
+        self.dictionaries = dictionaries
+        self.quantities = quantities
+        self.size = len(year)
+        self._normalized: Dict[str, List[Tuple[str, ...]]] = {}
+
+    @classmethod
+    def from_rows(cls, dataset: Dataset, rows: List[tuple]) -> "Table":
+        """
+        Monta a tabela a partir de tuplas na ordem de `dataset.columns`.
+        """
+        columns = dataset.columns
+        year = np.fromiter((row[0] or 0 for row in rows), dtype=np.int16, count=len(rows))
+        codes, dictionaries, quantities = {}, {}, {}
+        for name in dataset.categorical:
+            i = columns.index(name)
+            index: Dict[Optional[str], int] = {}
+            codes[name] = np.fromiter((index.setdefault(row[i], len(index)) for row in rows), dtype=np.int32, count=len(rows))
+            dictionaries[name] = list(index)
+        for name in dataset.quantities:
+            i = columns.index(name)
+            quantities[name] = np.fromiter((parse_quantity(row[i]) for row in rows), dtype=np.int64, count=len(rows))
+        return cls(dataset, year, codes, dictionaries, quantities)
+
+    def mask(self, year: Optional[int] = None, exact: bool = False, **terms: Optional[str]) -> np.ndarray:
+        """
+        Calcula a máscara booleana das linhas que atendem aos filtros.
+
+        Parâmetros:
+            year (int): Ano exato. None não filtra.
+            exact (bool): Compara o termo inteiro em vez de buscar substring.
+            **terms: Coluna categórica e termo procurado, sem diferenciar maiúsculas nem acentos.
+
+        Retorna:
+            np.ndarray: Máscara com uma posição por linha.
+        """
+        mask = np.ones(self.size, dtype=bool) if year is None else self.year == year
+        for name, term in terms.items():
+            if not term:
+                continue
+            term = normalize_text(term)
+            # O teste de texto roda uma vez por valor distinto; as linhas são filtradas
+            # indexando a tabela de consulta pelos códigos.
+            values = self._normalized.get(name)
+            if values is None:
+                values = self._normalized[name] = [() if value is None else search_names(name, value) for value in self.dictionaries[name]]
+            lookup = np.fromiter(
+                (any(spelling == term if exact else term in spelling for spelling in names) for names in values),
+                dtype=bool, count=len(values),
+            )
+            mask &= lookup[self.codes[name]]
+        return mask
+
+    def rows(self, mask: Optional[np.ndarray] = None) -> List[Row]:
+        """
+        Reconstrói os registros das linhas selecionadas, no formato devolvido pelo scraper.
+        """
+        return self.take(np.arange(self.size) if mask is None else np.flatnonzero(mask))
+
+    def take(self, positions: np.ndarray) -> List[Row]:
+        """
+        Reconstrói os registros das posições informadas, na ordem delas.
+        """
+        columns = []
+        for name in self.dataset.columns:
+            if name == "Year":
+                columns.append(self.year[positions].tolist())
+            elif name in self.codes:
+                dictionary = self.dictionaries[name]
+                columns.append([dictionary[code] for code in self.codes[name][positions].tolist()])
+            else:
+                columns.append([format_quantity(value) for value in self.quantities[name][positions].tolist()])
+        row_type = self.dataset.row_type
+        return [row_type(*values) for values in zip(*columns)]
+
+    def distinct(self, name: str) -> List[Optional[str]]:
+        """
+        Valores distintos de uma coluna categórica, na ordem em que aparecem na tabela.
+        """
+        return list(self.dictionaries[name])
+
+
+class Engine:
+    """
+    Conjunto das cinco tabelas em memória, imutável depois de carregado.
+
+    `mtime` é a data de modificação do banco de origem, `data_version` a versão dos dados
+    publicada no banco e `version` a versão do snapshot compartilhado de onde as colunas
+    foram mapeadas.
+    """
+
+    def __init__(self, tables: Dict[str, Table], mtime: float = 0.0, version: Optional[int] = None,
+                 data_version: int = 0):
+        self.tables = tables
+        self.mtime = mtime
+        self.version = version
+        self.data_version = data_version
+
+    def __getitem__(self, name: str) -> Table:
+        return self.tables[name]
+
+    def query(self, name: str, year: Optional[int] = None, exact: bool = False, **terms: Optional[str]) -> List[dict]:
+        """
+        Filtra uma tabela e devolve as linhas como dicts prontos para o JSON.
+        """
+        table = self.tables[name]
+        return [row.to_dict() for row in table.rows(table.mask(year, exact, **terms))]
+
+
+def load_engine(db_path: str = DB_PATH, previous: Optional[Engine] = None) -> Engine:
+    """
+    Lê as tabelas do SQLite e monta o motor colunar.
+
+    Parâmetros:
+        db_path (str): Caminho do banco.
+        previous (Engine): Motor atual. Tabelas sem mudanças no `changelog` desde a versão
+            dele são reaproveitadas em vez de lidas de novo.
+
+    Retorna:
+        Engine: Tabelas carregadas. Tabelas ausentes no banco ficam vazias.
+    """
+    tables = {}
+    conn = sqlite3.connect(db_path)
+    mtime = _db_mtime(db_path)
+    try:
+        data_version = dataset_version(conn)
+        changed = changed_datasets(conn, previous.data_version) if previous is not None and previous.data_version else None
+        for name, dataset in DATASETS.items():
+            if changed is not None and name not in changed:
+                tables[name] = previous.tables[name]
+                continue
+            try:
+                rows = conn.execute(f"{select_sql(dataset)} ORDER BY f.id").fetchall()
+            except sqlite3.OperationalError:
+                logging.warning(f"Tabela '{name}' não encontrada no banco.")
+                rows = []
+            tables[name] = Table.from_rows(dataset, rows)
+    finally:
+        conn.close()
+    reloaded = list(DATASETS) if changed is None else sorted(changed)
+    logging.info(f"Motor em memória carregado: {sum(t.size for t in tables.values())} linhas, tabelas lidas: {reloaded}.")
+    return Engine(tables, mtime, data_version=data_version)
+
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+
+def _db_mtime(db_path: str) -> float:
+    return os.path.getmtime(db_path) if os.path.exists(db_path) else 0.0
+
+
+def _load_shared(db_path: str, force: bool = False) -> Engine:
+    """
+    Abre o snapshot compartilhado, gerando e publicando um novo se ele estiver
+    desatualizado em relação ao banco. O lock garante que só um worker faça a carga.
+    As respostas pré-geradas dos anos fechados são geradas junto, se ainda não existirem
+    para a versão dos dados.
+    """
+    with snapshot_lock():
+        engine = None if force else open_snapshot()
+        if engine is None or engine.mtime != _db_mtime(db_path):
+            engine = open_snapshot(publish_snapshot(load_engine(db_path, _engine)))
+        _build_static(engine)
+        return engine
+
+
+def _build_static(engine: Engine) -> None:
+    # Importado aqui porque o prebuilt depende das consultas, que dependem deste módulo.
+    from app.services.prebuilt import build_static
+
+    if not PREBUILT_ENABLED:
+        return
+    try:
+        build_static(engine)
+    except Exception as e:
+        logging.error(f"Erro ao gerar as respostas pré-geradas: {e}")
+
+
+def refresh_engine(db_path: str = DB_PATH) -> Engine:
+    """
+    Recarrega o motor a partir do banco, publica um novo snapshot e troca a referência
+    global de uma só vez. Chamado ao fim de cada carga.
+    Requisições em andamento continuam usando a versão anterior até terminarem.
+    """
+    global _engine
+    with _engine_lock:
+        _engine = _load_shared(db_path, force=True)
+        return _engine
+
+
+def _stale(engine: Optional[Engine], db_path: str) -> bool:
+    return engine is None or engine.mtime != _db_mtime(db_path) or engine.version != current_version()
+
+
+def get_engine(db_path: str = DB_PATH) -> Engine:
+    """
+    Devolve o motor atual, carregando-o na primeira chamada. Não confere se o banco mudou:
+    isso fica com `check_engine`, em segundo plano, para que nenhuma requisição espere a recarga.
+    """
+    global _engine
+    engine = _engine
+    if engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _load_shared(db_path)
+            engine = _engine
+    return engine
+
+
+def check_engine(db_path: str = DB_PATH) -> Engine:
+    """
+    Reabre o motor se outro processo publicou um snapshot mais novo ou se o banco foi
+    alterado por uma carga.
+    """
+    global _engine
+    engine = _engine
+    if _stale(engine, db_path):
+        with _engine_lock:
+            if _stale(_engine, db_path):
+                _engine = _load_shared(db_path)
+            engine = _engine
+    return engine
+
+
+async def run_engine_refresher(interval: float = ENGINE_POLL_SECONDS) -> None:
+    """
+    Laço iniciado no lifespan da aplicação: a cada `interval` segundos, confere fora do
+    event loop se o motor precisa ser recarregado.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(check_engine)
+        except Exception as e:
+            logging.error(f"Erro ao recarregar o motor em memória: {e}")
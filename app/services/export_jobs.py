@@ -0,0 +1,305 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from typing import Dict, Optional
+import numpy as np
+from app.core.settings import (
+    EXPORT_CHUNK_ROWS,
+    EXPORT_DIR,
+    EXPORT_JOBS_PATH,
+    EXPORT_LEASE_SECONDS,
+    EXPORT_MAX_ACTIVE_PER_USER,
+    EXPORT_POLL_SECONDS,
+    EXPORT_TTL_SECONDS,
+)
+from app.services.datasets import DATASETS, FILTER_COLUMNS
+from app.services.engine import Table, get_engine
+
+MEDIA_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+WORKER_ID = f"{os.uname().nodename}:{os.getpid()}"
+
+
+def _connect(path: str = EXPORT_JOBS_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS export_jobs (
+            id TEXT PRIMARY KEY,
+            username TEXT,
+            spec TEXT,
+            status TEXT,
+            data_version INTEGER,
+            total_rows INTEGER,
+            rows_done INTEGER DEFAULT 0,
+            bytes_done INTEGER DEFAULT 0,
+            worker TEXT,
+            heartbeat REAL,
+            error TEXT,
+            created_at REAL,
+            finished_at REAL
+        )
+    ''')
+    return conn
+
+
+def export_path(job_id: str, format: str, export_dir: str = EXPORT_DIR) -> str:
+    """
+    Arquivo final de uma exportação. Enquanto o job roda, as linhas vão para `{arquivo}.part`.
+    """
+    return os.path.join(export_dir, f"{job_id}.{format}")
+
+
+def validate_spec(spec: dict) -> Optional[str]:
+    """
+    Confere se os filtros existem na tabela e se o intervalo de anos é válido.
+
+    Retorna:
+        Optional[str]: Mensagem de erro, ou None se a especificação é válida.
+    """
+    dataset = DATASETS[spec["dataset"]]
+    invalid = [name for name in spec.get("filters", {}) if FILTER_COLUMNS[name] not in dataset.categorical]
+    if invalid:
+        valid = [name for name, column in FILTER_COLUMNS.items() if column in dataset.categorical]
+        return f"Filtros inválidos para {dataset.name}: {', '.join(invalid)}. Opções: {', '.join(valid)}"
+    if spec.get("year_from") and spec.get("year_to") and spec["year_from"] > spec["year_to"]:
+        return "year_from deve ser menor ou igual a year_to."
+    return None
+
+
+def select_positions(table: Table, spec: dict) -> np.ndarray:
+    """
+    Posições das linhas da tabela que atendem à especificação, na ordem da tabela.
+    """
+    terms = {FILTER_COLUMNS[name]: term for name, term in spec.get("filters", {}).items()}
+    mask = table.mask(None, spec.get("exact", False), **terms)
+    if spec.get("year_from"):
+        mask &= table.year >= spec["year_from"]
+    if spec.get("year_to"):
+        mask &= table.year <= spec["year_to"]
+    return np.flatnonzero(mask)
+
+
+def _encode(rows: list, format: str) -> bytes:
+    if format == "jsonl":
+        return "".join(json.dumps(row.to_dict(), ensure_ascii=False) + "\n" for row in rows).encode("utf-8")
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def create_job(username: str, spec: dict, path: str = EXPORT_JOBS_PATH) -> Optional[str]:
+    """
+    Enfileira uma exportação.
+
+    Retorna:
+        Optional[str]: Id do job, ou None se o usuário já tem `EXPORT_MAX_ACTIVE_PER_USER` jobs na fila.
+    """
+    conn = _connect(path)
+    try:
+        with conn:
+            active = conn.execute(
+                "SELECT COUNT(*) FROM export_jobs WHERE username = ? AND status IN ('pending', 'running')", (username,)
+            ).fetchone()[0]
+            if active >= EXPORT_MAX_ACTIVE_PER_USER:
+                return None
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO export_jobs (id, username, spec, status, created_at) VALUES (?, ?, ?, 'pending', ?)",
+                (job_id, username, json.dumps(spec, ensure_ascii=False), time.time()),
+            )
+        return job_id
+    finally:
+        conn.close()
+
+
+def get_job(job_id: str, username: str, path: str = EXPORT_JOBS_PATH) -> Optional[dict]:
+    """
+    Estado de um job do usuário, ou None se ele não existe ou pertence a outro usuário.
+    """
+    conn = _connect(path)
+    try:
+        row = conn.execute("SELECT * FROM export_jobs WHERE id = ? AND username = ?", (job_id, username)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    job = dict(row)
+    job["spec"] = json.loads(job["spec"])
+    return job
+
+
+def claim_job(path: str = EXPORT_JOBS_PATH) -> Optional[dict]:
+    """
+    Reserva o job pendente mais antigo para este worker. Um job em execução cujo worker parou
+    de renovar a reserva por `EXPORT_LEASE_SECONDS` também pode ser reservado, e é retomado
+    do último bloco gravado.
+    """
+    now = time.time()
+    conn = _connect(path)
+    try:
+        with conn:
+            row = conn.execute('''
+                UPDATE export_jobs SET status = 'running', worker = ?, heartbeat = ?
+                WHERE id = (
+                    SELECT id FROM export_jobs
+                    WHERE status = 'pending' OR (status = 'running' AND heartbeat < ?)
+                    ORDER BY created_at LIMIT 1
+                )
+                RETURNING *
+            ''', (WORKER_ID, now, now - EXPORT_LEASE_SECONDS)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    job = dict(row)
+    job["spec"] = json.loads(job["spec"])
+    return job
+
+
+def _progress(conn: sqlite3.Connection, job_id: str, **values) -> bool:
+    # Só o worker que detém a reserva atualiza o job; se ela foi perdida, o bloco é descartado.
+    assignments = ", ".join(f"{name} = ?" for name in values)
+    with conn:
+        cursor = conn.execute(
+            f"UPDATE export_jobs SET {assignments}, heartbeat = ? WHERE id = ? AND worker = ?",
+            (*values.values(), time.time(), job_id, WORKER_ID),
+        )
+    return cursor.rowcount == 1
+
+
+def run_job(job: dict, path: str = EXPORT_JOBS_PATH, export_dir: str = EXPORT_DIR,
+            chunk_rows: int = EXPORT_CHUNK_ROWS) -> bool:
+    """
+    Gera o arquivo de um job reservado, em blocos de `chunk_rows` linhas.
+
+    As linhas vêm do motor em memória, não das rotas. Depois de cada bloco o arquivo é
+    sincronizado no disco e as linhas e bytes gravados são registrados no job. Um job retomado
+    corta o arquivo no último tamanho registrado e continua dali. Se a versão dos dados mudou
+    desde o início, o job recomeça do zero, já que as posições das linhas mudam.
+
+    Retorna:
+        bool: Se o arquivo foi concluído.
+    """
+    spec, format = job["spec"], job["spec"]["format"]
+    engine = get_engine()
+    table = engine[spec["dataset"]]
+    positions = select_positions(table, spec)
+    final = export_path(job["id"], format, export_dir)
+    part = f"{final}.part"
+    os.makedirs(export_dir, exist_ok=True)
+
+    conn = _connect(path)
+    try:
+        done, size = job["rows_done"], job["bytes_done"]
+        if job["data_version"] != engine.data_version or not done or not os.path.exists(part):
+            done, size = 0, 0
+            if not _progress(conn, job["id"], data_version=engine.data_version, total_rows=len(positions),
+                             rows_done=0, bytes_done=0):
+                return False
+        else:
+            logging.info(f"Exportação {job['id']} retomada na linha {done} de {len(positions)}.")
+        with open(part, "ab") as f:
+            f.truncate(size)
+            f.seek(size)
+            if size == 0 and format == "csv":
+                f.write(_encode([table.dataset.columns], format))
+            while done < len(positions):
+                rows = table.take(positions[done:done + chunk_rows])
+                f.write(_encode([row.as_tuple() for row in rows] if format == "csv" else rows, format))
+                f.flush()
+                os.fsync(f.fileno())
+                done, size = done + len(rows), f.tell()
+                if not _progress(conn, job["id"], rows_done=done, bytes_done=size):
+                    logging.warning(f"Exportação {job['id']} reservada por outro worker, bloco descartado.")
+                    return False
+        os.replace(part, final)
+        _progress(conn, job["id"], status="done", finished_at=time.time())
+        logging.info(f"Exportação {job['id']} concluída: {done} linhas, {size} bytes.")
+        return True
+    finally:
+        conn.close()
+
+
+def fail_job(job_id: str, error: str, path: str = EXPORT_JOBS_PATH) -> None:
+    conn = _connect(path)
+    try:
+        _progress(conn, job_id, status="failed", error=error, finished_at=time.time())
+    finally:
+        conn.close()
+
+
+def expire_jobs(path: str = EXPORT_JOBS_PATH, export_dir: str = EXPORT_DIR, ttl: int = EXPORT_TTL_SECONDS) -> int:
+    """
+    Remove os jobs encerrados há mais de `ttl` segundos e os arquivos deles.
+
+    Retorna:
+        int: Jobs removidos.
+    """
+    conn = _connect(path)
+    try:
+        with conn:
+            rows = conn.execute(
+                "DELETE FROM export_jobs WHERE finished_at < ? RETURNING id, spec", (time.time() - ttl,)
+            ).fetchall()
+    finally:
+        conn.close()
+    for row in rows:
+        final = export_path(row["id"], json.loads(row["spec"])["format"], export_dir)
+        for file in (final, f"{final}.part"):
+            if os.path.exists(file):
+                os.remove(file)
+    return len(rows)
+
+
+def job_status(job: dict) -> Dict:
+    """
+    Conteúdo da resposta de GET /jobs/{id}: estado, progresso e link de download quando concluído.
+    """
+    total, done = job["total_rows"], job["rows_done"]
+    content = {
+        "success": True,
+        "id": job["id"],
+        "status": job["status"],
+        "spec": job["spec"],
+        "data_version": job["data_version"],
+        "total": total,
+        "done": done,
+        "progress": round(done / total, 4) if total else (1.0 if job["status"] == "done" else 0.0),
+        "created_at": job["created_at"],
+        "finished_at": job["finished_at"],
+    }
+    if job["status"] == "done":
+        content["download"] = f"/jobs/{job['id']}/download"
+    if job["error"]:
+        content["error"] = job["error"]
+    return content
+
+
+async def run_export_worker(interval: float = EXPORT_POLL_SECONDS) -> None:
+    """
+    Laço iniciado no lifespan da aplicação: executa os jobs da fila, um por vez por worker,
+    fora do event loop. Sem jobs, remove os expirados e aguarda `interval` segundos.
+    """
+    while True:
+        job = None
+        try:
+            job = await asyncio.to_thread(claim_job)
+            if job is None:
+                await asyncio.to_thread(expire_jobs)
+                await asyncio.sleep(interval)
+                continue
+            await asyncio.to_thread(run_job, job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Erro na exportação {job['id'] if job else ''}: {e}")
+            if job is not None:
+                await asyncio.to_thread(fail_job, job["id"], str(e))
+            await asyncio.sleep(interval)
@@ -0,0 +1,151 @@
+from typing import List, NamedTuple, Optional, Tuple
+import numpy as np
+
+# Grade de parâmetros testada no Holt; cada série fica com o par de menor erro de um passo.
+ALPHAS = np.array([0.2, 0.4, 0.6, 0.8, 1.0])
+BETAS = np.array([0.05, 0.2, 0.4])
+DAMPING = 0.9
+# Multiplicador do desvio dos resíduos nas faixas de previsão (~95% se os erros forem normais).
+Z = 1.96
+MIN_OBSERVATIONS = 3
+
+
+class Model(NamedTuple):
+    """
+    Parâmetros ajustados de um modelo para todas as séries de uma matriz.
+
+    Atributos:
+        kind (str): "linear" ou "holt".
+        level (np.ndarray): Nível de cada série no último ano do histórico.
+        trend (np.ndarray): Inclinação anual de cada série.
+        sigma (np.ndarray): Desvio padrão dos resíduos (linear) ou dos erros de um passo (holt).
+        observations (np.ndarray): Anos com valor usados no ajuste. Séries com menos de
+            `MIN_OBSERVATIONS` não são previstas.
+    """
+    kind: str
+    level: np.ndarray
+    trend: np.ndarray
+    sigma: np.ndarray
+    observations: np.ndarray
+
+
+def fit_linear(values: np.ndarray, years: np.ndarray) -> Model:
+    """
+    Tendência linear por mínimos quadrados, ajustada para todas as séries de uma vez com
+    somas ponderadas pela máscara dos anos com valor.
+    """
+    x = (years - years[-1]).astype(float)
+    weights = (~np.isnan(values)).astype(float)
+    y = np.nan_to_num(values)
+    n = weights.sum(axis=1)
+    sx, sxx = weights @ x, weights @ x ** 2
+    sy, sxy = y.sum(axis=1), y @ x
+    denominator = n * sxx - sx ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(denominator > 0, (n * sxy - sx * sy) / denominator, np.nan)
+        intercept = (sy - slope * sx) / n
+    residuals = weights * (y - (intercept[:, None] + slope[:, None] * x))
+    sigma = np.sqrt((residuals ** 2).sum(axis=1) / np.maximum(n - 2, 1))
+    return Model("linear", intercept, slope, sigma, n.astype(np.int64))
+
+
+def fit_holt(values: np.ndarray) -> Model:
+    """
+    Suavização exponencial de Holt com tendência amortecida.
+
+    A recursão percorre os anos uma vez, mas cada passo atualiza todas as séries e todos os
+    pares (alpha, beta) da grade juntos, em arrays (parâmetros x séries). Anos sem valor
+    apenas projetam o nível e a tendência.
+    """
+    alpha, beta = (grid.ravel()[:, None] for grid in np.meshgrid(ALPHAS, BETAS))
+    count = values.shape[0]
+    level = np.full((len(alpha), count), np.nan)
+    trend = np.zeros((len(alpha), count))
+    errors = np.zeros((len(alpha), count))
+    updates = np.zeros(count)
+    observations = np.zeros(count, dtype=np.int64)
+    for y in values.T:
+        observed = ~np.isnan(y)
+        started = ~np.isnan(level[0])
+        update = observed & started
+        forecast = level + DAMPING * trend
+        error = np.where(update, y - forecast, 0.0)
+        level = np.where(update, forecast + alpha * error, np.where(started, forecast, y))
+        trend = np.where(started, DAMPING * trend + alpha * beta * error, 0.0)
+        errors += error ** 2
+        updates += update
+        observations += observed
+    best = errors.argmin(axis=0)
+    index = np.arange(count)
+    sigma = np.sqrt(errors[best, index] / np.maximum(updates, 1))
+    return Model("holt", level[best, index], trend[best, index], sigma, observations)
+
+
+def fit(kind: str, values: np.ndarray, years: np.ndarray) -> Model:
+    return fit_linear(values, years) if kind == "linear" else fit_holt(values)
+
+
+def predict(model: Model, horizon: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Previsão dos próximos `horizon` anos de todas as séries numa única operação.
+
+    Retorna:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Previsão e limites inferior e superior
+        (séries x anos), sem valores negativos. NaN nas séries sem histórico suficiente.
+    """
+    steps = np.arange(1, horizon + 1)
+    if model.kind == "holt":
+        multiplier, spread = np.cumsum(DAMPING ** steps), np.sqrt(steps)
+    else:
+        multiplier, spread = steps.astype(float), np.ones(horizon)
+    valid = (model.observations >= MIN_OBSERVATIONS)[:, None]
+    forecast = np.clip(model.level[:, None] + model.trend[:, None] * multiplier, 0, None)
+    band = Z * model.sigma[:, None] * spread
+    forecast = np.where(valid, forecast, np.nan)
+    return forecast, np.clip(forecast - band, 0, None), forecast + band
+
+
+def history_window(values: np.ndarray, years: np.ndarray, history: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Últimos `history` anos da matriz, usados no ajuste. None usa o histórico inteiro.
+    """
+    if history is None or history >= len(years):
+        return values, years
+    return values[:, -history:], years[-history:]
+
+
+def forecasts(labels: List[Optional[str]], values: np.ndarray, years: np.ndarray, model: Model,
+              horizon: int, limit: Optional[int] = None) -> dict:
+    """
+    Previsões de todas as séries com o último valor observado de cada uma, ordenadas pelo
+    total do histórico usado no ajuste, da maior para a menor.
+
+    Parâmetros:
+        labels (List[str]): Nome de cada série.
+        values (np.ndarray): Histórico usado no ajuste (séries x anos).
+        years (np.ndarray): Anos do histórico.
+        model (Model): Modelo ajustado.
+        horizon (int): Anos previstos.
+        limit (int): Quantidade máxima de séries.
+
+    Retorna:
+        dict: "years" previstos e "data", com uma entrada por série.
+    """
+    forecast, lower, upper = predict(model, horizon)
+    observed = ~np.isnan(values)
+    last = np.where(observed.any(axis=1), observed.shape[1] - 1 - observed[:, ::-1].argmax(axis=1), -1)
+    order = np.argsort(-np.nansum(values, axis=1), kind="stable")[:limit]
+    listed = lambda row: [None if np.isnan(value) else round(value, 2) for value in row.tolist()]
+    data = [
+        {
+            "key": labels[i],
+            "observations": int(model.observations[i]),
+            "last_year": int(years[last[i]]) if last[i] >= 0 else None,
+            "last_value": int(values[i, last[i]]) if last[i] >= 0 else None,
+            "forecast": listed(forecast[i]),
+            "lower": listed(lower[i]),
+            "upper": listed(upper[i]),
+        }
+        for i in order.tolist()
+    ]
+    return {"years": list(range(int(years[-1]) + 1, int(years[-1]) + horizon + 1)), "data": data}
@@ -0,0 +1,59 @@
+from typing import List, Optional, Tuple
+
+FORMATS = ("rows", "columnar")
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    Converte o parâmetro `fields` ("Country,Value_USD") em lista de colunas.
+    """
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()]
+
+
+def shape_response(status: int, content: dict, fields: Optional[str] = None,
+                   format: str = "rows") -> Tuple[int, dict]:
+    """
+    Aplica a projeção de colunas e o formato de saída ao conteúdo de uma consulta.
+
+    No formato "columnar", os nomes das colunas aparecem uma única vez e cada linha vira
+    uma lista de valores. Colunas com o mesmo valor em todas as linhas (como Year e Product
+    numa consulta de um ano e produto) saem das linhas e vão para "constants".
+
+    Parâmetros:
+        status (int): Status HTTP da consulta.
+        content (dict): Conteúdo com a lista "data".
+        fields (str): Colunas mantidas, separadas por vírgula. None mantém todas.
+        format (str): "rows" (lista de objetos) ou "columnar".
+
+    Retorna:
+        Tuple[int, dict]: Status e conteúdo ajustados. Respostas sem "data" não são alteradas.
+    """
+    data = content.get("data")
+    if status != 200 or not isinstance(data, list):
+        return status, content
+
+    columns = parse_fields(fields)
+    if columns is not None:
+        available = set(data[0]) if data else set(columns)
+        invalid = [column for column in columns if column not in available]
+        if invalid:
+            return 400, {"success": False, "error": f"Campos inválidos: {', '.join(invalid)}. Disponíveis: {', '.join(sorted(available))}"}
+    elif data:
+        columns = list(data[0])
+    else:
+        columns = []
+
+    if format != "columnar":
+        if fields:
+            data = [{column: row[column] for column in columns} for row in data]
+        return status, {**content, "data": data}
+
+    constants = {}
+    if len(data) > 1:
+        first = data[0]
+        constants = {column: first[column] for column in columns if all(row[column] == first[column] for row in data)}
+    varying = [column for column in columns if column not in constants]
+    rows = [[row[column] for column in varying] for row in data]
+    return status, {**content, "data": {"constants": constants, "columns": varying, "rows": rows}}
@@ -0,0 +1,160 @@
+import gzip
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Dict, Optional
+import numpy as np
+from fastapi import Request
+from fastapi.responses import FileResponse
+from app.core import logging_config
+from app.core.database_config import DB_PATH
+from app.core.settings import LIVE_HORIZON_YEARS, PREBUILT_DIR, PREBUILT_ENABLED
+from app.services.queries import PRODUCT_OPTIONS, Source, comercializacao_rows, prefers_live
+from app.services.snapshot import snapshot_lock
+
+KEEP_VERSIONS = 2
+
+
+def _options(name: str) -> Dict[Optional[int], Optional[str]]:
+    """
+    Opções do site de uma tabela e o primeiro nome de produto de cada uma.
+    Tabelas sem opções têm uma entrada só, sem produto.
+    """
+    options: Dict[Optional[int], Optional[str]] = {}
+    for product, option in PRODUCT_OPTIONS.get(name, {}).items():
+        options.setdefault(option, product)
+    return options or {None: None}
+
+
+def _render(engine, name: str, year: int, product: Optional[str]) -> list:
+    # Mesmas consultas das rotas quando a resposta vem do banco (queries.load e query_comercializacao).
+    if name == "comercializacao":
+        return comercializacao_rows(engine.query(name, year, exact=True))
+    if product is None:
+        return engine.query(name, year)
+    return engine.query(name, year, Product=product)
+
+
+def _filename(name: str, year: int, option: Optional[int] = None) -> str:
+    return os.path.join(name, f"{year}.json" if option is None else f"{year}-{option}.json")
+
+
+def static_path(data_version: int, name: str, year: int, option: Optional[int] = None,
+                prebuilt_dir: str = PREBUILT_DIR) -> str:
+    """
+    Caminho da resposta pré-gerada de uma página, sem a extensão ".gz".
+    """
+    return os.path.join(prebuilt_dir, f"v{data_version}", _filename(name, year, option))
+
+
+def build_static(engine, prebuilt_dir: str = PREBUILT_DIR) -> Optional[str]:
+    """
+    Gera as respostas de todas as páginas (tabela, ano, opção) dos anos fechados, em JSON
+    puro e comprimido com gzip, no diretório `v{data_version}`.
+
+    Anos fechados são os anteriores ao horizonte `LIVE_HORIZON_YEARS`, que no modo "auto" já
+    são servidos pelo banco e só mudam quando uma nova versão dos dados é publicada. Como em
+    `publish_snapshot`, a versão é gravada num diretório temporário e renomeada no fim, e só as
+    `KEEP_VERSIONS` mais recentes são mantidas. Deve ser chamada com `snapshot_lock` adquirido.
+
+    Parâmetros:
+        engine (Engine): Motor com as tabelas carregadas.
+        prebuilt_dir (str): Diretório das respostas pré-geradas.
+
+    Retorna:
+        Optional[str]: Diretório da versão, ou None se ela já tinha sido gerada.
+    """
+    final_dir = os.path.join(prebuilt_dir, f"v{engine.data_version}")
+    if os.path.isdir(final_dir):
+        return None
+    started = time.perf_counter()
+    tmp_dir = f"{final_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    horizon = datetime.now().year - LIVE_HORIZON_YEARS
+    files = 0
+    for name, table in engine.tables.items():
+        os.makedirs(os.path.join(tmp_dir, name))
+        for year in np.unique(np.asarray(table.year)).tolist():
+            if year >= horizon:
+                continue
+            for option, product in _options(name).items():
+                data = _render(engine, name, year, product)
+                if not data:
+                    continue
+                content = {"success": True, "source": "prebuilt", "data_version": engine.data_version,
+                           "published_at": engine.mtime, "total": len(data), "data": data}
+                body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                path = os.path.join(tmp_dir, _filename(name, year, option))
+                with open(path, "wb") as f:
+                    f.write(body)
+                with open(f"{path}.gz", "wb") as f:
+                    f.write(gzip.compress(body, compresslevel=9, mtime=0))
+                files += 1
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"data_version": engine.data_version, "db_mtime": engine.mtime, "horizon": horizon, "files": files}, f)
+
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.rename(tmp_dir, final_dir)
+    logging.info(f"Respostas pré-geradas da versão {engine.data_version}: {files} páginas em "
+                 f"{time.perf_counter() - started:.1f}s.")
+
+    # Um worker que ainda não recarregou o motor continua servindo a versão anterior.
+    for entry in os.listdir(prebuilt_dir):
+        if entry.startswith("v") and entry[1:].isdigit() and int(entry[1:]) <= engine.data_version - KEEP_VERSIONS:
+            shutil.rmtree(os.path.join(prebuilt_dir, entry), ignore_errors=True)
+    return final_dir
+
+
+def prebuilt_response(request: Request, engine, name: str, year: Optional[int], product: Optional[str] = None,
+                      source: Source = "auto", filtered: bool = False) -> Optional[FileResponse]:
+    """
+    Resposta pré-gerada da página pedida, enviada direto do arquivo, quando a consulta seria
+    respondida pelo banco com os dados inteiros da página.
+
+    A versão comprimida é enviada quando o cliente aceita gzip. Consultas com filtros, `fields`
+    ou formato colunar, anos recentes e páginas que não foram geradas devolvem None e seguem
+    pelo caminho normal da rota.
+
+    Parâmetros:
+        request (Request): Requisição, para o cabeçalho Accept-Encoding.
+        engine (Engine): Motor atual; a versão dos dados dele escolhe o diretório.
+        name (str): Nome da tabela.
+        year (int): Ano pedido.
+        product (str): Produto que escolhe a opção do site, nas tabelas com opções.
+        source (Source): Origem pedida pelo cliente.
+        filtered (bool): Se a consulta tem filtros ou formatação além do ano e do produto.
+
+    Retorna:
+        Optional[FileResponse]: Resposta do arquivo, ou None.
+    """
+    if not PREBUILT_ENABLED or filtered or year is None or prefers_live(year, source):
+        return None
+    option = None
+    if name in PRODUCT_OPTIONS:
+        option = PRODUCT_OPTIONS[name].get((product or "").lower())
+        if option is None:
+            return None
+    path = static_path(engine.data_version, name, year, option)
+    headers = {"X-Data-Version": str(engine.data_version), "Vary": "Accept-Encoding"}
+    if engine.mtime:
+        headers["Age"] = str(max(0, int(time.time() - engine.mtime)))
+    if "gzip" in request.headers.get("accept-encoding", "") and os.path.exists(f"{path}.gz"):
+        return FileResponse(f"{path}.gz", media_type="application/json", headers={**headers, "Content-Encoding": "gzip"})
+    if os.path.exists(path):
+        return FileResponse(path, media_type="application/json", headers=headers)
+    return None
+
+
+if __name__ == "__main__":
+    """
+        Para gerar as respostas dos anos fechados a partir do banco, execute no terminal:
+        python -m app.services.prebuilt
+    """
+    from app.services.engine import load_engine
+
+    logging_config()
+    with snapshot_lock():
+        build_static(load_engine(DB_PATH))
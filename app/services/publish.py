@@ -0,0 +1,208 @@
+import fcntl
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+from app.core.database_config import DB_PATH
+from app.core.settings import PUBLISH_MAX_SHRINK
+from app.services.changelog import affected_years, record_publish, record_reload
+from app.services.datasets import DATASETS
+from app.services.dimensions import DIMENSIONS, compact_tables, normalize_tables
+from app.services.trade import build_trade
+
+
+class Staging:
+    """
+    Cópia de trabalho do banco usada durante uma carga.
+
+    Atributos:
+        conn (sqlite3.Connection): Conexão com a cópia. Todas as escritas da carga passam por ela.
+        path (str): Caminho do arquivo de staging.
+        discarded (bool): Se True, a cópia é descartada em vez de publicada.
+        next_version (int): Versão que a carga receberá se for publicada, usada no `changelog`.
+        removed (Dict[str, int]): Linhas repetidas removidas de cada tabela pela compactação.
+        version (int): Versão publicada, preenchida ao final.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, path: str, next_version: int = 1):
+        self.conn = conn
+        self.path = path
+        self.discarded = False
+        self.next_version = next_version
+        self.removed: Dict[str, int] = {}
+        self.version = None
+
+    def discard(self) -> None:
+        self.discarded = True
+
+
+@contextmanager
+def writer_lock(db_path: str = DB_PATH):
+    """
+    Lock exclusivo entre processos para quem escreve no banco publicado.
+    """
+    with open(f"{db_path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _table_counts(conn: sqlite3.Connection) -> dict:
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return {name: conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0] for name in DATASETS if name in existing}
+
+
+def dataset_version(conn: sqlite3.Connection) -> int:
+    """
+    Versão atual dos dados, incrementada a cada publicação. 0 para bancos ainda não versionados.
+    """
+    try:
+        return conn.execute("SELECT COALESCE(MAX(version), 0) FROM dataset_versions").fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+
+
+def validate(staged: sqlite3.Connection, db_path: str = DB_PATH, removed: Optional[Dict[str, int]] = None) -> None:
+    """
+    Confere a cópia antes da troca: integridade do arquivo e nenhuma tabela sumindo
+    ou encolhendo mais que `PUBLISH_MAX_SHRINK` em relação ao banco publicado.
+
+    Parâmetros:
+        staged (sqlite3.Connection): Conexão com a cópia de staging.
+        db_path (str): Caminho do banco publicado.
+        removed (Dict[str, int]): Linhas repetidas removidas de propósito, descontadas da comparação.
+
+    Retorna:
+        None. Lança ValueError se a cópia for rejeitada.
+    """
+    status = staged.execute("PRAGMA integrity_check").fetchone()[0]
+    if status != "ok":
+        raise ValueError(f"Staging corrompido: {status}")
+
+    if not os.path.exists(db_path):
+        return
+    live = sqlite3.connect(db_path)
+    try:
+        before = _table_counts(live)
+    finally:
+        live.close()
+    after = _table_counts(staged)
+    removed = removed or {}
+    for name, count in before.items():
+        count -= removed.get(name, 0)
+        if name not in after:
+            raise ValueError(f"Tabela '{name}' ausente no staging.")
+        if after[name] < count * (1 - PUBLISH_MAX_SHRINK):
+            raise ValueError(f"Tabela '{name}' encolheu de {count} para {after[name]} linhas.")
+
+
+@contextmanager
+def staging(db_path: str = DB_PATH, source: str = "manual"):
+    """
+    Abre uma cópia do banco para uma carga e a publica de forma atômica ao final.
+
+    A carga escreve apenas na cópia, então os leitores nunca veem anos pela metade nem
+    disputam o lock de escrita do SQLite. Ao sair sem erro, a cópia é validada, recebe
+    uma nova versão na tabela `dataset_versions` e substitui o banco com `os.replace`.
+    Conexões já abertas continuam lendo o arquivo antigo até serem fechadas.
+
+    Parâmetros:
+        db_path (str): Caminho do banco publicado.
+        source (str): Origem da carga, registrada junto com a versão.
+
+    Retorna:
+        Staging: Cópia de trabalho. Chame `discard()` para abandonar a carga sem publicar.
+    """
+    from app.services.engine import refresh_engine
+
+    with writer_lock(db_path):
+        path = f"{db_path}.staging"
+        if os.path.exists(path):
+            os.remove(path)
+        conn = sqlite3.connect(path)
+        if os.path.exists(db_path):
+            live = sqlite3.connect(db_path)
+            try:
+                live.backup(conn)
+            finally:
+                live.close()
+        stage = Staging(conn, path, dataset_version(conn) + 1)
+        try:
+            yield stage
+            if not stage.discarded:
+                # Tabelas de cargas antigas: país e produto viram chaves e as repetições saem.
+                converted = normalize_tables(conn)
+                for name, removed in compact_tables(conn).items():
+                    stage.removed[name] = stage.removed.get(name, 0) + removed
+                    if removed:
+                        record_reload(conn, stage.next_version, name)
+                # A tabela derivada `trade` só é recalculada nos anos que a carga mudou.
+                years = affected_years(conn, stage.next_version, ("importacao", "exportacao"))
+                build_trade(conn, None if converted else years)
+                conn.commit()
+                if converted or any(stage.removed.values()):
+                    conn.execute("VACUUM")
+                validate(conn, db_path, stage.removed)
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS dataset_versions (
+                        version INTEGER PRIMARY KEY,
+                        published_at REAL,
+                        source TEXT
+                    )
+                ''')
+                stage.version = stage.next_version
+                conn.execute("INSERT INTO dataset_versions VALUES (?, ?, ?)", (stage.version, time.time(), source))
+                record_publish(conn, stage.version)
+                conn.commit()
+        finally:
+            conn.close()
+            if stage.discarded or stage.version is None:
+                os.remove(path)
+            else:
+                os.replace(path, db_path)
+                logging.info(f"Dados publicados na versão {stage.version} ({source}).")
+
+    if stage.version is not None:
+        refresh_engine(db_path)
+
+
+def _outdated(conn: sqlite3.Connection) -> bool:
+    # Tabelas sem as dimensões de país e produto, sem a tabela `trade` ou sem os índices UNIQUE.
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if any(
+        {row[1] for row in conn.execute(f"PRAGMA table_info({name})")} & set(DIMENSIONS)
+        for name in DATASETS if name in tables
+    ):
+        return True
+    if "trade" not in tables and {"importacao", "exportacao"} <= tables:
+        return True
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    return any(f"idx_{name}_key" not in indexes for name in DATASETS if name in tables)
+
+
+def upgrade_schema(db_path: str = DB_PATH) -> None:
+    """
+    Publica uma nova versão de bancos carregados antes das dimensões de país e produto,
+    da tabela `trade` ou dos índices UNIQUE das chaves naturais, convertendo-os para o formato atual.
+
+    A verificação é refeita na cópia de staging, já com o `writer_lock`: quando vários workers
+    iniciam juntos, só o primeiro converte o banco e os outros descartam a cópia.
+    """
+    if not os.path.exists(db_path):
+        return
+    conn = sqlite3.connect(db_path)
+    try:
+        outdated = _outdated(conn)
+    finally:
+        conn.close()
+    if not outdated:
+        return
+    with staging(db_path, source="upgrade") as stage:
+        if _outdated(stage.conn):
+            logging.info("Banco em formato antigo, publicando versão convertida.")
+        else:
+            stage.discard()
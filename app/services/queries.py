@@ -0,0 +1,447 @@
+import asyncio
+import inspect
+import logging
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, List, Literal, Optional, Tuple
+from cachetools import TTLCache
+from fastapi import HTTPException
+from app.core.database import run_db
+from app.core.database_config import DB_PATH
+from app.core.profiling import run_profiled
+from app.core.settings import LIVE_HORIZON_YEARS, SCRAPE_CACHE_SIZE, SCRAPE_CACHE_TTL
+from app.core.timing import span
+from app.services.changelog import changes_since
+from app.services.datasets import DATASETS, FILTER_COLUMNS
+from app.services.engine import get_engine
+from app.services.forecast import fit, forecasts, history_window
+from app.services.formatting import shape_response
+from app.services.records import Row, filter_rows
+from app.services.sources import Key, fetch
+from app.services.timeseries import cached, series_matrix, timeseries
+from app.services.trade import query_trade_rows
+from app.services.warmup import record_access
+
+# Opção do site (subopcao) de cada produto, nas rotas que exigem o produto.
+PRODUCT_OPTIONS = {
+    "processamento": {
+        "viníferas": 1, "viniferas": 1,
+        "americanas e híbridas": 2, "americanas e hibridas": 2,
+        "uvas de mesa": 3,
+        "sem classificação": 4, "sem classificacao": 4,
+    },
+    "importacao": {"vinhos de mesa": 1, "espumantes": 2, "uvas frescas": 3, "uvas passas": 4, "suco de uva": 5},
+    "exportacao": {"vinhos de mesa": 1, "espumantes": 2, "uvas frescas": 3, "suco de uva": 4},
+}
+
+_cache: TTLCache = TTLCache(maxsize=SCRAPE_CACHE_SIZE, ttl=SCRAPE_CACHE_TTL)
+_inflight: Dict[Key, asyncio.Future] = {}
+
+Result = Tuple[int, dict]
+
+# Origem pedida pelo cliente: "live" (site), "db" (banco) ou "auto" (política por ano, ver `prefers_live`).
+Source = Literal["live", "db", "auto"]
+
+
+async def _scrape(name: str, year: int, option: Optional[int] = None, track: bool = True) -> Tuple[List[Row], dict]:
+    """
+    `scrape` que também informa a origem das linhas: "cache" ou "live", com a idade em segundos.
+    """
+    key = (name, year, option)
+    if track and year is not None:
+        record_access(key)
+    cached = _cache.get(key)
+    if cached is not None:
+        rows, fetched_at = cached
+        return rows, {"source": "cache", "age_seconds": round(time.time() - fetched_at, 1)}
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(asyncio.to_thread(run_profiled, fetch, name, year, option))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    with span("scrape"):
+        rows = await asyncio.shield(task)
+    if rows:
+        _cache[key] = (rows, time.time())
+    return rows, {"source": "live", "age_seconds": 0.0}
+
+
+async def scrape(name: str, year: int, option: Optional[int] = None, track: bool = True) -> List[Row]:
+    """
+    Coleta uma página do site sem bloquear o event loop.
+
+    Páginas coletadas ficam em cache por `SCRAPE_CACHE_TTL` segundos, e requisições
+    simultâneas para a mesma página aguardam uma única coleta em andamento.
+
+    Parâmetros:
+        name (str): Nome da tabela.
+        year (int): Ano do filtro da tabela.
+        option (int): Opção do produto no site, ou None para páginas sem opções.
+        track (bool): Conta o acesso no histograma usado pelo aquecimento do cache.
+
+    Retorna:
+        List[Row]: Linhas coletadas. Vazia se o site não respondeu.
+    """
+    rows, _ = await _scrape(name, year, option, track)
+    return rows
+
+
+def _query_engine(name: str, year: Optional[int], exact: bool = False, **terms: Optional[str]) -> Tuple[List[dict], dict]:
+    engine = get_engine()
+    data = engine.query(name, year, exact=exact, **terms)
+    # O banco é trocado inteiro a cada publicação, então a data do arquivo é a da última carga.
+    age = round(time.time() - engine.mtime, 1) if engine.mtime else None
+    return data, {"source": "db", "age_seconds": age}
+
+
+def _has_year(name: str, year: Optional[int]) -> bool:
+    return bool(get_engine()[name].mask(year).any())
+
+
+def prefers_live(year: Optional[int], source: Source = "auto") -> bool:
+    """
+    Decide se a consulta vai ao site. No modo "auto", anos anteriores ao horizonte
+    `LIVE_HORIZON_YEARS` vêm do banco, já que o site não altera mais os anos fechados;
+    sem ano, o site devolve o mais recente.
+    """
+    if source != "auto":
+        return source == "live"
+    return year is None or year >= datetime.now().year - LIVE_HORIZON_YEARS
+
+
+async def load(name: str, year: Optional[int], option: Optional[int] = None, source: Source = "auto",
+               **terms: Optional[str]) -> Tuple[List[dict], dict]:
+    """
+    Linhas filtradas de uma página do site, da origem escolhida por `prefers_live`.
+
+    Se o site não responder, as linhas vêm do banco. No modo "auto", um ano antigo que
+    ainda não está no banco é buscado no site.
+
+    Parâmetros:
+        name (str): Nome da tabela.
+        year (int): Ano do filtro da tabela.
+        option (int): Opção do produto no site, ou None para páginas sem opções.
+        source (Source): "live", "db" ou "auto".
+        **terms: Filtros por campo do registro.
+
+    Retorna:
+        Tuple[List[dict], dict]: Linhas e a origem delas (`source`: "live", "cache" ou "db",
+        e `age_seconds`, idade dos dados em segundos).
+    """
+    live = prefers_live(year, source)
+    if live:
+        rows, origin = await _scrape(name, year, option)
+        if rows:
+            logging.info("Dados do site coletados com sucesso")
+            with span("filter"):
+                return filter_rows(rows, **terms), origin
+        logging.info("Erro ao capturar dados do site, tentando coletar do banco")
+    data, origin = await run_db(lambda: _query_engine(name, year, **terms))
+    if not data and not live and source == "auto" and not await run_db(_has_year, name, year):
+        rows, site = await _scrape(name, year, option)
+        if rows:
+            with span("filter"):
+                return filter_rows(rows, **terms), site
+    return data, origin
+
+
+async def query_producao(year: Optional[int] = None, category: Optional[str] = None,
+                         product: Optional[str] = None, source: Source = "auto") -> Result:
+    """
+    Dados de produção do ano, coletados do site ou lidos do banco conforme `source` (ver `load`).
+
+    Retorna:
+        Result: Status HTTP e conteúdo da resposta.
+    """
+    try:
+        filtered_data, origin = await load("producao", year, source=source, Product=product, Category=category)
+        if not filtered_data and origin["source"] == "db":
+            logging.warning("Consulta ao banco realizada, mas nenhum dado encontrado.")
+            return 200, {"success": True, **origin, "total": 0, "data": [], "message": "Nenhum dado encontrado no banco para os filtros informados."}
+        return 200, {"success": True, **origin, "total": len(filtered_data), "data": filtered_data}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Erro ao capturar dados do banco: {e}")
+        return 500, {"Success": False, "error": str(e)}
+
+
+async def query_processamento(year: Optional[int] = None, product: Optional[str] = None,
+                              group: Optional[str] = None, cultive: Optional[str] = None,
+                              source: Source = "auto") -> Result:
+    """
+    Dados de processamento do ano para o produto (Viníferas, Americanas e híbridas, ...).
+
+    Retorna:
+        Result: Status HTTP e conteúdo da resposta.
+    """
+    if product is None:
+        return 400, {"success": False, "error": "Necessário informar o produto: Viníferas, Uvas de mesa, Americanas e Híbridas ou Sem Classificação"}
+    option = PRODUCT_OPTIONS["processamento"].get(product.lower())
+    if option is None:
+        return 400, {"success": False, "error": "Produto inválido. Opções válidas: Viníferas, Uvas de mesa, Americanas e Híbridas ou Sem Classificação."}
+
+    try:
+        data, origin = await load("processamento", year, option, source, GroupName=group, Cultive=cultive, Product=product)
+        return 200, {"success": True, **origin, "total": len(data), "data": data}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Erro ao capturar dados do banco: {e}")
+        return 500, {"success": False, "error": str(e)}
+
+
+def comercializacao_rows(rows: List[dict]) -> List[dict]:
+    """
+    Linhas de comercialização no formato da rota, com a quantidade em "Quantity".
+    """
+    return [{"Year": row["Year"], "GroupName": row["GroupName"], "Product": row["Product"], "Quantity": row["Quantity_L"]} for row in rows]
+
+
+async def query_comercializacao(year: Optional[int] = None, group: Optional[str] = None,
+                                product: Optional[str] = None, source: Source = "auto") -> Result:
+    """
+    Dados de comercialização do ano, lidos sempre do banco, qualquer que seja `source`.
+
+    Retorna:
+        Result: Status HTTP e conteúdo da resposta.
+    """
+    try:
+        rows, origin = await run_db(lambda: _query_engine("comercializacao", year, exact=True, GroupName=group, Product=product))
+        data = comercializacao_rows(rows)
+        return 200, {"success": True, **origin, "total": len(data), "data": data}
+    except HTTPException:
+        raise
+    except Exception as e:
+        return 500, {"detail": {"success": False, "error": str(e)}}
+
+
+async def _query_trade(name: str, year: Optional[int], country: Optional[str], product: Optional[str],
+                       valid: str, source: Source = "auto") -> Result:
+    """
+    Consulta comum às páginas de importação e exportação, que têm o mesmo formato.
+
+    Retorna:
+        Result: Status HTTP e conteúdo da resposta.
+    """
+    if product is None:
+        return 200, {"Necessário informar o produto": valid}
+    option = PRODUCT_OPTIONS[name].get(product.lower())
+    if option is None:
+        return 400, {"success": False, "error": "Produto inválido. Opções válidas: Vinhos de mesa, Espumantes, Uvas frescas, Uvas passas ou Suco de uva."}
+
+    try:
+        data, origin = await load(name, year, option, source, Product=product, Country=country)
+        return 200, {"success": True, **origin, "total": len(data), "data": data}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Erro ao capturar dados do banco: {e}")
+        return 500, {"success": False, "error": str(e)}
+
+
+async def query_importacao(year: Optional[int] = None, country: Optional[str] = None,
+                           product: Optional[str] = None, source: Source = "auto") -> Result:
+    """
+    Dados de importação do ano para o produto, filtrados por país.
+    """
+    return await _query_trade("importacao", year, country, product, "Vinhos de mesa, Espumantes, Uvas frescas, Uvas passas ou Suco de uva", source)
+
+
+async def query_exportacao(year: Optional[int] = None, country: Optional[str] = None,
+                           product: Optional[str] = None, source: Source = "auto") -> Result:
+    """
+    Dados de exportação do ano para o produto, filtrados por país.
+    """
+    return await _query_trade("exportacao", year, country, product, "Vinhos de mesa, Espumantes, Uvas frescas ou Suco de uva", source)
+
+
+async def query_trade(year: Optional[int] = None, country: Optional[str] = None,
+                      product: Optional[str] = None, order_by: str = "Country") -> Result:
+    """
+    Métricas de comércio exterior (saldo, preço médio e participação), lidas da tabela
+    `trade` calculada na publicação das cargas.
+
+    Retorna:
+        Result: Status HTTP e conteúdo da resposta.
+    """
+    try:
+        data = await run_db(query_trade_rows, DB_PATH, year, country, product, order_by)
+        return 200, {"success": True, "total": len(data), "data": data}
+    except HTTPException:
+        raise
+    except sqlite3.OperationalError as e:
+        logging.error(f"Tabela trade indisponível: {e}")
+        return 503, {"success": False, "error": "Métricas de comércio ainda não calculadas."}
+    except Exception as e:
+        logging.error(f"Erro ao acessar o banco de dados: {e}")
+        return 500, {"success": False, "error": str(e)}
+
+
+def _series(name: str, value: str, by: str, filters: Dict[str, str], exact: bool = False):
+    """
+    Matriz de séries da tabela em cache, junto com a versão dos dados de onde foi calculada.
+    """
+    engine = get_engine()
+    key = ("series", engine.data_version, name, value, by, tuple(sorted(filters.items())), exact)
+    return engine.data_version, cached(key, lambda: series_matrix(engine[name], value, by, filters, exact))
+
+
+def validate_series(name: str, value: Optional[str], by: Optional[str], filters: Dict[str, Optional[str]]) -> Tuple[Optional[str], str, str, Dict[str, str]]:
+    """
+    Confere a coluna numérica, a coluna das séries e os filtros pedidos para uma tabela,
+    preenchendo os padrões (primeira coluna numérica; produto, ou país no comércio exterior).
+
+    Retorna:
+        Tuple: Mensagem de erro (ou None), coluna numérica, coluna das séries e filtros informados.
+    """
+    dataset = DATASETS[name]
+    value = value or dataset.quantities[0]
+    by = by or ("Country" if "Country" in dataset.categorical else "Product")
+    filters = {key: term for key, term in filters.items() if term}
+    if value not in dataset.quantities:
+        return f"Coluna numérica inválida para {name}. Opções: {', '.join(dataset.quantities)}", value, by, filters
+    if by not in dataset.categorical:
+        return f"Agrupamento inválido para {name}. Opções: {', '.join(dataset.categorical)}", value, by, filters
+    invalid = [key for key in filters if FILTER_COLUMNS[key] not in dataset.categorical]
+    if invalid:
+        valid = [key for key, column in FILTER_COLUMNS.items() if column in dataset.categorical]
+        return f"Filtros inválidos para {name}: {', '.join(invalid)}. Opções: {', '.join(valid)}", value, by, filters
+    return None, value, by, filters
+
+
+async def query_timeseries(name: str, value: Optional[str] = None, by: Optional[str] = None, window: int = 3,
+                           year_from: Optional[int] = None, year_to: Optional[int] = None,
+                           limit: Optional[int] = None, exact: bool = False, **filters: Optional[str]) -> Result:
+    """
+    Séries anuais de uma tabela por produto, país ou outra coluna categórica, com variação
+    anual, média móvel e CAGR calculadas no servidor a partir do banco.
+
+    O resultado fica em cache por versão dos dados, então só a primeira consulta de cada
+    combinação depois de uma publicação faz o cálculo.
+
+    Retorna:
+        Result: Status HTTP e conteúdo da resposta.
+    """
+    error, value, by, filters = validate_series(name, value, by, filters)
+    if error:
+        return 400, {"success": False, "error": error}
+    if year_from and year_to and year_from > year_to:
+        return 400, {"success": False, "error": "year_from deve ser menor ou igual a year_to."}
+
+    def compute() -> dict:
+        version, series = _series(name, value, by, filters, exact)
+        key = ("timeseries", version, name, value, by, tuple(sorted(filters.items())), exact, window, year_from, year_to, limit)
+        return {"data_version": version, **cached(key, lambda: timeseries(series, window, year_from, year_to, limit))}
+
+    try:
+        result = await run_db(compute)
+        return 200, {"success": True, "dataset": name, "value": value, "by": by, "window": window,
+                     "data_version": result["data_version"], "years": result["years"],
+                     "total": len(result["data"]), "data": result["data"]}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Erro ao calcular as séries: {e}")
+        return 500, {"success": False, "error": str(e)}
+
+
+def _forecast(name: str, value: str, by: str, filters: Dict[str, str], exact: bool, model: str,
+              history: Optional[int], horizon: int, limit: Optional[int]) -> dict:
+    version, series = _series(name, value, by, filters, exact)
+    if not len(series.years):
+        return {"data_version": version, "years": [], "data": []}
+    values, years = history_window(series.values, series.years, history)
+    base = (version, name, value, by, tuple(sorted(filters.items())), exact, model, history)
+    fitted = cached(("model", *base), lambda: fit(model, values, years))
+    result = cached(("forecast", *base, horizon, limit), lambda: forecasts(series.labels, values, years, fitted, horizon, limit))
+    return {"data_version": version, **result}
+
+
+async def query_forecast(name: str, value: Optional[str] = None, by: Optional[str] = None, model: str = "holt",
+                         horizon: int = 5, history: Optional[int] = 20, limit: Optional[int] = None,
+                         exact: bool = False, **filters: Optional[str]) -> Result:
+    """
+    Previsão dos próximos `horizon` anos das séries de uma tabela (ver `query_timeseries`).
+
+    Os modelos são ajustados para todas as séries da consulta numa única chamada vetorizada
+    e ficam em cache por versão dos dados; depois do primeiro ajuste, uma previsão custa o
+    mesmo que uma leitura.
+
+    Retorna:
+        Result: Status HTTP e conteúdo da resposta.
+    """
+    error, value, by, filters = validate_series(name, value, by, filters)
+    if error:
+        return 400, {"success": False, "error": error}
+    try:
+        result = await run_db(_forecast, name, value, by, filters, exact, model, history, horizon, limit)
+        return 200, {"success": True, "dataset": name, "value": value, "by": by, "model": model,
+                     "history": history, "horizon": horizon, "data_version": result["data_version"],
+                     "years": result["years"], "total": len(result["data"]), "data": result["data"]}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Erro ao calcular as previsões: {e}")
+        return 500, {"success": False, "error": str(e)}
+
+
+async def query_changes(since: int = 0, name: Optional[str] = None, limit: int = 1000) -> Result:
+    """
+    Mudanças publicadas depois da versão `since`, para que caches externos invalidem só as chaves afetadas.
+
+    Retorna:
+        Result: Status HTTP e conteúdo da resposta.
+    """
+    try:
+        version, data = await run_db(changes_since, DB_PATH, since, name, limit)
+        return 200, {"success": True, "version": version, "total": len(data), "data": data}
+    except HTTPException:
+        raise
+    except sqlite3.OperationalError as e:
+        logging.error(f"Changelog indisponível: {e}")
+        return 503, {"success": False, "error": "Nenhuma mudança registrada ainda."}
+    except Exception as e:
+        logging.error(f"Erro ao acessar o banco de dados: {e}")
+        return 500, {"success": False, "error": str(e)}
+
+
+QUERIES = {
+    "producao": query_producao,
+    "processamento": query_processamento,
+    "comercializacao": query_comercializacao,
+    "importacao": query_importacao,
+    "exportacao": query_exportacao,
+}
+
+
+async def run_batch(queries: List[dict]) -> List[dict]:
+    """
+    Executa várias consultas ao mesmo tempo, compartilhando o cache e as coletas em andamento.
+
+    Parâmetros:
+        queries (List[dict]): Consultas com a chave "dataset" e os parâmetros da rota correspondente,
+            incluindo `fields` e `format`.
+
+    Retorna:
+        List[dict]: Uma resposta por consulta, na mesma ordem, com o dataset e o status HTTP.
+    """
+    async def run(params: dict) -> dict:
+        params = {key: value for key, value in params.items() if value is not None}
+        name = params.pop("dataset")
+        fields, format = params.pop("fields", None), params.pop("format", "rows")
+        query = QUERIES[name]
+        invalid = sorted(set(params) - set(inspect.signature(query).parameters))
+        if invalid:
+            status, content = 400, {"success": False, "error": f"Parâmetros inválidos para {name}: {', '.join(invalid)}"}
+        else:
+            try:
+                status, content = await query(**params)
+                with span("shape"):
+                    status, content = shape_response(status, content, fields, format)
+            except HTTPException as e:
+                status, content = e.status_code, {"success": False, "error": e.detail}
+        return {"dataset": name, "status": status, **content}
+
+    return list(await asyncio.gather(*(run(params) for params in queries)))
@@ -0,0 +1,106 @@
+from operator import attrgetter
+from typing import Callable, Iterable, List, Optional
+import pandas as pd
+from app.util.helpers import normalize_text
+
+
+class Row:
+    """
+    Registro compacto de uma linha coletada do Vitibrasil.
+
+    Cada subclasse declara seus campos em `__slots__`, na ordem das colunas da tabela,
+    evitando o custo de um dict por linha e de um DataFrame por requisição.
+    """
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def as_tuple(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and self.as_tuple() == other.as_tuple()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}{self.as_tuple()!r}"
+
+
+class ProducaoRow(Row):
+    __slots__ = ("Year", "Category", "Product", "Quantity_L")
+
+
+class ProcessamentoRow(Row):
+    __slots__ = ("Year", "GroupName", "Cultive", "Quantity_Kg", "Product")
+
+
+class ComercializacaoRow(Row):
+    __slots__ = ("Year", "GroupName", "Product", "Quantity_L")
+
+
+class TradeRow(Row):
+    """
+    Linha das páginas de importação e exportação, que compartilham o mesmo formato.
+    """
+    __slots__ = ("Year", "Country", "Quantity_Kg", "Value_USD", "Product")
+
+
+def compile_filter(**terms: Optional[str]) -> Callable[[Row], bool]:
+    """
+    Pré-compila um predicado de filtro por substring, sem diferenciar maiúsculas nem acentos.
+
+    Parâmetros:
+        **terms: Campo do registro e termo procurado. Termos vazios ou None são ignorados.
+
+    Retorna:
+        Callable[[Row], bool]: Predicado que indica se a linha atende a todos os termos.
+    """
+    # Importado aqui porque as dimensões dependem dos registros, por meio de datasets.
+    from app.services.dimensions import search_names
+
+    checks = [(field, attrgetter(field), normalize_text(term)) for field, term in terms.items() if term]
+    if not checks:
+        return lambda row: True
+
+    def predicate(row: Row) -> bool:
+        for field, get, term in checks:
+            value = get(row)
+            if not value or not any(term in name for name in search_names(field, value)):
+                return False
+        return True
+
+    return predicate
+
+
+def filter_rows(rows: Iterable[Row], **terms: Optional[str]) -> List[dict]:
+    """
+    Filtra as linhas com `compile_filter` e as converte para dicts prontos para o JSON.
+
+    Parâmetros:
+        rows (Iterable[Row]): Linhas coletadas.
+        **terms: Campo do registro e termo procurado.
+
+    Retorna:
+        List[dict]: Linhas que atendem aos filtros.
+    """
+    matches = compile_filter(**terms)
+    return [row.to_dict() for row in rows if matches(row)]
+
+
+def rows_to_frame(rows: List[Row]) -> pd.DataFrame:
+    """
+    Converte as linhas em DataFrame. Usado apenas na carga em lote para o banco.
+
+    Parâmetros:
+        rows (List[Row]): Linhas coletadas, todas do mesmo tipo.
+
+    Retorna:
+        pd.DataFrame: Dados com uma coluna por campo do registro.
+    """
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame.from_records([row.as_tuple() for row in rows], columns=type(rows[0]).__slots__)
@@ -0,0 +1,198 @@
+import asyncio
+import fcntl
+import logging
+import random
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from app.core.database_config import DB_PATH
+from app.core.settings import (
+    REFRESH_INTERVAL_SECONDS,
+    REFRESH_JITTER_SECONDS,
+    REFRESH_MAX_KEYS,
+    REFRESH_RECENT_YEARS,
+    REFRESH_STATS_PATH,
+)
+from app.services.changelog import apply_rows
+from app.services.datasets import DATASETS
+from app.services.dimensions import create_fact_table, encode_rows, fact_columns
+from app.services.publish import staging
+from app.services.records import Row
+from app.services.sources import SCRAPERS, Key, fetch
+
+LOCK_PATH = "vitibrasil.refresh.lock"
+
+
+def volatile_keys(now: Optional[int] = None) -> List[Key]:
+    """
+    Chaves (tabela, ano, opção) que ainda podem mudar no site: os anos mais recentes.
+
+    Parâmetros:
+        now (int): Ano atual. Por padrão, o ano do relógio.
+
+    Retorna:
+        List[Key]: Chaves dos últimos `REFRESH_RECENT_YEARS` anos fechados.
+    """
+    now = now or datetime.now().year
+    years = range(now - REFRESH_RECENT_YEARS, now)
+    return [(name, year, option) for name, (_, options) in SCRAPERS.items() for year in years for option in options]
+
+
+def _init_stats(conn: sqlite3.Connection) -> None:
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS refresh_stats (
+            dataset TEXT,
+            year INTEGER,
+            option INTEGER,
+            checks INTEGER DEFAULT 0,
+            changes INTEGER DEFAULT 0,
+            last_checked REAL,
+            last_changed REAL,
+            PRIMARY KEY (dataset, year, option)
+        )
+    ''')
+
+
+def prioritize(keys: List[Key], path: str = REFRESH_STATS_PATH) -> List[Key]:
+    """
+    Ordena as chaves pela frequência de mudança observada, estimada como
+    (mudanças + 1) / (verificações + 2), para que chaves nunca verificadas venham antes das estáveis.
+    """
+    conn = sqlite3.connect(path, timeout=10)
+    try:
+        stats = {
+            (row[0], row[1], row[2]): (row[3], row[4])
+            for row in conn.execute("SELECT dataset, year, option, checks, changes FROM refresh_stats")
+        }
+    except sqlite3.OperationalError:
+        stats = {}
+    finally:
+        conn.close()
+
+    def score(key: Key) -> float:
+        checks, changes = stats.get((key[0], key[1], -1 if key[2] is None else key[2]), (0, 0))
+        return (changes + 1) / (checks + 2)
+
+    return sorted(keys, key=score, reverse=True)
+
+
+def refresh_key(conn: sqlite3.Connection, key: Key, rows: List[Row], version: int) -> bool:
+    """
+    Grava apenas as linhas de uma chave que mudaram, registrando-as no `changelog`.
+
+    Parâmetros:
+        conn (sqlite3.Connection): Conexão com a cópia de staging do banco.
+        key (Key): Tabela, ano e opção.
+        rows (List[Row]): Linhas coletadas do site para a chave.
+        version (int): Versão que será publicada com as mudanças.
+
+    Retorna:
+        bool: Se os dados mudaram.
+    """
+    name, year, option = key
+    dataset = DATASETS[name]
+    create_fact_table(conn, dataset)
+    fresh = encode_rows(conn, dataset, [row.as_tuple() for row in rows])
+    where, params = "Year = ?", [year]
+    if option is not None:
+        where, params = "Year = ? AND product_id IS ?", [year, fresh[0][fact_columns(dataset).index("product_id")]]
+    return apply_rows(conn, dataset, fresh, version, where, params) > 0
+
+
+def record_stats(results: Dict[Key, Optional[bool]], path: str = REFRESH_STATS_PATH) -> None:
+    """
+    Registra o resultado das verificações em `refresh_stats`, usado por `prioritize`.
+
+    As estatísticas não fazem parte dos dados publicados e ficam num arquivo próprio, como
+    o histograma de app/services/warmup.py. No banco publicado, cada rodada mudaria a data
+    de modificação dele e recarregaria os motores.
+    """
+    now = time.time()
+    params = [
+        (name, year, -1 if option is None else option, int(changed), now, now if changed else None)
+        for (name, year, option), changed in results.items() if changed is not None
+    ]
+    conn = sqlite3.connect(path, timeout=10)
+    try:
+        with conn:
+            _init_stats(conn)
+            conn.executemany('''
+                INSERT INTO refresh_stats (dataset, year, option, checks, changes, last_checked, last_changed)
+                VALUES (?, ?, ?, 1, ?, ?, ?)
+                ON CONFLICT (dataset, year, option) DO UPDATE SET
+                    checks = checks + 1,
+                    changes = changes + excluded.changes,
+                    last_checked = excluded.last_checked,
+                    last_changed = COALESCE(excluded.last_changed, last_changed)
+            ''', params)
+    finally:
+        conn.close()
+
+
+def refresh_recent(db_path: str = DB_PATH, lock_path: str = LOCK_PATH) -> Optional[int]:
+    """
+    Atualiza as chaves voláteis, das mais às menos propensas a mudar.
+
+    Usa um lock de arquivo não bloqueante: se outro worker já estiver atualizando, não faz nada.
+    Todas as chaves são coletadas antes de abrir a cópia de staging, para que uma página lenta
+    do site não segure o `writer_lock` das outras publicações. As alterações são publicadas numa nova versão do banco apenas se alguma chave mudou.
+
+    Parâmetros:
+        db_path (str): Caminho do banco.
+        lock_path (str): Arquivo usado como lock entre os workers.
+
+    Retorna:
+        Optional[int]: Número de chaves alteradas, ou None se outro worker detém o lock.
+    """
+    with open(lock_path, "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logging.info("Atualização em andamento em outro worker.")
+            return None
+        try:
+            results: Dict[Key, Optional[bool]] = {}
+            collected: Dict[Key, List[Row]] = {}
+            keys = prioritize(volatile_keys())[:REFRESH_MAX_KEYS]
+            for key in keys:
+                try:
+                    rows = fetch(*key)
+                except Exception as e:
+                    logging.error(f"Erro ao coletar {key}: {e}")
+                    continue
+                if rows:
+                    collected[key] = rows
+                else:
+                    results[key] = None
+            changed = 0
+            if collected:
+                with staging(db_path, source="scheduler") as stage:
+                    for key, rows in collected.items():
+                        try:
+                            results[key] = refresh_key(stage.conn, key, rows, stage.next_version)
+                        except Exception as e:
+                            logging.error(f"Erro ao atualizar {key}: {e}")
+                            continue
+                        if results[key]:
+                            changed += 1
+                            logging.info(f"Dados alterados em {key}.")
+                    if not changed:
+                        stage.discard()
+            record_stats(results)
+            logging.info(f"Atualização concluída: {changed} de {len(keys)} chaves alteradas.")
+            return changed
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+async def run_scheduler(interval: int = REFRESH_INTERVAL_SECONDS, jitter: int = REFRESH_JITTER_SECONDS) -> None:
+    """
+    Laço iniciado no lifespan da aplicação. O jitter evita que os workers acordem juntos.
+    """
+    while True:
+        await asyncio.sleep(interval + random.uniform(0, jitter))
+        try:
+            await asyncio.to_thread(refresh_recent)
+        except Exception as e:
+            logging.error(f"Erro na atualização agendada: {e}")
@@ -1,12 +1,16 @@
 import logging
-import pandas as pd
 import requests
-import sqlite3
 from app.core import logging_config, logging
 from bs4 import BeautifulSoup
 from datetime import datetime
-
-def get_comercializacao(year: int) -> pd.DataFrame:
+from typing import List
+from app.core.timing import span
+from app.services.datasets import DATASETS
+from app.services.publish import staging
+from app.services.records import ComercializacaoRow
+from app.services.writer import write_rows
+
+def get_comercializacao(year: int) -> List[ComercializacaoRow]:
     """
     Coleta dados da página de comercialização do Vitibrasil usando scraping.
 
@@ -14,23 +18,25 @@ def get_comercializacao(year: int) -> pd.DataFrame:
         year (int): Ano do filtro da tabela.
 
     Retorna:
-        pd.DataFrame: Dados coletados do site para os anos informados.
+        List[ComercializacaoRow]: Dados coletados do site para os anos informados.
     """
     URL = f"http://vitibrasil.cnpuv.embrapa.br/index.php?ano={year}&opcao=opt_04" 
     
     try:
-        response = requests.get(URL)
+        with span("fetch"):
+            response = requests.get(URL, timeout=15)
         response.raise_for_status()
         response.encoding ='utf-8'
     except Exception as e:
         logging.error(f"Erro ao acessar {URL}: {e}")
-        return pd.DataFrame()
+        return []
     
-    soup = BeautifulSoup(response.text, "html.parser")
+    with span("parse"):
+        soup = BeautifulSoup(response.text, "html.parser")
     table = soup.find("table", class_="tb_base tb_dados")
     
     if not table:
-        return pd.DataFrame()
+        return []
     
     rows = table.find_all("tr")
     data = []
@@ -53,43 +59,9 @@ def get_comercializacao(year: int) -> pd.DataFrame:
         else:
             continue
 
-        data.append({
-            "Year": year, 
-            "GroupName": group, 
-            "Product": product,
-            "Quantity_L": quantity
-        })
-
-    return pd.DataFrame(data) 
-
-def save_data_db(df: pd.DataFrame) -> None:
-    """
-    Salva os dados coletados do site Vitibrasil no banco de dados SQLite, tabela 'comercializacao'.
-
-    Parâmetros:
-        df (pd.DataFrame): Dados coletados do site.
-
-    Retorna:
-        None
-    """
-    conn = sqlite3.connect("vitibrasil.db")
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS comercializacao (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            Year INTEGER,
-            GroupName TEXT, 
-            Product TEXT,
-            Quantity_L TEXT
-        )
-    ''')
-
-    df.to_sql("comercializacao", conn, if_exists="append", index=False)
-
-    conn.commit()
-    conn.close()
+        data.append(ComercializacaoRow(year, group, product, quantity))
 
+    return data
 
 def scrap_comercializacao() -> None:
     """
@@ -102,15 +74,23 @@ def scrap_comercializacao() -> None:
         None
     """
     now = datetime.now().year
+    rows, failed = [], []
     for year in range(1970, now):
         logging.info(f"Extracting data year: {year}")
-        df = get_comercializacao(year)
-        if not df.empty:
-            save_data_db(df)
-            logging.info(f"{len(df)} dados de salvos em 'comercializacao'.")
+        page = get_comercializacao(year)
+        if page:
+            rows.extend(row.as_tuple() for row in page)
+            logging.info(f"{len(page)} dados coletados em 'comercializacao'.")
         else:
-            logging.warning(f"Data not saved - empty DataFrame")
-    
+            failed.append(year)
+    if failed:
+        logging.warning(f"{len(failed)} páginas sem dados em 'comercializacao', mantidas como estavam: {failed}")
+    if not rows:
+        return
+    with staging(source="scraper_comercializacao") as stage:
+        if not write_rows(stage.conn, DATASETS["comercializacao"], rows, stage.next_version, ("Year",)):
+            stage.discard()
+
 if __name__ == "__main__":
     """
         Para extrair os dados do site, execute no terminal:
@@ -1,12 +1,16 @@
 import logging
-import pandas as pd
 import requests
-import sqlite3
 from app.core import logging_config
 from bs4 import BeautifulSoup
 from datetime import datetime
+from typing import List
+from app.core.timing import span
+from app.services.datasets import DATASETS
+from app.services.publish import staging
+from app.services.records import TradeRow
+from app.services.writer import write_rows
 
-def get_exportacao(year: int, option: int) -> pd.DataFrame:
+def get_exportacao(year: int, option: int) -> List[TradeRow]:
     """
     Coleta dados da página de importação do Vitibrasil usando scraping.
 
@@ -19,18 +23,20 @@ def get_exportacao(year: int, option: int) -> pd.DataFrame:
             04 - suco de uva
 
     Retorna:
-        pd.DataFrame: Dados coletados do site para o ano e opção informados.
+        List[TradeRow]: Dados coletados do site para o ano e opção informados.
     """
     URL = f"http://vitibrasil.cnpuv.embrapa.br/index.php?ano={year}&opcao=opt_06&subopcao=subopt_0{option}" 
     try:
-        response = requests.get(URL)
+        with span("fetch"):
+            response = requests.get(URL, timeout=15)
         response.raise_for_status()
         response.encoding ='utf-8'
     except Exception as e:
         logging.error(f"Erro ao acessar {URL}: {e}")
-        return pd.DataFrame()
+        return []
         
-    soup = BeautifulSoup(response.text, "html.parser")
+    with span("parse"):
+        soup = BeautifulSoup(response.text, "html.parser")
     table = soup.find("table", class_="tb_base tb_dados")
     product_tags = soup.find_all("button", class_="btn_sopt")
     if len(product_tags) >= option:
@@ -39,7 +45,7 @@ def get_exportacao(year: int, option: int) -> pd.DataFrame:
         product = None
         
     if not table:
-        return pd.DataFrame()
+        return []
     
     rows = table.find_all("tr")
     data = [] 
@@ -53,44 +59,10 @@ def get_exportacao(year: int, option: int) -> pd.DataFrame:
         quantity = cols[1].text.strip().lower()
         value = cols[2].text.strip().lower()
 
-        data.append({
-            "Year": year,
-            "Country": country, 
-            "Quantity_Kg": quantity, 
-            "Value_USD": value,
-            "Product": product
-        })
+        data.append(TradeRow(year, country, quantity, value, product))
 
-    return pd.DataFrame(data) 
+    return data
 
-def save_data_db(df: pd.DataFrame) -> None:
-    """
-    Salva os dados coletados do site Vitibrasil no banco de dados SQLite, tabela 'exportacao'.
-
-    Parâmetros:
-        df (pd.DataFrame): Dados coletados do site.
-
-    Retorna:
-        None
-    """
-    conn = sqlite3.connect("vitibrasil.db")
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS exportacao (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            Year INTEGER,
-            Country TEXT,
-            Quantity_Kg TEXT, 
-            Value_USD TEXT,
-            Product TEXT
-        )
-    ''')
-
-    df.to_sql("exportacao", conn, if_exists="append", index=False)
-    conn.commit()
-    conn.close()
-    
 def scrap_exportacao() -> None:
     """
     Executa o scraping para todos os anos e opções de produto da página exportação, salvando os dados no banco de dados.
@@ -102,18 +74,24 @@ def scrap_exportacao() -> None:
         None
     """
     now = datetime.now().year
+    rows, failed = [], []
     for year in range(1970, now):
         logging.info(f"Extracting data year: {year}")
         for option in range(1, 5):
-            df = get_exportacao(year, option)
-            if not df.empty:
-                product = df["Product"].iloc[0]
-                save_data_db(df)
-                logging.info(f"{len(df)} dados de {product} salvos em 'exportacao'.")
+            page = get_exportacao(year, option)
+            if page:
+                rows.extend(row.as_tuple() for row in page)
+                logging.info(f"{len(page)} dados de {page[0].Product} coletados em 'exportacao'.")
             else:
-                logging.warning(f"Data not saved")
-                
-    
+                failed.append((year, option))
+    if failed:
+        logging.warning(f"{len(failed)} páginas sem dados em 'exportacao', mantidas como estavam: {failed}")
+    if not rows:
+        return
+    with staging(source="scraper_exportacao") as stage:
+        if not write_rows(stage.conn, DATASETS["exportacao"], rows, stage.next_version, ("Year", "product_id")):
+            stage.discard()
+
 if __name__ == "__main__":
     """
         Para extrair os dados do site, execute no terminal:
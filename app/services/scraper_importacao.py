@@ -2,11 +2,15 @@ from app.core import logging_config
 from bs4 import BeautifulSoup
 from datetime import datetime
 import logging
-import pandas as pd
 import requests
-import sqlite3
+from typing import List
+from app.core.timing import span
+from app.services.datasets import DATASETS
+from app.services.publish import staging
+from app.services.records import TradeRow
+from app.services.writer import write_rows
 
-def get_importacao(year: int, option: int) -> pd.DataFrame:
+def get_importacao(year: int, option: int) -> List[TradeRow]:
     """
     Coleta dados da página de importação do Vitibrasil usando scraping.
 
@@ -20,26 +24,28 @@ def get_importacao(year: int, option: int) -> pd.DataFrame:
             05 - suco de uva
 
     Retorna:
-        pd.DataFrame: Dados coletados do site para o ano e opção informados.
+        List[TradeRow]: Dados coletados do site para o ano e opção informados.
     """
     data = []   
     URL = f"http://vitibrasil.cnpuv.embrapa.br/index.php?ano={year}&opcao=opt_05&subopcao=subopt_0{option}"
     try:
-        response = requests.get(URL,timeout=15)
+        with span("fetch"):
+            response = requests.get(URL,timeout=15)
         response.raise_for_status()
         response.encoding = 'utf-8'
     except Exception as e:
         logging.error(f"Erro ao acessar {URL}: {e}")
-        return pd.DataFrame()
+        return []
         
      
-    soup = BeautifulSoup(response.text, "html.parser")
+    with span("parse"):
+        soup = BeautifulSoup(response.text, "html.parser")
     table = soup.find("table", class_="tb_base tb_dados")
     
     if not table: 
         product_tags = soup.find_all("button", class_="btn_sopt")
         logging.warning(f"Table not found for year {year}, option {option} (produto: {product_tags[option-1].text.strip().lower() if len(product_tags) >= option else 'desconhecido'})")
-        return pd.DataFrame()
+        return []
 
     product_tags = soup.find_all("button", class_="btn_sopt")
     if len(product_tags) >= option:
@@ -57,40 +63,8 @@ def get_importacao(year: int, option: int) -> pd.DataFrame:
         quantity = cols[1].text.strip().lower()
         value = cols[2].text.strip().lower()
         
-        data.append({
-            "Year": year,
-            "Country": country, 
-            "Quantity_Kg": quantity, 
-            "Value_USD": value,
-            "Product": product
-        })
-    return pd.DataFrame(data)
-
-def save_data_db(df: pd.DataFrame) -> None:
-    """
-    Salva os dados coletados do site Vitibrasil no banco de dados SQLite, tabela 'importacao'.
-
-    Parâmetros:
-        df (pd.DataFrame): Dados coletados do site.
-
-    Retorna:
-        None
-    """
-    conn = sqlite3.connect("vitibrasil.db")
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS importacao (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            Year INTEGER,
-            Country TEXT,
-            Quantity_Kg TEXT, 
-            Value_USD TEXT,
-            Product TEXT
-        )
-    ''')
-    df.to_sql("importacao", conn, if_exists="append", index=False)
-    conn.commit()
-    conn.close()
+        data.append(TradeRow(year, country, quantity, value, product))
+    return data
 
 def scrap_importacao() -> None:
     """
@@ -103,16 +77,23 @@ def scrap_importacao() -> None:
         None
     """
     now = datetime.now().year
-    for year in range(1970, now):  
+    rows, failed = [], []
+    for year in range(1970, now):
         logging.info(f"Extracting data year: {year}")
         for option in range(1, 5):
-            df = get_importacao(year, option)
-            if not df.empty:
-                product = df["Product"].iloc[0]
-                save_data_db(df)
-                logging.info(f"{len(df)} dados de {product} salvos em 'importacao'.")
+            page = get_importacao(year, option)
+            if page:
+                rows.extend(row.as_tuple() for row in page)
+                logging.info(f"{len(page)} dados de {page[0].Product} coletados em 'importacao'.")
             else:
-                logging.warning("Data not saved")
+                failed.append((year, option))
+    if failed:
+        logging.warning(f"{len(failed)} páginas sem dados em 'importacao', mantidas como estavam: {failed}")
+    if not rows:
+        return
+    with staging(source="scraper_importacao") as stage:
+        if not write_rows(stage.conn, DATASETS["importacao"], rows, stage.next_version, ("Year", "product_id")):
+            stage.discard()
 
 if __name__ == "__main__":
     """
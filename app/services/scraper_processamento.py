@@ -1,12 +1,16 @@
 import logging
-import pandas as pd
 import requests
-import sqlite3
 from bs4 import BeautifulSoup
 from datetime import datetime
+from typing import List
 from app.core import logging_config
+from app.core.timing import span
+from app.services.datasets import DATASETS
+from app.services.publish import staging
+from app.services.records import ProcessamentoRow
+from app.services.writer import write_rows
 
-def get_processamento(year: int, option: int) -> pd.DataFrame:
+def get_processamento(year: int, option: int) -> List[ProcessamentoRow]:
     """
     Coleta dados da página de processamento do Vitibrasil usando scraping.
 
@@ -19,26 +23,28 @@ def get_processamento(year: int, option: int) -> pd.DataFrame:
             04 - sem classificação
             
     Retorna:
-        pd.DataFrame: Dados coletados do site para o ano e opção informados.
+        List[ProcessamentoRow]: Dados coletados do site para o ano e opção informados.
     """
     logging.info("Iniciando scraping de processamento.")
     URL = f"http://vitibrasil.cnpuv.embrapa.br/index.php?ano={year}&opcao=opt_03&subopcao=subopt_0{option}"
     try:
-        response = requests.get(URL,timeout=15)
+        with span("fetch"):
+            response = requests.get(URL,timeout=15)
         response.raise_for_status()
         response.encoding ='utf-8'
         logging.info("Acesso ao site bem-sucedido.")
     except Exception as e:
         logging.error(f"Erro ao acessar {URL}: {e}")
-        return pd.DataFrame()
+        return []
     
-    soup = BeautifulSoup(response.text, "html.parser")
+    with span("parse"):
+        soup = BeautifulSoup(response.text, "html.parser")
     table = soup.find("table", class_="tb_base tb_dados")
     
     if not table: 
         product_tags = soup.find_all("button", class_="btn_sopt")
         logging.warning(f"Table not found for year {year}, option {option} (produto: {product_tags[option-1].text.strip().lower() if len(product_tags) >= option else 'desconhecido'})")
-        return pd.DataFrame()
+        return []
     
     product_tags = soup.find_all("button", class_="btn_sopt")
     if len(product_tags) >= option:
@@ -70,49 +76,11 @@ def get_processamento(year: int, option: int) -> pd.DataFrame:
             continue
         
         if col_sem_definicao != []:
-            data.append({
-                "Year": year, 
-                "GroupName": group
-            })
+            data.append(ProcessamentoRow(year, group, None, None, None))
         else:
-                data.append({
-                "Year": year, 
-                "GroupName": group, 
-                "Cultive": cultive,
-                "Quantity_Kg": quantity,
-                "Product": product
-            })
-
-    return pd.DataFrame(data)
-
-def save_data_db(df: pd.DataFrame) -> None:
-    """
-    Salva os dados coletados do site Vitibrasil no banco de dados SQLite, tabela 'processamento'.
-
-    Parâmetros:
-        df (pd.DataFrame): Dados coletados do site.
-
-    Retorna:
-        None
-    """
-    conn = sqlite3.connect("vitibrasil.db")
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS processamento (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            Year INTEGER,
-            GroupName TEXT, 
-            Cultive TEXT,
-            Quantity_Kg TEXT,
-            Product TEXT
-        )
-    ''')
-
-    df.to_sql("processamento", conn, if_exists="append", index=False)
-    conn.commit()
-    conn.close()
+            data.append(ProcessamentoRow(year, group, cultive, quantity, product))
 
+    return data
 
 def scrap_processamento() -> None:
     """
@@ -125,15 +93,24 @@ def scrap_processamento() -> None:
         None
     """
     now = datetime.now().year
+    rows, failed = [], []
     for year in range(1970, now):
         logging.info(f"Extracting data year: {year}")
-        for option in range(1,5):  
-            df = get_processamento(year,option)
-            if not df.empty:
-                save_data_db(df)
-                product = df["Product"].iloc[0]
-                logging.info(f"{len(df)} dados de {product} salvos em 'processamento'.")
-    
+        for option in range(1, 5):
+            page = get_processamento(year, option)
+            if page:
+                rows.extend(row.as_tuple() for row in page)
+                logging.info(f"{len(page)} dados de {page[0].Product} coletados em 'processamento'.")
+            else:
+                failed.append((year, option))
+    if failed:
+        logging.warning(f"{len(failed)} páginas sem dados em 'processamento', mantidas como estavam: {failed}")
+    if not rows:
+        return
+    with staging(source="scraper_processamento") as stage:
+        if not write_rows(stage.conn, DATASETS["processamento"], rows, stage.next_version, ("Year", "product_id")):
+            stage.discard()
+
 if __name__ == "__main__":
     """
         Para extrair os dados do site, execute no terminal:
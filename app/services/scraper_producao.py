@@ -1,13 +1,16 @@
 import logging
-import pandas as pd
 import requests
-import sqlite3
 from bs4 import BeautifulSoup
 from datetime import datetime
+from typing import List
 from app.core import logging_config
-from fastapi.responses import JSONResponse
+from app.core.timing import span
+from app.services.datasets import DATASETS
+from app.services.publish import staging
+from app.services.records import ProducaoRow
+from app.services.writer import write_rows
 
-def get_producao(year: int) -> pd.DataFrame:
+def get_producao(year: int) -> List[ProducaoRow]:
     """
     Coleta dados da página de producao do Vitibrasil usando scraping.
 
@@ -15,78 +18,44 @@ def get_producao(year: int) -> pd.DataFrame:
         year (int): Ano do filtro da tabela.
     
     Retorna:
-        pd.DataFrame: Dados coletados do site para o ano informado.
+        List[ProducaoRow]: Dados coletados do site para o ano informado.
     """
     URL = f"http://vitibrasil.cnpuv.embrapa.br/index.php?ano={year}&opcao=opt_02"
     
     try:
         logging.info("Acessando o site Vitibrasil")
-        response = requests.get(URL)
+        with span("fetch"):
+            response = requests.get(URL, timeout=15)
         response.raise_for_status()
         response.encoding = 'utf-8' 
     except Exception as e:
         logging.error(f"Erro ao acessas {URL}: {e}")
-        return pd.DataFrame()
+        return []
     
-    soup = BeautifulSoup(response.text, "html.parser") 
+    with span("parse"):
+        soup = BeautifulSoup(response.text, "html.parser")
     table = soup.find("table", class_="tb_base tb_dados")
     
     if not table:
-        return pd.DataFrame()
+        return []
 
     rows = table.find_all("tr")
     data = []
+    current_product = None
     for row in rows:
         cols = row.find_all("td")
         if len(cols) == 2:
             if "tb_item" in cols[0].get("class", []):
                 current_product = cols[0].text.strip().lower()
                 total_quantity = cols[1].text.strip().lower()
-                data.append({
-                    "Year": year,
-                    "Category": current_product,
-                    "Product": "todos da categoria",
-                    "Quantity_L": total_quantity
-                })
+                data.append(ProducaoRow(year, current_product, "todos da categoria", total_quantity))
                 continue
             
             quantity = cols[1].text.strip().lower()
             subProduct = cols[0].text.strip().lower()
-            data.append({
-                "Year": year,
-                "Category": current_product if 'current_product' in locals() else None,
-                "Product": subProduct,
-                "Quantity_L": quantity
-            })
+            data.append(ProducaoRow(year, current_product, subProduct, quantity))
 
-    return pd.DataFrame(data)
-
-def save_at_db(df: pd.DataFrame) -> None:
-    """
-    Salva os dados coletados do site Vitibrasil no banco de dados SQLite, tabela 'producao'.
-
-    Parâmetros:
-        df (pd.DataFrame): Dados coletados do site.
-
-    Retorna:
-        None
-    """
-    conn = sqlite3.connect("vitibrasil.db")
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS producao (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            Year INTEGER,
-            Category TEXT, 
-            Product TEXT,
-            Quantity_L TEXT
-        )
-        ''')
-    
-    df.to_sql("producao", conn, if_exists="append", index=False)
-    conn.commit()
-    conn.close()
+    return data
 
 def scrap_producao() -> None:
     """
@@ -99,11 +68,22 @@ def scrap_producao() -> None:
         None
     """
     now = datetime.now().year
+    rows, failed = [], []
     for year in range(1970, now):
-        print(f"Extracting data from year {year}")
-        df = get_producao(year) 
-        if not df.empty:
-            save_at_db(df)
+        logging.info(f"Extracting data year: {year}")
+        page = get_producao(year)
+        if page:
+            rows.extend(row.as_tuple() for row in page)
+            logging.info(f"{len(page)} dados coletados em 'producao'.")
+        else:
+            failed.append(year)
+    if failed:
+        logging.warning(f"{len(failed)} páginas sem dados em 'producao', mantidas como estavam: {failed}")
+    if not rows:
+        return
+    with staging(source="scraper_producao") as stage:
+        if not write_rows(stage.conn, DATASETS["producao"], rows, stage.next_version, ("Year",)):
+            stage.discard()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,124 @@
+import fcntl
+import json
+import logging
+import os
+import shutil
+from contextlib import contextmanager
+from typing import Optional
+import numpy as np
+from app.core.database_config import SNAPSHOT_DIR
+from app.services.datasets import DATASETS
+
+KEEP_VERSIONS = 2
+
+
+@contextmanager
+def snapshot_lock(snapshot_dir: str = SNAPSHOT_DIR):
+    """
+    Lock exclusivo entre processos, para que apenas um worker gere e publique o snapshot.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    with open(os.path.join(snapshot_dir, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def current_version(snapshot_dir: str = SNAPSHOT_DIR) -> Optional[int]:
+    """
+    Versão apontada pelo arquivo CURRENT, ou None se nenhum snapshot foi publicado.
+    """
+    try:
+        with open(os.path.join(snapshot_dir, "CURRENT")) as f:
+            return int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def publish_snapshot(engine, snapshot_dir: str = SNAPSHOT_DIR, version: Optional[int] = None) -> int:
+    """
+    Grava as colunas do motor como arquivos .npy e publica a nova versão.
+
+    A versão é escrita num diretório temporário, renomeada para `v{versão}` e só então
+    o CURRENT é trocado com `os.replace`, de modo que os workers nunca leiam um snapshot pela metade.
+    Deve ser chamada com `snapshot_lock` adquirido.
+
+    Parâmetros:
+        engine (Engine): Motor com as tabelas carregadas.
+        snapshot_dir (str): Diretório dos snapshots.
+        version (int): Versão publicada. Por padrão, a atual mais um.
+
+    Retorna:
+        int: Versão publicada.
+    """
+    if version is None:
+        version = (current_version(snapshot_dir) or 0) + 1
+    final_dir = os.path.join(snapshot_dir, f"v{version}")
+    tmp_dir = f"{final_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    meta = {"version": version, "db_mtime": engine.mtime, "data_version": engine.data_version, "tables": {}}
+    for name, table in engine.tables.items():
+        np.save(os.path.join(tmp_dir, f"{name}.Year.npy"), np.ascontiguousarray(table.year))
+        for column, values in {**table.codes, **table.quantities}.items():
+            np.save(os.path.join(tmp_dir, f"{name}.{column}.npy"), np.ascontiguousarray(values))
+        meta["tables"][name] = {"size": table.size, "dictionaries": table.dictionaries}
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.rename(tmp_dir, final_dir)
+    pointer = os.path.join(snapshot_dir, f"CURRENT.tmp-{os.getpid()}")
+    with open(pointer, "w") as f:
+        f.write(str(version))
+    os.replace(pointer, os.path.join(snapshot_dir, "CURRENT"))
+    logging.info(f"Snapshot v{version} publicado em {final_dir}.")
+
+    # Versões antigas podem continuar mapeadas por algum worker; no Linux os arquivos
+    # só são liberados quando o último mapeamento é fechado.
+    for entry in os.listdir(snapshot_dir):
+        if entry.startswith("v") and entry[1:].isdigit() and int(entry[1:]) <= version - KEEP_VERSIONS:
+            shutil.rmtree(os.path.join(snapshot_dir, entry), ignore_errors=True)
+    return version
+
+
+def open_snapshot(version: Optional[int] = None, snapshot_dir: str = SNAPSHOT_DIR):
+    """
+    Mapeia um snapshot publicado em modo somente leitura.
+
+    As colunas ficam no page cache do sistema e são compartilhadas por todos os workers do host.
+
+    Parâmetros:
+        version (int): Versão a abrir. Por padrão, a apontada pelo CURRENT.
+        snapshot_dir (str): Diretório dos snapshots.
+
+    Retorna:
+        Engine: Motor com colunas `np.memmap`, ou None se não houver snapshot.
+    """
+    from app.services.engine import Engine, Table
+
+    if version is None:
+        version = current_version(snapshot_dir)
+        if version is None:
+            return None
+    path = os.path.join(snapshot_dir, f"v{version}")
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+
+    tables = {}
+    for name, dataset in DATASETS.items():
+        info = meta["tables"][name]
+        # Arquivos de colunas vazias não podem ser mapeados.
+        mode = "r" if info["size"] else None
+        load = lambda name, column: np.load(os.path.join(path, f"{name}.{column}.npy"), mmap_mode=mode)
+        tables[name] = Table(
+            dataset,
+            load(name, "Year"),
+            {column: load(name, column) for column in dataset.categorical},
+            info["dictionaries"],
+            {column: load(name, column) for column in dataset.quantities},
+        )
+    return Engine(tables, meta["db_mtime"], version, meta["data_version"])
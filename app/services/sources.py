@@ -0,0 +1,36 @@
+from typing import List, Optional, Tuple
+from app.core.memory import measure
+from app.services.records import Row
+from app.services.scraper_producao import get_producao
+from app.services.scraper_processamento import get_processamento
+from app.services.scraper_comercializacao import get_comercializacao
+from app.services.scraper_importacao import get_importacao
+from app.services.scraper_exportacao import get_exportacao
+
+# Função de scraping e opções (subopcao do site) de cada tabela. None indica página sem opções.
+SCRAPERS = {
+    "producao": (get_producao, (None,)),
+    "processamento": (get_processamento, (1, 2, 3, 4)),
+    "comercializacao": (get_comercializacao, (None,)),
+    "importacao": (get_importacao, (1, 2, 3, 4, 5)),
+    "exportacao": (get_exportacao, (1, 2, 3, 4)),
+}
+
+Key = Tuple[str, int, Optional[int]]
+
+
+def fetch(name: str, year: int, option: Optional[int] = None) -> List[Row]:
+    """
+    Coleta uma página do site para a tabela, ano e opção informados.
+
+    Parâmetros:
+        name (str): Nome da tabela.
+        year (int): Ano do filtro da tabela.
+        option (int): Opção do produto no site, ou None para páginas sem opções.
+
+    Retorna:
+        List[Row]: Linhas coletadas. Vazia se o site não respondeu.
+    """
+    scraper, _ = SCRAPERS[name]
+    with measure(f"scraper:{name}"):
+        return scraper(year) if option is None else scraper(year, option)
@@ -0,0 +1,191 @@
+import threading
+from typing import Callable, Dict, Hashable, List, NamedTuple, Optional
+import numpy as np
+from cachetools import LRUCache
+from app.core.settings import TIMESERIES_CACHE_SIZE
+from app.services.datasets import FILTER_COLUMNS, GROUP_ROWS, TOTAL_ROWS
+from app.util.helpers import normalize_text
+
+_cache: LRUCache = LRUCache(maxsize=TIMESERIES_CACHE_SIZE)
+_lock = threading.Lock()
+
+
+def cached(key: Hashable, compute: Callable):
+    """
+    Resultado de `compute()` guardado em cache. A chave deve incluir a versão dos dados,
+    para que uma nova publicação nunca reaproveite cálculos da anterior.
+    """
+    with _lock:
+        result = _cache.get(key)
+    if result is None:
+        result = compute()
+        with _lock:
+            _cache[key] = result
+    return result
+
+
+class Series(NamedTuple):
+    """
+    Séries anuais de uma tabela, uma por valor da coluna `by`, alinhadas no mesmo eixo de anos.
+
+    Atributos:
+        labels (List[str]): Valor da coluna `by` de cada série (linhas da matriz).
+        years (np.ndarray): Anos do histórico inteiro da tabela (colunas da matriz).
+        values (np.ndarray): Soma da coluna numérica por série e ano; NaN onde só há marcadores ou nenhuma linha.
+    """
+    labels: List[Optional[str]]
+    years: np.ndarray
+    values: np.ndarray
+
+
+def aggregate_rows(table) -> np.ndarray:
+    """
+    Máscara das linhas de total (`TOTAL_ROWS`) e das linhas de grupo com itens (`GROUP_ROWS`),
+    que repetem a soma de outras linhas da mesma página do site.
+    """
+    name = table.dataset.name
+    mask = np.zeros(table.size, dtype=bool)
+    normalized = lambda column: np.array(
+        ["" if value is None else normalize_text(value) for value in table.dictionaries[column]], dtype=object
+    )
+    if name in TOTAL_ROWS:
+        column, labels = TOTAL_ROWS[name]
+        mask |= np.isin(normalized(column), labels)[table.codes[column]]
+    if name in GROUP_ROWS and table.size:
+        group, item = GROUP_ROWS[name]
+        own = normalized(group)[table.codes[group]] == normalized(item)[table.codes[item]]
+        # Itens da mesma página: ano, grupo e, no processamento, o produto da opção do site.
+        page = [table.year, table.codes[group]] + ([table.codes["Product"]] if item != "Product" else [])
+        _, inverse, counts = np.unique(np.stack(page, axis=1), axis=0, return_inverse=True, return_counts=True)
+        mask |= own & (counts[inverse.ravel()] > 1)
+    return mask
+
+
+def series_matrix(table, value: str, by: str, filters: Dict[str, str], exact: bool = False) -> Series:
+    """
+    Agrupa a tabela em séries por `by` e ano, com um único `np.bincount` sobre as colunas.
+    As linhas de total e de grupo (`aggregate_rows`) ficam de fora, para que cada valor
+    seja somado uma vez só.
+
+    Parâmetros:
+        table (Table): Tabela do motor em memória.
+        value (str): Coluna numérica somada.
+        by (str): Coluna categórica que separa as séries.
+        filters (Dict[str, str]): Filtros pelo nome do parâmetro (product, country, ...).
+        exact (bool): Compara o termo inteiro em vez de buscar substring.
+
+    Retorna:
+        Series: Matriz séries x anos.
+    """
+    if not table.size:
+        return Series([], np.zeros(0, dtype=np.int64), np.zeros((0, 0)))
+    first, last = int(table.year.min()), int(table.year.max())
+    years = np.arange(first, last + 1)
+    mask = table.mask(None, exact, **{FILTER_COLUMNS[name]: term for name, term in filters.items()})
+    mask &= ~aggregate_rows(table)
+    codes, inverse = np.unique(table.codes[by][mask], return_inverse=True)
+    quantity = table.quantities[value][mask]
+    cells = inverse.astype(np.int64) * len(years) + (table.year[mask].astype(np.int64) - first)
+    size = len(codes) * len(years)
+    totals = np.bincount(cells, weights=np.clip(quantity, 0, None), minlength=size)
+    numeric = np.bincount(cells, weights=quantity >= 0, minlength=size) > 0
+    values = np.where(numeric, totals, np.nan).reshape(len(codes), len(years))
+    dictionary = table.dictionaries[by]
+    return Series([dictionary[code] for code in codes.tolist()], years, values)
+
+
+def growth(values: np.ndarray) -> np.ndarray:
+    """
+    Variação sobre o ano anterior, para todas as séries de uma vez. NaN no primeiro ano
+    e onde o ano anterior não tem valor positivo.
+    """
+    result = np.full(values.shape, np.nan)
+    previous, current = values[:, :-1], values[:, 1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result[:, 1:] = np.where(previous > 0, current / previous - 1, np.nan)
+    return result
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Média móvel de `window` anos por somas acumuladas. Só é calculada quando todos os anos
+    da janela têm valor.
+    """
+    result = np.full(values.shape, np.nan)
+    if window > values.shape[1]:
+        return result
+    pad = ((0, 0), (1, 0))
+    sums = np.cumsum(np.pad(np.nan_to_num(values), pad), axis=1)
+    counts = np.cumsum(np.pad(~np.isnan(values), pad), axis=1)
+    window_sums = sums[:, window:] - sums[:, :-window]
+    window_counts = counts[:, window:] - counts[:, :-window]
+    result[:, window - 1:] = np.where(window_counts == window, window_sums / window, np.nan)
+    return result
+
+
+def cagr(values: np.ndarray, years: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Taxa de crescimento anual composta de cada série, entre o primeiro e o último ano com valor positivo.
+
+    Retorna:
+        Dict[str, np.ndarray]: "cagr" e os anos inicial e final usados ("first", "last"); NaN e -1
+        nas séries com menos de dois anos positivos.
+    """
+    rows, count = values.shape
+    if not count:
+        return {"cagr": np.full(rows, np.nan), "first": np.full(rows, -1), "last": np.full(rows, -1)}
+    positive = values > 0
+    first = positive.argmax(axis=1)
+    last = count - 1 - positive[:, ::-1].argmax(axis=1)
+    periods = last - first
+    valid = positive.any(axis=1) & (periods > 0)
+    index = np.arange(rows)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.where(valid, (values[index, last] / values[index, first]) ** (1 / np.maximum(periods, 1)) - 1, np.nan)
+    return {"cagr": rate, "first": np.where(valid, years[first], -1), "last": np.where(valid, years[last], -1)}
+
+
+def _listed(values: np.ndarray, digits: Optional[int] = None) -> list:
+    if digits is None:
+        return [None if np.isnan(value) else int(value) for value in values.tolist()]
+    return [None if np.isnan(value) else round(value, digits) for value in values.tolist()]
+
+
+def timeseries(series: Series, window: int = 3, year_from: Optional[int] = None,
+               year_to: Optional[int] = None, limit: Optional[int] = None) -> dict:
+    """
+    Valores, variação anual, média móvel e CAGR de todas as séries.
+
+    A variação e a média móvel usam o histórico inteiro, de modo que o primeiro ano do intervalo
+    pedido também tenha valor; o CAGR considera só o intervalo. As séries saem ordenadas pelo
+    total no intervalo, da maior para a menor.
+
+    Parâmetros:
+        series (Series): Matriz de `series_matrix`.
+        window (int): Anos da média móvel.
+        year_from (int): Primeiro ano do intervalo. None começa no início do histórico.
+        year_to (int): Último ano do intervalo. None vai até o fim do histórico.
+        limit (int): Quantidade máxima de séries.
+
+    Retorna:
+        dict: "years" e "data", com uma entrada por série.
+    """
+    years, values = series.years, series.values
+    change, average = growth(values), rolling_mean(values, window)
+    selected = (years >= (year_from or 0)) & (years <= (year_to or 9999))
+    years, values, change, average = years[selected], values[:, selected], change[:, selected], average[:, selected]
+    rates = cagr(values, years)
+    order = np.argsort(-np.nansum(values, axis=1), kind="stable")[:limit]
+    data = [
+        {
+            "key": series.labels[i],
+            "values": _listed(values[i]),
+            "yoy": _listed(change[i], 4),
+            "rolling_mean": _listed(average[i], 2),
+            "cagr": _listed(rates["cagr"][i:i + 1], 4)[0],
+            "cagr_from": int(rates["first"][i]) if rates["first"][i] >= 0 else None,
+            "cagr_to": int(rates["last"][i]) if rates["last"][i] >= 0 else None,
+        }
+        for i in order.tolist()
+    ]
+    return {"years": years.tolist(), "data": data}
@@ -0,0 +1,170 @@
+import logging
+import sqlite3
+from typing import Iterable, List, Optional
+import pandas as pd
+from app.services.dimensions import COUNTRY_ALIASES
+from app.util.helpers import normalize_text
+
+KEYS = ["Year", "country_id", "product_id"]
+
+METRICS = (
+    "Import_Kg", "Import_USD", "Export_Kg", "Export_USD",
+    "Balance_USD", "Import_USD_per_Kg", "Export_USD_per_Kg",
+    "Import_Share", "Export_Share",
+)
+
+# Colunas devolvidas por `/trade`: as chaves trocadas pelos nomes e o código ISO do país.
+COLUMNS = ("Year", "Country", "Country_ISO", "Product") + METRICS
+
+# Ordenações aceitas por `/trade`. Valores e saldos ordenam do maior para o menor.
+ORDERS = ("Country", "Product", "Year", "Balance_USD", "Import_USD", "Export_USD", "Import_Share", "Export_Share")
+_DESCENDING = ORDERS[3:]
+_ORDER_SQL = {order: f"t.{order}" for order in ORDERS}
+_ORDER_SQL.update({"Country": "countries.name", "Product": "products.name"})
+
+
+def _parse(column: pd.Series) -> pd.Series:
+    """
+    Converte uma coluna de quantidades do site em números de forma vetorizada.
+    "-" (sem comércio) vira 0; "*" e "nd" (sem dado) viram NaN.
+    """
+    text = column.astype("string").str.strip()
+    values = pd.to_numeric(text.str.replace(".", "", regex=False), errors="coerce")
+    values = values.mask(text == "-", 0)
+    return values.astype("float64")
+
+
+def _read(conn: sqlite3.Connection, name: str, prefix: str, years: Optional[List[int]] = None) -> pd.DataFrame:
+    where = f"WHERE Year IN ({', '.join('?' for _ in years)})" if years is not None else ""
+    frame = pd.read_sql(f"SELECT Year, country_id, product_id, Quantity_Kg, Value_USD FROM {name} {where}", conn, params=years)
+    frame[f"{prefix}_Kg"] = _parse(frame.pop("Quantity_Kg"))
+    frame[f"{prefix}_USD"] = _parse(frame.pop("Value_USD"))
+    # Uma mesma chave pode aparecer repetida em cargas antigas; soma para manter uma linha por chave.
+    return frame.groupby(KEYS, as_index=False, sort=False).sum(min_count=1)
+
+
+def compute_trade(imports: pd.DataFrame, exports: pd.DataFrame, total_id: Optional[int] = None) -> pd.DataFrame:
+    """
+    Junta importação e exportação por (Year, country_id, product_id) e calcula as métricas derivadas.
+
+    Parâmetros:
+        imports (pd.DataFrame): Colunas de chave, Import_Kg e Import_USD.
+        exports (pd.DataFrame): Colunas de chave, Export_Kg e Export_USD.
+        total_id (int): Chave do "país" total do site, fora da soma das participações.
+
+    Retorna:
+        pd.DataFrame: Uma linha por chave com as colunas de `KEYS` e `METRICS`:
+            - Balance_USD: exportado menos importado (lado ausente conta como 0).
+            - *_USD_per_Kg: preço médio, nulo quando não houve volume.
+            - *_Share: participação do país no valor total do ano e produto. A linha "total"
+              do site fica fora da soma usada como denominador.
+    """
+    trade = imports.merge(exports, on=KEYS, how="outer")
+    trade["Balance_USD"] = trade["Export_USD"].fillna(0) - trade["Import_USD"].fillna(0)
+    for side in ("Import", "Export"):
+        kg, usd = trade[f"{side}_Kg"], trade[f"{side}_USD"]
+        trade[f"{side}_USD_per_Kg"] = (usd / kg.where(kg > 0)).round(4)
+        total = usd.where(trade["country_id"] != total_id).groupby([trade["Year"], trade["product_id"]]).transform("sum")
+        trade[f"{side}_Share"] = (usd / total.where(total > 0)).round(6)
+    return trade[KEYS + list(METRICS)].sort_values(KEYS, ignore_index=True)
+
+
+def build_trade(conn: sqlite3.Connection, years: Optional[Iterable[int]] = None) -> int:
+    """
+    Recria a tabela `trade` a partir de `importacao` e `exportacao`.
+
+    Chamada na publicação de cada carga (app/services/publish.py), para que as junções e
+    divisões sejam feitas uma vez, em lote, e não a cada requisição.
+
+    Parâmetros:
+        conn (sqlite3.Connection): Conexão com o banco de staging.
+        years (Iterable[int]): Anos alterados pela carga, segundo o `changelog`. Só esses anos
+            são recalculados, já que as participações dependem apenas do próprio ano. None
+            recalcula a tabela inteira, o que também acontece se ela ainda não existir.
+
+    Retorna:
+        int: Linhas gravadas. 0 se alguma das tabelas de origem ainda não existe.
+    """
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if not {"importacao", "exportacao"} <= existing:
+        return 0
+    if "trade" not in existing:
+        years = None
+    elif years is not None:
+        years = sorted(years)
+        if not years:
+            return 0
+
+    total_id = conn.execute("SELECT id FROM countries WHERE key = 'total'").fetchone()
+    trade = compute_trade(_read(conn, "importacao", "Import", years), _read(conn, "exportacao", "Export", years),
+                          total_id[0] if total_id else None)
+    if years is None:
+        conn.execute("DROP TABLE IF EXISTS trade")
+    else:
+        conn.execute(f"DELETE FROM trade WHERE Year IN ({', '.join('?' for _ in years)})", years)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS trade (
+            Year INTEGER,
+            country_id INTEGER REFERENCES countries(id),
+            product_id INTEGER REFERENCES products(id),
+            Import_Kg INTEGER,
+            Import_USD INTEGER,
+            Export_Kg INTEGER,
+            Export_USD INTEGER,
+            Balance_USD INTEGER,
+            Import_USD_per_Kg REAL,
+            Export_USD_per_Kg REAL,
+            Import_Share REAL,
+            Export_Share REAL,
+            PRIMARY KEY (Year, country_id, product_id)
+        ) WITHOUT ROWID
+    ''')
+    for column in KEYS + ["Import_Kg", "Import_USD", "Export_Kg", "Export_USD", "Balance_USD"]:
+        trade[column] = trade[column].astype("Int64")
+    trade = trade.astype(object).where(trade.notna(), None)
+    conn.executemany(f"INSERT INTO trade VALUES ({', '.join('?' * trade.shape[1])})", trade.itertuples(index=False, name=None))
+    scope = "todos os anos" if years is None else f"anos {', '.join(map(str, years))}"
+    logging.info(f"Tabela trade recalculada ({scope}): {len(trade)} linhas.")
+    return len(trade)
+
+
+def query_trade_rows(db_path: str, year=None, country=None, product=None,
+                     order_by: str = "Country") -> list:
+    """
+    Lê a tabela `trade` com os mesmos filtros das rotas de importação e exportação
+    (ano exato; país e produto por trecho, sem diferenciar maiúsculas nem acentos).
+
+    Retorna:
+        list: Linhas como dicionários, com as colunas de `COLUMNS`.
+    """
+    if order_by not in ORDERS:
+        raise ValueError(f"Ordenação inválida: {order_by}")
+    clauses, params = [], []
+    if year is not None:
+        clauses.append("t.Year = ?")
+        params.append(year)
+    if country:
+        # Grafias alternativas do site também encontram o país ("singapura" -> "cingapura").
+        term = normalize_text(country)
+        aliased = sorted({key for alias, key in COUNTRY_ALIASES.items() if term in alias})
+        # instr em vez de LIKE, para que "%" e "_" no termo não funcionem como curingas.
+        clauses.append(f"(instr(countries.key, ?) > 0 OR countries.key IN ({', '.join('?' for _ in aliased)}))")
+        params.extend([term] + aliased)
+    if product:
+        clauses.append("instr(products.key, ?) > 0")
+        params.append(normalize_text(product))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    direction = "DESC" if order_by in _DESCENDING else "ASC"
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.execute(f'''
+            SELECT t.Year, countries.name, countries.iso2, products.name, {", ".join(f"t.{column}" for column in METRICS)}
+            FROM trade t
+            JOIN countries ON countries.id = t.country_id
+            JOIN products ON products.id = t.product_id
+            {where}
+            ORDER BY {_ORDER_SQL[order_by]} {direction}, countries.name, products.name
+        ''', params)
+        return [dict(zip(COLUMNS, row)) for row in cursor]
+    finally:
+        conn.close()
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Awaitable, Callable, List
+from app.core.settings import (
+    ACCESS_DECAY,
+    ACCESS_FLUSH_INTERVAL_SECONDS,
+    ACCESS_HISTOGRAM_SIZE,
+    ACCESS_STATS_PATH,
+    WARMUP_CONCURRENCY,
+    WARMUP_KEYS,
+    WARMUP_TIMEOUT_SECONDS,
+)
+from app.services.sources import Key
+
+_hits: Counter = Counter()
+_lock = threading.Lock()
+
+
+def record_access(key: Key) -> None:
+    """
+    Conta um acesso a uma página do site (tabela, ano, opção) feito pelas rotas.
+    """
+    with _lock:
+        _hits[key] += 1
+
+
+def _init_access(conn: sqlite3.Connection) -> None:
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS access_stats (
+            dataset TEXT,
+            year INTEGER,
+            option INTEGER,
+            hits REAL,
+            last_hit REAL,
+            PRIMARY KEY (dataset, year, option)
+        )
+    ''')
+
+
+def flush_access(path: str = ACCESS_STATS_PATH) -> int:
+    """
+    Soma os acessos contados desde o último flush ao histograma `access_stats`.
+
+    A cada flush os contadores guardados são multiplicados por `ACCESS_DECAY`, para que o
+    histograma acompanhe o tráfego recente, e só as `ACCESS_HISTOGRAM_SIZE` chaves mais
+    acessadas são mantidas. O histograma fica num arquivo próprio, compartilhado pelos
+    workers, para não alterar o banco publicado (o que faria os motores serem recarregados).
+
+    Retorna:
+        int: Quantidade de chaves gravadas.
+    """
+    with _lock:
+        hits = dict(_hits)
+        _hits.clear()
+    if not hits:
+        return 0
+    now = time.time()
+    params = [(name, year, -1 if option is None else option, count, now) for (name, year, option), count in hits.items()]
+    conn = sqlite3.connect(path, timeout=10)
+    try:
+        with conn:
+            _init_access(conn)
+            conn.execute("UPDATE access_stats SET hits = hits * ?", (ACCESS_DECAY,))
+            conn.executemany('''
+                INSERT INTO access_stats (dataset, year, option, hits, last_hit)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (dataset, year, option) DO UPDATE SET
+                    hits = hits + excluded.hits,
+                    last_hit = excluded.last_hit
+            ''', params)
+            conn.execute('''
+                DELETE FROM access_stats WHERE rowid NOT IN (
+                    SELECT rowid FROM access_stats ORDER BY hits DESC LIMIT ?
+                )
+            ''', (ACCESS_HISTOGRAM_SIZE,))
+    finally:
+        conn.close()
+    return len(params)
+
+
+def hot_keys(limit: int = WARMUP_KEYS, path: str = ACCESS_STATS_PATH) -> List[Key]:
+    """
+    Chaves mais acessadas segundo o histograma persistido, da mais para a menos acessada.
+    """
+    if not os.path.exists(path):
+        return []
+    conn = sqlite3.connect(path, timeout=10)
+    try:
+        rows = conn.execute(
+            "SELECT dataset, year, option FROM access_stats ORDER BY hits DESC, last_hit DESC LIMIT ?", (limit,)
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
+    return [(name, year, None if option == -1 else option) for name, year, option in rows]
+
+
+async def warm_up(load: Callable[..., Awaitable[list]], limit: int = WARMUP_KEYS,
+                  timeout: float = WARMUP_TIMEOUT_SECONDS, path: str = ACCESS_STATS_PATH) -> int:
+    """
+    Carrega no cache as chaves mais acessadas antes de o worker começar a atender.
+    Chamada no lifespan da aplicação; o tempo total é limitado por `timeout`.
+
+    Parâmetros:
+        load (Callable): Função que coleta e guarda uma chave no cache (`queries.scrape`).
+        limit (int): Quantidade de chaves.
+        timeout (float): Tempo máximo do aquecimento, em segundos.
+        path (str): Arquivo do histograma.
+
+    Retorna:
+        int: Chaves carregadas com sucesso.
+    """
+    keys = await asyncio.to_thread(hot_keys, limit, path)
+    if not keys:
+        return 0
+    semaphore = asyncio.Semaphore(WARMUP_CONCURRENCY)
+    loaded = 0
+
+    async def warm(key: Key) -> None:
+        nonlocal loaded
+        async with semaphore:
+            if await load(*key, track=False):
+                loaded += 1
+
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(asyncio.gather(*(warm(key) for key in keys), return_exceptions=True), timeout)
+    except asyncio.TimeoutError:
+        logging.warning(f"Aquecimento do cache interrompido após {timeout}s.")
+    logging.info(f"Cache aquecido: {loaded} de {len(keys)} chaves em {time.perf_counter() - started:.1f}s.")
+    return loaded
+
+
+async def run_access_flusher(interval: int = ACCESS_FLUSH_INTERVAL_SECONDS, path: str = ACCESS_STATS_PATH) -> None:
+    """
+    Grava o histograma de acessos a cada `interval` segundos. Iniciado no lifespan da aplicação.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(flush_access, path)
+        except Exception as e:
+            logging.error(f"Erro ao gravar o histograma de acessos: {e}")
@@ -0,0 +1,149 @@
+import logging
+import sqlite3
+from typing import Iterable, List, Optional, Tuple
+from app.core import logging_config
+from app.core.database_config import DB_PATH
+from app.core.settings import BULK_BATCH_ROWS
+from app.services.changelog import apply_rows, record_reload
+from app.services.datasets import Dataset
+from app.services.dimensions import (
+    compact_tables,
+    create_fact_table,
+    create_unique_key,
+    encode_rows,
+    fact_columns,
+    natural_key,
+    unique_rows,
+)
+from app.services.publish import staging
+
+
+def upsert_sql(dataset: Dataset) -> str:
+    """
+    INSERT da tabela de fatos que, se a chave natural já existir, apenas atualiza as quantidades.
+    Linhas iguais às guardadas não são reescritas.
+    """
+    fact = fact_columns(dataset)
+    assignments = ", ".join(f"{column} = excluded.{column}" for column in dataset.quantities)
+    changed = " OR ".join(f"{column} IS NOT excluded.{column}" for column in dataset.quantities)
+    return f'''
+        INSERT INTO {dataset.name} ({", ".join(fact)}) VALUES ({", ".join("?" for _ in fact)})
+        ON CONFLICT ({", ".join(natural_key(dataset))}) DO UPDATE SET {assignments}
+        WHERE {changed}
+    '''
+
+
+class BulkWriter:
+    """
+    Grava as linhas de uma tabela de fatos em lotes, com upsert pela chave natural.
+
+    As linhas de várias páginas ficam no buffer até somarem `batch_size` e são gravadas numa
+    única transação com `executemany`. Como cada chave ocupa uma linha só, repetir a carga
+    atualiza as linhas existentes em vez de duplicá-las; chaves repetidas dentro do lote são
+    resolvidas antes por `unique_rows`.
+
+    Uso:
+        with staging() as stage, BulkWriter(stage.conn, DATASETS["producao"]) as writer:
+            writer.add(row.as_tuple() for row in rows)
+    """
+
+    def __init__(self, conn: sqlite3.Connection, dataset: Dataset, batch_size: int = BULK_BATCH_ROWS):
+        self.conn = conn
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.written = 0
+        self._buffer: List[tuple] = []
+        self._sql = upsert_sql(dataset)
+        create_fact_table(conn, dataset)
+        create_unique_key(conn, dataset)
+
+    def add(self, rows: Iterable[tuple]) -> None:
+        """
+        Acrescenta linhas na ordem de `dataset.columns`, com país e produto ainda como texto.
+        """
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Grava o buffer numa transação.
+
+        Retorna:
+            int: Linhas gravadas.
+        """
+        if not self._buffer:
+            return 0
+        rows = list(unique_rows(self.dataset, encode_rows(self.conn, self.dataset, self._buffer)).values())
+        self._buffer = []
+        with self.conn:
+            self.conn.executemany(self._sql, rows)
+        self.written += len(rows)
+        return len(rows)
+
+    def __enter__(self) -> "BulkWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.flush()
+
+
+def write_rows(conn: sqlite3.Connection, dataset: Dataset, rows: List[tuple], version: int,
+               scope: Tuple[str, ...] = ()) -> int:
+    """
+    Grava o resultado de uma coleta completa de uma tabela.
+
+    Se a tabela já existe, as linhas são comparadas com as guardadas e só as diferenças são
+    gravadas e registradas no `changelog` (`apply_rows`). Na primeira carga, todas entram pelo
+    `BulkWriter` e a tabela é registrada como recarregada.
+
+    Parâmetros:
+        conn (sqlite3.Connection): Conexão com a cópia de staging do banco.
+        dataset (Dataset): Tabela de fatos.
+        rows (List[tuple]): Linhas na ordem de `dataset.columns`, com país e produto ainda como texto.
+        version (int): Versão que será publicada com as mudanças.
+        scope (Tuple[str, ...]): Colunas que identificam a página do site, repassadas a `apply_rows`.
+
+    Retorna:
+        int: Linhas inseridas, alteradas ou removidas.
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (dataset.name,)).fetchone()
+    if not exists:
+        with BulkWriter(conn, dataset) as writer:
+            writer.add(rows)
+        record_reload(conn, version, dataset.name)
+        return writer.written
+    return apply_rows(conn, dataset, encode_rows(conn, dataset, rows), version, scope=scope)
+
+
+def compact(db_path: str = DB_PATH) -> Optional[int]:
+    """
+    Remove do banco publicado as linhas repetidas na chave natural e cria os índices UNIQUE
+    usados pelos upserts, publicando o resultado numa nova versão.
+
+    Parâmetros:
+        db_path (str): Caminho do banco publicado.
+
+    Retorna:
+        Optional[int]: Versão publicada, ou None se todas as tabelas já estavam compactadas.
+    """
+    with staging(db_path, source="compact") as stage:
+        compacted = compact_tables(stage.conn)
+        for name, removed in compacted.items():
+            logging.info(f"Tabela '{name}' compactada: {removed} linhas repetidas removidas.")
+            if removed:
+                record_reload(stage.conn, stage.next_version, name)
+        stage.removed.update(compacted)
+        if not compacted:
+            stage.discard()
+    return stage.version
+
+
+if __name__ == "__main__":
+    """
+        Para remover as linhas repetidas do banco, execute no terminal:
+        python -m app.services.writer
+    """
+    logging_config()
+    compact()
@@ -5,6 +5,7 @@ from fastapi.security import OAuth2PasswordBearer
 from typing import Optional
 from passlib.context import CryptContext
 from bcrypt import hashpw, gensalt, checkpw
+from app.core.settings import ADMIN_USERS
 
 SECRET_KEY = "chave"
 ALGORITHM = "HS256"
@@ -39,3 +40,7 @@ def verifica_token(token: str = Depends(oauth2)):
     except JWTError:
         raise HTTPException(status_code=401, detail="O token não é válido")
 
+def verifica_admin(username: str = Depends(verifica_token)):
+    if username not in ADMIN_USERS:
+        raise HTTPException(status_code=403, detail="Acesso restrito a administradores")
+    return username
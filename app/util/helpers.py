@@ -0,0 +1,15 @@
+import unicodedata
+
+
+def normalize_text(text: str) -> str:
+    """
+    Forma canônica de um nome para comparação: minúsculas, sem acentos e com espaços simples.
+
+    Parâmetros:
+        text (str): Nome como veio do site ou do usuário ("África do  Sul").
+
+    Retorna:
+        str: Nome normalizado ("africa do sul").
+    """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return " ".join("".join(char for char in decomposed if not unicodedata.combining(char)).split())
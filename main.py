@@ -1,12 +1,49 @@
+import asyncio
 import logging
 import nest_asyncio
 import uvicorn
-from app.core import init_db
-from app.routers import vitibrasil
+from contextlib import asynccontextmanager
+from app.core import init_db, logging_config
+from app.core.database_config import DB_PATH
+from app.core.logging_config import log_requests
+from app.core.memory import run_rss_monitor, start_tracing, trace_memory
+from app.core.profiling import profile_requests
+from app.core.settings import EXPORT_WORKER_ENABLED, MEMORY_TRACE, REFRESH_ENABLED
+from app.routers import admin, jobs, vitibrasil
+from app.services.engine import get_engine, run_engine_refresher
+from app.services.export_jobs import run_export_worker
+from app.services.publish import upgrade_schema
+from app.services.queries import scrape
+from app.services.scheduler import run_scheduler
+from app.services.warmup import flush_access, run_access_flusher, warm_up
 from fastapi import FastAPI
 import gunicorn
 
 nest_asyncio.apply()
+logging_config()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await main()
+    if MEMORY_TRACE:
+        start_tracing()
+    await asyncio.to_thread(upgrade_schema, DB_PATH)
+    await asyncio.to_thread(get_engine)
+    engine_refresher = asyncio.create_task(run_engine_refresher())
+    await warm_up(scrape)
+    scheduler = asyncio.create_task(run_scheduler()) if REFRESH_ENABLED else None
+    rss_monitor = asyncio.create_task(run_rss_monitor())
+    access_flusher = asyncio.create_task(run_access_flusher())
+    export_worker = asyncio.create_task(run_export_worker()) if EXPORT_WORKER_ENABLED else None
+    yield
+    if export_worker:
+        export_worker.cancel()
+    access_flusher.cancel()
+    engine_refresher.cancel()
+    rss_monitor.cancel()
+    if scheduler:
+        scheduler.cancel()
+    await asyncio.to_thread(flush_access)
 
 app = FastAPI(
     title="Vitivinicultura API",
@@ -15,21 +52,17 @@ app = FastAPI(
         "name": "Pedro Costa e Marina Oliveira",
         "url": "https://github.com/pecosta23/TechChallengeFase1"
     },
-    version ="1.0.0"
+    version ="1.0.0",
+    lifespan=lifespan
 )
 
 
-logging.basicConfig(
-    level=logging.INFO, 
-    format="%(asctime)s - %(levelname)s - %(message).200s",
-    datefmt='%d/%m/%Y %I:%M:%S %p',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("app/logs/app.log")
-    ]
-)
-
+app.middleware("http")(trace_memory)
+app.middleware("http")(profile_requests)
+app.middleware("http")(log_requests)
 app.include_router(vitibrasil.router)
+app.include_router(jobs.router)
+app.include_router(admin.router)
 
 async def main():
     logging.info("Starting Vitibrasil API...")
@@ -0,0 +1,33 @@
+import shutil
+import sqlite3
+from pathlib import Path
+import pytest
+from app.services.dimensions import compact_tables, normalize_tables
+from app.services.engine import Engine, load_engine
+
+DB = Path(__file__).resolve().parents[1] / "vitibrasil.db"
+
+
+@pytest.fixture(scope="session")
+def database(tmp_path_factory) -> str:
+    """
+    Cópia do banco do repositório, convertida para o formato atual.
+    """
+    path = tmp_path_factory.mktemp("db") / "vitibrasil.db"
+    shutil.copy(DB, path)
+    conn = sqlite3.connect(path)
+    try:
+        normalize_tables(conn)
+        compact_tables(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def engine(database) -> Engine:
+    """
+    Motor carregado da cópia convertida do banco.
+    """
+    return load_engine(database)
@@ -0,0 +1,66 @@
+import shutil
+import sqlite3
+from pathlib import Path
+import pandas as pd
+from app.services.csv_ingest import _frame, _quantities, ingest, parse_processamento, parse_producao, parse_trade, read_file
+from app.services.datasets import DATASETS
+
+ROOT = Path(__file__).resolve().parents[1]
+DATA = str(ROOT / "tests" / "data" / "csv")
+
+
+def parsed(name, parser, filename, product=None):
+    frame = parser(_frame(read_file(DATA, filename)), product)[list(DATASETS[name].columns)]
+    return list(frame.itertuples(index=False, name=None))
+
+
+def scraped(name, where, params):
+    # Linhas gravadas pelos scrapers no banco do repositório, na ordem da página.
+    conn = sqlite3.connect(ROOT / "vitibrasil.db")
+    try:
+        columns = ", ".join(DATASETS[name].columns)
+        return conn.execute(f"SELECT {columns} FROM {name} WHERE {where} ORDER BY id", params).fetchall()
+    finally:
+        conn.close()
+
+
+def test_frame_detects_the_separator():
+    assert list(_frame(read_file(DATA, "ProcessaMesa.csv")).columns) == ["id", "control", "cultivar", "2018", "2019", "2020"]
+    assert list(_frame(read_file(DATA, "ExpSuco.csv")).columns) == ["Id", "País", "2000", "2000.1"]
+
+
+def test_quantities_use_the_site_markers():
+    column = pd.Series(["1234567", "0", "", "nd", "*", "12.6"])
+    assert _quantities(column).tolist() == ["1.234.567", "-", "-", "nd", "*", "13"]
+    assert _quantities(pd.Series(["0"]), zero="0").tolist() == ["0"]
+
+
+def test_producao_matches_the_scraped_page():
+    rows = parsed("producao", parse_producao, "Producao.csv")
+    assert rows[-1] == (2020, "derivados", "total", "318.512.191")
+    assert rows == scraped("producao", "Year = ?", (2020,))
+
+
+def test_processamento_matches_the_scraped_pages():
+    rows = parsed("processamento", parse_processamento, "ProcessaMesa.csv", "uvas de mesa")
+    assert rows == scraped("processamento", "Year BETWEEN 2018 AND 2020 AND Product = ?", ("uvas de mesa",))
+
+
+def test_exportacao_matches_the_scraped_page_with_its_total():
+    rows = parsed("exportacao", parse_trade, "ExpSuco.csv", "suco de uva")
+    # Os países fora do arquivo não exportaram suco em 2000, então o total é o da página.
+    countries = [row[1] for row in rows]
+    marks = ", ".join("?" for _ in countries)
+    stored = scraped("exportacao", f"Year = 2000 AND Product = 'suco de uva' AND Country IN ({marks})", countries)
+    assert rows[-1] == (2000, "total", "8.784.003", "13.810.733", "suco de uva")
+    assert rows == stored
+
+
+def test_ingest_keeps_years_missing_from_the_files(database, tmp_path):
+    path = tmp_path / "vitibrasil.db"
+    shutil.copy(database, path)
+    count = lambda: sqlite3.connect(path).execute("SELECT COUNT(*) FROM producao").fetchone()[0]
+    before = count()
+    # O arquivo só traz 2020, igual ao gravado: nada muda e os outros anos ficam.
+    assert ingest(DATA, str(path), ["producao"]) is None
+    assert count() == before
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from app.services.forecast import fit, forecasts, history_window, predict
+from app.services.timeseries import series_matrix
+
+
+@pytest.fixture(scope="module")
+def series(engine):
+    return series_matrix(engine["exportacao"], "Value_USD", "Country", {"product": "vinhos de mesa"})
+
+
+@pytest.mark.parametrize("kind", ["linear", "holt"])
+def test_batched_fit_matches_one_series_at_a_time(series, kind):
+    values, years = history_window(series.values, series.years, 20)
+    batched = predict(fit(kind, values, years), 5)
+    for label in ("paraguai", "estados unidos", "china"):
+        i = series.labels.index(label)
+        single = predict(fit(kind, values[i:i + 1], years), 5)
+        for many, one in zip(batched, single):
+            np.testing.assert_allclose(many[i], one[0])
+
+
+def test_linear_trend_is_recovered():
+    years = np.arange(2000, 2010)
+    values = np.vstack([100 + 10 * (years - 2000), np.full(len(years), 50.0)]).astype(float)
+    values[0, 3] = np.nan
+    forecast, lower, upper = predict(fit("linear", values, years), 2)
+    np.testing.assert_allclose(forecast, [[200, 210], [50, 50]])
+    np.testing.assert_allclose(lower, forecast)
+    np.testing.assert_allclose(upper, forecast)
+
+
+def test_total_row_is_not_forecast(series):
+    values, years = history_window(series.values, series.years, 20)
+    result = forecasts(series.labels, values, years, fit("holt", values, years), 3)
+    keys = [entry["key"] for entry in result["data"]]
+    assert "total" not in keys
+    assert result["years"] == [int(years[-1]) + 1, int(years[-1]) + 2, int(years[-1]) + 3]
@@ -0,0 +1,62 @@
+import numpy as np
+from app.services.datasets import parse_quantity
+from app.services.timeseries import Series, series_matrix, timeseries
+
+
+def value_at(series, label, year):
+    return series.values[series.labels.index(label), int(np.flatnonzero(series.years == year)[0])]
+
+
+def site_row(engine, name, year, column, **terms):
+    # Mesma consulta das rotas quando a resposta vem do banco.
+    rows = engine.query(name, year, exact=True, **terms)
+    assert len(rows) == 1
+    return parse_quantity(rows[0][column])
+
+
+def test_trade_series_match_the_site_total(engine):
+    series = series_matrix(engine["exportacao"], "Value_USD", "Product", {})
+    total = site_row(engine, "exportacao", 2010, "Value_USD", Country="total", Product="vinhos de mesa")
+    assert total == 2_595_303
+    assert value_at(series, "vinhos de mesa", 2010) == total
+
+
+def test_trade_total_is_not_a_country(engine):
+    series = series_matrix(engine["importacao"], "Value_USD", "Country", {"product": "vinhos de mesa"})
+    assert "total" not in series.labels
+    assert "chile" in series.labels
+
+
+def test_processamento_groups_skip_group_rows(engine):
+    series = series_matrix(engine["processamento"], "Quantity_Kg", "GroupName", {"product": "viníferas"})
+    group = site_row(engine, "processamento", 2010, "Quantity_Kg", GroupName="tintas", Cultive="tintas", Product="viníferas")
+    assert group == 23_633_831
+    assert value_at(series, "tintas", 2010) == group
+
+
+def test_producao_categories_skip_category_and_grand_totals(engine):
+    series = series_matrix(engine["producao"], "Quantity_L", "Category", {})
+    for category in ("vinho de mesa", "derivados"):
+        subtotal = site_row(engine, "producao", 2010, "Quantity_L", Category=category, Product="todos da categoria")
+        assert value_at(series, category, 2010) == subtotal
+    assert value_at(series, "vinho de mesa", 2010) == 195_267_980
+    assert "todos da categoria" not in series_matrix(engine["producao"], "Quantity_L", "Product", {}).labels
+
+
+def test_comercializacao_keeps_groups_without_items(engine):
+    series = series_matrix(engine["comercializacao"], "Quantity_L", "GroupName", {})
+    group = site_row(engine, "comercializacao", 2010, "Quantity_L", GroupName="vinho de mesa", Product="vinho de mesa")
+    assert value_at(series, "vinho de mesa", 2010) == group
+    single = site_row(engine, "comercializacao", 2010, "Quantity_L", GroupName="suco de uvas concentrado",
+                      Product="suco de uvas concentrado")
+    assert value_at(series, "suco de uvas concentrado", 2010) == single
+
+
+def test_timeseries_growth_and_cagr():
+    series = Series(["a"], np.arange(2000, 2004), np.array([[100.0, 110.0, np.nan, 133.1]]))
+    result = timeseries(series, window=2)
+    entry = result["data"][0]
+    assert entry["yoy"] == [None, 0.1, None, None]
+    assert entry["rolling_mean"] == [None, 105.0, None, None]
+    assert entry["cagr"] == 0.1
+    assert (entry["cagr_from"], entry["cagr_to"]) == (2000, 2003)
@@ -0,0 +1,29 @@
+import shutil
+import sqlite3
+import pytest
+from app.services.trade import build_trade, query_trade_rows
+
+
+@pytest.fixture(scope="module")
+def trade_db(database, tmp_path_factory) -> str:
+    path = tmp_path_factory.mktemp("trade") / "vitibrasil.db"
+    shutil.copy(database, path)
+    conn = sqlite3.connect(path)
+    try:
+        build_trade(conn, None)
+        conn.commit()
+    finally:
+        conn.close()
+    return str(path)
+
+
+def test_country_filter_matches_substrings_and_spellings(trade_db):
+    rows = query_trade_rows(trade_db, 2010, country="paraguai")
+    assert rows and {row["Country"] for row in rows} == {"paraguai"}
+    assert query_trade_rows(trade_db, 2010, country="singapura") == query_trade_rows(trade_db, 2010, country="cingapura")
+
+
+@pytest.mark.parametrize("term", ["%", "_", "para%"])
+def test_like_wildcards_are_literal(trade_db, term):
+    assert query_trade_rows(trade_db, 2010, country=term) == []
+    assert query_trade_rows(trade_db, 2010, product=term) == []